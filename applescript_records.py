@@ -0,0 +1,148 @@
+"""
+Delimited record format for AppleScript output
+The Mail and Calendar scripts print one record per line with tab-separated,
+backslash-escaped fields; the tokenizer here reads osascript stdout as a
+stream and yields one EmailRecord or event dict per record
+"""
+
+import subprocess
+import threading
+from typing import Dict, Iterable, Iterator, List
+
+from records import EmailRecord
+
+
+MAIL_FIELDS = ['subject', 'sender', 'date_received', 'message_id']
+EVENT_FIELDS = ['summary', 'start_date', 'location', 'start_offset']
+SNIPPET_FIELDS = ['message_id', 'length', 'body']
+
+_UNESCAPES = {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r'}
+
+# AppleScript handlers that escape a field and join fields/records; paste
+# at the top level of a script, outside any tell block
+APPLESCRIPT_HELPERS = r'''
+on replaceText(theText, searchString, replacement)
+    set AppleScript's text item delimiters to searchString
+    set theItems to text items of theText
+    set AppleScript's text item delimiters to replacement
+    set theText to theItems as text
+    set AppleScript's text item delimiters to ""
+    return theText
+end replaceText
+
+on escapeField(theValue)
+    if theValue is missing value then return ""
+    set theText to theValue as text
+    set theText to my replaceText(theText, "\\", "\\\\")
+    set theText to my replaceText(theText, tab, "\\t")
+    set theText to my replaceText(theText, linefeed, "\\n")
+    set theText to my replaceText(theText, return, "\\r")
+    return theText
+end escapeField
+
+on joinList(theList, delimiter)
+    set AppleScript's text item delimiters to delimiter
+    set theText to theList as text
+    set AppleScript's text item delimiters to ""
+    return theText
+end joinList
+'''
+
+
+class AppleScriptError(Exception):
+    """osascript exited with an error"""
+
+
+def escape_field(value: str) -> str:
+    """Python twin of the escapeField handler, for fixtures and stubs"""
+    return (value.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def format_record(values: List[str]) -> str:
+    """Render one record line the way the AppleScript side does"""
+    return '\t'.join(escape_field(value) for value in values)
+
+
+def unescape_field(field: str) -> str:
+    """Undo escapeField"""
+    if '\\' not in field:
+        return field
+
+    chars = []
+    i = 0
+    while i < len(field):
+        char = field[i]
+        if char == '\\' and i + 1 < len(field):
+            chars.append(_UNESCAPES.get(field[i + 1], field[i + 1]))
+            i += 2
+        else:
+            chars.append(char)
+            i += 1
+    return ''.join(chars)
+
+
+def iter_fields(lines: Iterable[str], fields: List[str]) -> Iterator[List[str]]:
+    """Yield the unescaped field values of each record line
+
+    Lines with the wrong field count are skipped.
+    """
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+        values = line.split('\t')
+        if len(values) != len(fields):
+            print(f"Warning: Skipping malformed record ({len(values)} fields): {line[:80]}")
+            continue
+        yield list(map(unescape_field, values))
+
+
+def iter_records(lines: Iterable[str], fields: List[str]) -> Iterator[Dict]:
+    """Yield a dict per record line; lines with the wrong field count are skipped"""
+    for values in iter_fields(lines, fields):
+        yield dict(zip(fields, values))
+
+
+def iter_mail_records(lines: Iterable[str]) -> Iterator[EmailRecord]:
+    """Yield an EmailRecord per line of the Mail script's output"""
+    for values in iter_fields(lines, MAIL_FIELDS):
+        yield EmailRecord(*values)
+
+
+def iter_event_records(lines: Iterable[str]) -> Iterator[Dict]:
+    """Yield event dicts from the Calendar script's output lines"""
+    return iter_records(lines, EVENT_FIELDS)
+
+
+def stream_osascript(script: str, timeout: float = 30) -> Iterator[str]:
+    """Run an AppleScript and yield its stdout line by line
+
+    Raises AppleScriptError if osascript fails, after the output has been
+    consumed. The process is killed if it runs longer than timeout seconds.
+    """
+    process = subprocess.Popen(
+        ['osascript', '-e', script],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8',
+        errors='replace'
+    )
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+
+    try:
+        yield from process.stdout
+        stderr = process.stderr.read()
+        returncode = process.wait()
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+    if returncode != 0:
+        raise AppleScriptError(stderr.strip() or f"osascript exited with status {returncode}")
@@ -0,0 +1,162 @@
+"""
+Concurrent, pipelined fetching for the Email Clustering System
+Runs the Mail and Calendar osascript calls at the same time on an asyncio
+loop in a background thread, and pages through the inbox so the next page
+is fetched while the current one is being classified
+"""
+
+import asyncio
+import queue
+import threading
+from typing import Callable, Dict, Iterator, List
+
+from applescript_records import AppleScriptError, iter_mail_records
+from records import EmailRecord
+
+
+# Unread messages fetched per osascript call
+DEFAULT_PAGE_SIZE = 25
+
+# Pages fetched ahead of the classifier
+PREFETCH_PAGES = 1
+
+_DONE = object()
+
+
+async def run_osascript(script: str, timeout: float = 30) -> List[str]:
+    """Run an AppleScript without blocking the event loop and return its output lines"""
+    process = await asyncio.create_subprocess_exec(
+        'osascript', '-e', script,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise AppleScriptError(f"osascript timed out after {timeout}s")
+
+    if process.returncode != 0:
+        message = stderr.decode('utf-8', 'replace').strip()
+        raise AppleScriptError(message or f"osascript exited with status {process.returncode}")
+
+    return stdout.decode('utf-8', 'replace').splitlines()
+
+
+class PipelinedFetch:
+    """Fetch calendar events and inbox pages concurrently in a background thread
+
+    page_script(start, end) returns the Mail script for unread messages
+    start..end (1-based, inclusive). get_events is a blocking callable, such
+    as the calendar cache lookup, run on the loop's executor so its
+    osascript call overlaps the first mail page.
+    """
+
+    def __init__(self, page_script: Callable[[int, int], str], limit: int,
+                 get_events: Callable[[], List[Dict]], page_size: int = DEFAULT_PAGE_SIZE,
+                 timeout: float = 30):
+        self.page_script = page_script
+        self.limit = limit
+        self.get_events = get_events
+        self.page_size = page_size
+        self.timeout = timeout
+        self.pages = queue.Queue(maxsize=PREFETCH_PAGES)
+        self.events_ready = threading.Event()
+        self._events = []
+        self._thread = threading.Thread(target=self._run, name='pipelined-fetch', daemon=True)
+        self._stop = threading.Event()
+        self.pages_fetched = 0
+        self.bytes_read = 0
+
+    def start(self) -> 'PipelinedFetch':
+        """Start fetching in the background"""
+        self._thread.start()
+        return self
+
+    def events(self) -> List[Dict]:
+        """Wait for the calendar fetch and return its events"""
+        self.events_ready.wait()
+        return self._events
+
+    def emails(self) -> Iterator[EmailRecord]:
+        """Yield emails page by page as the pages arrive"""
+        try:
+            while True:
+                page = self.pages.get()
+                if page is _DONE:
+                    return
+                if isinstance(page, AppleScriptError):
+                    print(f"AppleScript error: {page}")
+                    return
+                if isinstance(page, Exception):
+                    print(f"Error fetching emails: {page}")
+                    return
+                yield from page
+        finally:
+            self._stop.set()
+
+    def _run(self):
+        try:
+            asyncio.run(self._main())
+        finally:
+            self.events_ready.set()
+
+    async def _main(self):
+        loop = asyncio.get_running_loop()
+        events_task = loop.run_in_executor(None, self.get_events)
+        events_task.add_done_callback(self._events_done)
+
+        try:
+            await self._fetch_pages(loop)
+        finally:
+            try:
+                await events_task
+            except Exception:
+                pass
+
+    def _events_done(self, future):
+        try:
+            self._events = future.result()
+        except Exception as e:
+            print(f"Error fetching calendar events: {e}")
+            self._events = []
+        self.events_ready.set()
+
+    async def _fetch_pages(self, loop):
+        start = 1
+        next_page = asyncio.ensure_future(self._fetch_page(start))
+
+        while next_page is not None and not self._stop.is_set():
+            try:
+                page = await next_page
+            except Exception as e:
+                await self._put(loop, e)
+                return
+
+            self.pages_fetched += 1
+            start += self.page_size
+            more = len(page) == self.page_size and start <= self.limit
+
+            # Start the next page before handing this one to the classifier
+            next_page = asyncio.ensure_future(self._fetch_page(start)) if more else None
+            await self._put(loop, page)
+
+        if next_page is not None:
+            next_page.cancel()
+        await self._put(loop, _DONE)
+
+    async def _fetch_page(self, start: int) -> List[EmailRecord]:
+        end = min(start + self.page_size - 1, self.limit)
+        lines = await run_osascript(self.page_script(start, end), self.timeout)
+        self.bytes_read += sum(len(line.encode('utf-8')) + 1 for line in lines)
+        return list(iter_mail_records(lines))
+
+    async def _put(self, loop, item):
+        """Hand an item to the consumer without blocking the event loop"""
+        while not self._stop.is_set():
+            try:
+                await loop.run_in_executor(None, lambda: self.pages.put(item, timeout=0.1))
+                return
+            except queue.Full:
+                continue
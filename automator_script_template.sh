@@ -25,18 +25,25 @@ EMAIL_LIMIT=50
 # Change to repository directory
 cd "$REPO_PATH" || exit 1
 
-# Run the email clusterer
 if [ -z "$DATABASE_PATH" ]; then
     # Use default database location
-    "$PYTHON3" email_clusterer.py --limit "$EMAIL_LIMIT"
+    DATABASE_ARGS=()
 else
     # Use custom database location
-    "$PYTHON3" email_clusterer.py --limit "$EMAIL_LIMIT" --database "$DATABASE_PATH"
+    DATABASE_ARGS=(--database "$DATABASE_PATH")
 fi
 
-# Capture exit code
+# If email_clusterer.py --daemon is running, ask it to process new mail now;
+# it already has the rules and calendar loaded, so this takes milliseconds
+"$PYTHON3" daemon_client.py "${DATABASE_ARGS[@]}" process > /dev/null
 EXIT_CODE=$?
 
+# Exit code 2 means no daemon is running: do a full run instead
+if [ $EXIT_CODE -eq 2 ]; then
+    "$PYTHON3" email_clusterer.py --limit "$EMAIL_LIMIT" "${DATABASE_ARGS[@]}"
+    EXIT_CODE=$?
+fi
+
 # Display notification
 if [ $EXIT_CODE -eq 0 ]; then
     osascript -e 'display notification "Email clustering completed successfully!" with title "Email Clusterer" sound name "Glass"'
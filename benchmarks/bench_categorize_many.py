@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Batch categorization benchmark
+Compares categorize_many with calling categorize_email once per email
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from email_clusterer import EmailClusterer  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from synthetic import SyntheticCorpus  # noqa: E402
+
+
+def main():
+    """Check identical output and report emails per second"""
+    parser = argparse.ArgumentParser(description='Benchmark categorize_many')
+    parser.add_argument('--emails', type=int, default=200000)
+    parser.add_argument('--distinct', type=int, default=0,
+                        help='Number of distinct subject/sender pairs in the batch (default: all distinct)')
+    parser.add_argument('--keywords', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # A vocabulary twice the keyword count, so most subjects match a few keywords
+    corpus = SyntheticCorpus(seed=args.seed, vocabulary_size=args.keywords * 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clusterer = EmailClusterer(database_path=str(Path(tmp) / 'bench.sqlite'))
+
+    clusterer.categories = corpus.keyword_table(args.keywords)
+    clusterer.matcher = KeywordMatcher(clusterer.categories)
+    emails = corpus.emails(args.emails, args.distinct)
+
+    # Import pandas and numpy before timing; a warm run or the daemon has them loaded
+    clusterer.categorize_many(emails[:1])
+
+    start = time.perf_counter()
+    expected = [clusterer.categorize_email(email) for email in emails]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = clusterer.categorize_many(emails)
+    batch_time = time.perf_counter() - start
+
+    actual = list(zip(result['category'], result['confidence']))
+    if actual != expected:
+        print("✗ categorize_many differs from categorize_email")
+        return 1
+
+    label = f"{args.distinct} distinct" if args.distinct else "all distinct"
+    print(f"Emails: {args.emails} ({label}), keywords: {args.keywords}")
+    print(f"Per-email loop:  {args.emails / loop_time:>10.0f} emails/s")
+    print(f"categorize_many: {args.emails / batch_time:>10.0f} emails/s ({loop_time / batch_time:.1f}x)")
+    print("✓ Results identical to categorize_email")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
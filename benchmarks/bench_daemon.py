@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Daemon socket check
+Starts email_clusterer.py --daemon on a Maildir, then sends 'process' and
+keyword edits over the socket, which the daemon runs on its socket threads,
+and checks that the logs, statistics, processed ids and keyword rows all
+reach the database. Reports the socket round trip of 'classify'.
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from daemon_client import DaemonNotRunning, send_request  # noqa: E402
+from processed_store import ProcessedMessageStore  # noqa: E402
+from storage import open_storage, sidecar_path  # noqa: E402
+from synthetic import SyntheticCorpus  # noqa: E402
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def write_messages(maildir: Path, emails: list, start: int):
+    """Write emails into maildir/new as one file each, numbered from start"""
+    (maildir / 'new').mkdir(parents=True, exist_ok=True)
+    for number, email in enumerate(emails, start):
+        (maildir / 'new' / f'{number}.bench').write_text(
+            f"From: {email['sender']}\nSubject: {email['subject']}\n"
+            f"Message-ID: <{number}@bench.example>\n\nBody\n", encoding='utf-8')
+
+
+def wait_for_daemon(socket_path: Path, process: subprocess.Popen, timeout: float = 60):
+    """Wait until the daemon answers 'status'"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            return send_request(socket_path, {'command': 'status'}, timeout=5)
+        except (DaemonNotRunning, OSError):
+            time.sleep(0.2)
+    raise RuntimeError("daemon did not start")
+
+
+def check(database: Path, emails: int, keyword: str) -> list:
+    """Return what is missing from the database after the socket requests"""
+    storage = open_storage(database)
+    problems = []
+    logged = len(storage.read_logs())
+    if logged != emails:
+        problems.append(f"{logged} log rows, expected {emails}")
+    total = int(storage.read_statistics()['TotalEmails'].sum())
+    if total != emails:
+        problems.append(f"TotalEmails is {total}, expected {emails}")
+    processed = ProcessedMessageStore(sidecar_path(database, '.processed'))
+    missing = sum(f'<{number}@bench.example>' not in processed for number in range(emails))
+    if missing:
+        problems.append(f"{missing} message ids not marked processed")
+    if not any(str(row_keyword).lower() == keyword and active for _, row_keyword, active in storage.load_rules()):
+        problems.append(f"keyword '{keyword}' not written")
+    return problems
+
+
+def main():
+    """Run the socket requests against a daemon on a SQLite database; exit non-zero if a check fails"""
+    parser = argparse.ArgumentParser(description='Check daemon socket requests that write to the database')
+    parser.add_argument('--backend', choices=['sqlite', 'xlsx'], default='sqlite')
+    parser.add_argument('--emails', type=int, default=200, help='Emails in the Maildir before and after the first poll')
+    parser.add_argument('--classify', type=int, default=1000, help='classify requests to time')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(seed=args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        database = directory / f'daemon.{args.backend}'
+        socket_path = directory / 'daemon.sock'
+        maildir = directory / 'Maildir'
+        write_messages(maildir, corpus.emails(args.emails), 0)
+
+        daemon = subprocess.Popen(
+            [sys.executable, str(ROOT / 'email_clusterer.py'), '--database', str(database), '--maildir', str(maildir),
+             '--no-calendar', '--daemon', '--poll-interval', '3600', '--socket', str(socket_path)],
+            stdout=subprocess.DEVNULL)
+        problems = []
+        try:
+            status = wait_for_daemon(socket_path, daemon)
+            while status['polls'] < 1:
+                time.sleep(0.2)
+                status = send_request(socket_path, {'command': 'status'})
+
+            # New mail processed on a socket thread rather than the poll loop
+            write_messages(maildir, corpus.emails(args.emails), args.emails)
+            reply = send_request(socket_path, {'command': 'process'})
+            if not reply.get('ok') or reply.get('emails') != args.emails:
+                problems.append(f"process replied {reply}")
+
+            reply = send_request(socket_path, {'command': 'add-keyword', 'category': 'Work', 'keyword': 'benchword'})
+            if not reply.get('ok') or not reply.get('added'):
+                problems.append(f"add-keyword replied {reply}")
+
+            start = time.perf_counter()
+            for _ in range(args.classify):
+                reply = send_request(socket_path, {'command': 'classify', 'subject': 'Benchword', 'sender': ''})
+            round_trip = (time.perf_counter() - start) / args.classify
+            if reply.get('category') != 'Work':
+                problems.append(f"classify after add-keyword replied {reply}")
+
+            send_request(socket_path, {'command': 'stop'})
+            daemon.wait(timeout=60)
+        finally:
+            if daemon.poll() is None:
+                daemon.kill()
+
+        problems += check(database, 2 * args.emails, 'benchword')
+
+    print(f"Backend: {args.backend}, emails: {args.emails} polled + {args.emails} over the socket")
+    print(f"classify round trip: {round_trip * 1000:.2f} ms")
+    if problems:
+        print(f"✗ {'; '.join(problems)}")
+        return 1
+    print("✓ Socket process and add-keyword reached the database")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
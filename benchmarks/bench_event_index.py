@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Calendar matching benchmark
+Compares the inverted event index with the per-event tokenizing scan
+"""
+
+import argparse
+import random
+import re
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from event_index import EventIndex  # noqa: E402
+
+
+def legacy_match(subject, events):
+    """The original check_calendar_match loop"""
+    subject_words = set(re.findall(r'\w+', subject.lower()))
+    best_match = None
+    best_score = 0
+
+    for event in events:
+        event_words = set(re.findall(r'\w+', event.get('summary', '').lower()))
+        common_words = {w for w in subject_words & event_words if len(w) > 3}
+        if len(common_words) > best_score:
+            best_score = len(common_words)
+            best_match = event.get('summary', '')
+
+    if best_score >= 2:
+        return True, best_match
+    return False, ''
+
+
+def main():
+    """Check identical output and report the speedup"""
+    parser = argparse.ArgumentParser(description='Benchmark calendar matching')
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--emails', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9)))
+                  for _ in range(3000)]
+
+    def phrase(n):
+        return ' '.join(rng.choice(vocabulary).title() for _ in range(n))
+
+    events = [{'summary': phrase(rng.randint(2, 6)), 'start_date': '', 'location': ''}
+              for _ in range(args.events)]
+    subjects = [phrase(rng.randint(3, 10)) for _ in range(args.emails)]
+
+    start = time.perf_counter()
+    legacy = [legacy_match(subject, events) for subject in subjects]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = EventIndex(events)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [index.match(subject) for subject in subjects]
+    indexed_time = time.perf_counter() - start
+
+    if legacy != indexed:
+        mismatches = sum(1 for a, b in zip(legacy, indexed) if a != b)
+        print(f"✗ {mismatches} results differ from the legacy scan")
+        return 1
+
+    print(f"Events: {args.events}, emails: {args.emails}, matches: {sum(m for m, _ in indexed)}")
+    print(f"Index build: {build_time * 1000:.1f} ms")
+    print(f"Legacy:      {legacy_time / args.emails * 1e6:.1f} us/email")
+    print(f"Indexed:     {indexed_time / args.emails * 1e6:.1f} us/email")
+    print(f"Speedup:     {legacy_time / (build_time + indexed_time):.1f}x (including index build)")
+    print("✓ Results identical to the legacy scan")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Keyword matcher benchmark
+Compares the compiled Aho-Corasick matcher with the per-keyword substring loop
+"""
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from keyword_matcher import KeywordMatcher  # noqa: E402
+
+
+def legacy_categorize(categories, text):
+    """The original categorize_email scoring loop"""
+    category_scores = {}
+
+    for category, keywords in categories.items():
+        score = 0
+        for keyword in keywords:
+            if keyword in text:
+                score += 1
+        if score > 0:
+            category_scores[category] = score
+
+    if category_scores:
+        best_category = max(category_scores.items(), key=lambda x: x[1])
+        return best_category[0], min(best_category[1] / 3.0, 1.0)
+
+    return 'Uncategorized', 0.0
+
+
+def random_word(rng, low=3, high=10):
+    """Return a random lowercase word"""
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high)))
+
+
+def make_rules(rng, n_keywords, n_categories):
+    """Build a category -> keywords table with some duplicates across categories"""
+    vocabulary = [random_word(rng) for _ in range(n_keywords)]
+    categories = {f'Category{i}': [] for i in range(n_categories)}
+    names = list(categories)
+    for keyword in vocabulary:
+        categories[rng.choice(names)].append(keyword)
+        if rng.random() < 0.05:
+            categories[rng.choice(names)].append(keyword)
+    return categories, vocabulary
+
+
+def make_texts(rng, vocabulary, n_emails):
+    """Build subject+sender texts that mix rule keywords with noise"""
+    texts = []
+    for _ in range(n_emails):
+        words = [rng.choice(vocabulary) if rng.random() < 0.3 else random_word(rng) for _ in range(8)]
+        texts.append(f"{' '.join(words)} {random_word(rng)}@{random_word(rng)}.com")
+    return texts
+
+
+def main():
+    """Check identical output and report the speedup"""
+    parser = argparse.ArgumentParser(description='Benchmark the keyword matcher')
+    parser.add_argument('--keywords', type=int, default=10000)
+    parser.add_argument('--categories', type=int, default=50)
+    parser.add_argument('--emails', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    categories, vocabulary = make_rules(rng, args.keywords, args.categories)
+    texts = make_texts(rng, vocabulary, args.emails)
+
+    start = time.perf_counter()
+    matcher = KeywordMatcher(categories)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = [legacy_categorize(categories, text) for text in texts]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = [matcher.categorize(text) for text in texts]
+    compiled_time = time.perf_counter() - start
+
+    if legacy != compiled:
+        mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b)
+        print(f"✗ {mismatches} results differ from the legacy loop")
+        return 1
+
+    print(f"Keywords: {args.keywords}, categories: {args.categories}, emails: {args.emails}")
+    print(f"Compile:  {compile_time * 1000:.1f} ms")
+    print(f"Legacy:   {legacy_time / args.emails * 1e6:.1f} us/email")
+    print(f"Compiled: {compiled_time / args.emails * 1e6:.1f} us/email")
+    print(f"Speedup:  {legacy_time / compiled_time:.1f}x")
+    print("✓ Results identical to the legacy loop")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Log sink benchmark
+Checks that the per-email logging cost does not grow with the size of EmailLogs
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import openpyxl  # noqa: E402
+
+from email_clusterer import EmailClusterer  # noqa: E402
+
+
+def prefill_logs(database_path: Path, rows: int):
+    """Fill the EmailLogs sheet with synthetic rows"""
+    workbook = openpyxl.load_workbook(database_path)
+    sheet = workbook['EmailLogs']
+    for i in range(rows):
+        sheet.append(['2026-01-01 00:00:00', f'Subject {i}', f'sender{i}@example.com',
+                      'Work', False, '', 0.33])
+    workbook.save(database_path)
+
+
+def time_run(existing_rows: int, emails: int) -> dict:
+    """Time save_log_entry and the final flush against a pre-filled log"""
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = Path(tmp) / 'bench.xlsx'
+        clusterer = EmailClusterer(database_path=str(database_path))
+        prefill_logs(database_path, existing_rows)
+
+        email_data = {'subject': 'Quarterly report', 'sender': 'boss@example.com',
+                      'category': 'Work', 'confidence': 0.33,
+                      'calendar_match': False, 'matched_event': ''}
+
+        start = time.perf_counter()
+        for _ in range(emails):
+            clusterer.save_log_entry(email_data)
+        per_email = (time.perf_counter() - start) / emails
+
+        start = time.perf_counter()
+        clusterer.flush_logs()
+        flush = time.perf_counter() - start
+
+        assert clusterer.log_sink.flush_count == 1
+        assert clusterer.log_sink.rows_written == emails
+
+    return {'existing_rows': existing_rows, 'per_email_us': per_email * 1e6, 'flush_s': flush}
+
+
+def main():
+    """Run the benchmark and check that per-email cost stays flat"""
+    parser = argparse.ArgumentParser(description='Benchmark the buffered log sink')
+    parser.add_argument('--emails', type=int, default=50)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 1000, 10000, 50000])
+    parser.add_argument('--max-ratio', type=float, default=5.0,
+                        help='Fail if per-email cost at the largest size exceeds this multiple of the smallest')
+    args = parser.parse_args()
+
+    results = [time_run(size, args.emails) for size in args.sizes]
+
+    print(f"\n{'Existing rows':>14} {'Per email (us)':>15} {'Flush (s)':>10}")
+    for result in results:
+        print(f"{result['existing_rows']:>14} {result['per_email_us']:>15.2f} {result['flush_s']:>10.3f}")
+
+    ratio = results[-1]['per_email_us'] / max(results[0]['per_email_us'], 1e-9)
+    print(f"\nPer-email cost ratio (largest/smallest log): {ratio:.2f}")
+
+    if ratio > args.max_ratio:
+        print("✗ Per-email logging cost grows with log size")
+        return 1
+
+    print("✓ Per-email logging cost is independent of log size")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Overlapping runs and crash recovery check
+Starts several writers on one workbook at once, then kills a writer at each
+step of a journal commit and lets the next run recover, and checks that every
+log row, statistic and processed message id ends up in the database exactly
+once
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import processed_store  # noqa: E402
+from email_clusterer import EmailClusterer  # noqa: E402
+from journal import WriteJournal  # noqa: E402
+from processed_store import ProcessedMessageStore  # noqa: E402
+from storage import ExcelStorage, sidecar_path  # noqa: E402
+
+
+DAY = '2026-01-01'
+
+# Exit status of a writer that was killed on purpose
+CRASH_EXIT = 75
+
+# Where a writer dies during its first commit: (description, class, method, before or after the call)
+CRASH_POINTS = {
+    'rotate': ('after moving the journal aside', WriteJournal, 'rotate', 'after'),
+    'replace': ('before replacing the workbook', ExcelStorage, '_replace', 'before'),
+    'replaced': ('after replacing the workbook', ExcelStorage, '_replace', 'after'),
+    'finish': ('before dropping the committed journal', WriteJournal, 'finish', 'before'),
+}
+
+
+def log_entry(run: int, number: int) -> dict:
+    """One log row with a message id unique to its run"""
+    return {
+        'Timestamp': f'{DAY} 09:00:00',
+        'Subject': f'Run {run} email {number}',
+        'Sender': 'bench@example.com',
+        'Category': 'Work',
+        'CalendarMatch': False,
+        'MatchedEvent': '',
+        'Confidence': 0.5,
+        'MessageId': f'run{run}-{number}'
+    }
+
+
+def crash_at(point: str):
+    """Make the process exit at once when it reaches a step of a commit"""
+    _, owner, method, when = CRASH_POINTS[point]
+    original = getattr(owner, method)
+
+    def crashing(*args, **kwargs):
+        if when == 'before':
+            os._exit(CRASH_EXIT)
+        original(*args, **kwargs)
+        os._exit(CRASH_EXIT)
+
+    setattr(owner, method, crashing)
+
+
+def worker(database: Path, run: int, rows: int, batch: int, crash: str = None):
+    """Write rows in batches like a streamed run: journal, statistics, processed ids, commit"""
+    # Merge the processed-id tail on every save, so merges overlap with other runs' appends
+    processed_store.TAIL_MERGE_THRESHOLD = 1
+    processed_store.TAIL_MERGE_RATIO = 0
+    storage = ExcelStorage(database)
+    processed = ProcessedMessageStore(sidecar_path(database, '.processed'))
+    if crash:
+        crash_at(crash)
+
+    for start in range(0, rows, batch):
+        entries = [log_entry(run, number) for number in range(start, min(start + batch, rows))]
+        storage.append_logs(entries)
+        storage.update_statistics(DAY, len(entries), len(entries), 0)
+        processed.update(entry['MessageId'] for entry in entries)
+        processed.save()
+        storage.commit()
+
+
+def start_worker(database: Path, run: int, rows: int, batch: int, crash: str = None) -> subprocess.Popen:
+    """Run worker() in a new process"""
+    command = [sys.executable, __file__, '--worker', str(database), '--run', str(run),
+               '--rows', str(rows), '--batch', str(batch)]
+    if crash:
+        command += ['--crash', crash]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+
+def new_database(directory: Path, name: str) -> Path:
+    """Create an empty workbook with one keyword row"""
+    database = directory / f'{name}.xlsx'
+    ExcelStorage(database).create([{'Category': 'Work', 'Keyword': 'meeting', 'Active': True, 'Created': ''}])
+    return database
+
+
+def check(database: Path, expected: set) -> list:
+    """Return what is wrong with the database, given the message ids that must be in it once each"""
+    storage = ExcelStorage(database)
+    ids = storage.read_logs()['MessageId'].tolist()
+    statistics = storage.read_statistics()
+    total = int(statistics.loc[statistics['Date'].astype(str) == DAY, 'TotalEmails'].sum())
+    processed = ProcessedMessageStore(sidecar_path(database, '.processed'))
+
+    problems = []
+    if len(ids) != len(set(ids)):
+        problems.append(f"{len(ids) - len(set(ids))} duplicated log rows")
+    if expected - set(ids):
+        problems.append(f"{len(expected - set(ids))} missing log rows")
+    if set(ids) - expected:
+        problems.append(f"{len(set(ids) - expected)} unexpected log rows")
+    if total != len(expected):
+        problems.append(f"TotalEmails is {total}, expected {len(expected)}")
+    missing = [message_id for message_id in expected if message_id not in processed]
+    if missing:
+        problems.append(f"{len(missing)} message ids not marked processed")
+    if storage.journal.pending():
+        problems.append("journal left behind")
+    if list(database.parent.glob(f'.{database.name}.*.tmp')):
+        problems.append("temporary workbook left behind")
+    return problems
+
+
+def report(label: str, problems: list) -> bool:
+    """Print one check result"""
+    if problems:
+        print(f"✗ {label}: {'; '.join(problems)}")
+        return False
+    print(f"✓ {label}")
+    return True
+
+
+def main():
+    """Run the overlapping and crash checks; exit non-zero if any fails"""
+    parser = argparse.ArgumentParser(description='Check overlapping runs and crash recovery of the write journal')
+    parser.add_argument('--runs', type=int, default=3, help='Writers started at once')
+    parser.add_argument('--rows', type=int, default=300, help='Log rows per writer')
+    parser.add_argument('--batch', type=int, default=50, help='Log rows per commit')
+    parser.add_argument('--worker', type=Path, help=argparse.SUPPRESS)
+    parser.add_argument('--run', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--crash', choices=CRASH_POINTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.run, args.rows, args.batch, args.crash)
+        return 0
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+
+        database = new_database(directory, 'overlapping')
+        start = time.perf_counter()
+        writers = [start_worker(database, run, args.rows, args.batch) for run in range(args.runs)]
+        failed = [writer.returncode for writer in writers if writer.wait() != 0]
+        elapsed = time.perf_counter() - start
+        expected = {log_entry(run, number)['MessageId'] for run in range(args.runs) for number in range(args.rows)}
+        problems = [f"writers exited with {failed}"] if failed else check(database, expected)
+        ok &= report(f"{args.runs} overlapping runs of {args.rows} rows in {elapsed:.1f}s", problems)
+
+        for point, (description, *_) in CRASH_POINTS.items():
+            database = new_database(directory, point)
+            crashed = start_worker(database, 1, args.rows, args.batch, crash=point).wait()
+            if crashed != CRASH_EXIT:
+                ok &= report(f"Crash {description}", [f"writer exited with {crashed}, not at the crash point"])
+                continue
+            if start_worker(database, 2, args.rows, args.batch).wait() != 0:
+                ok &= report(f"Crash {description}", ["recovering run failed"])
+                continue
+            # The crashed run journaled its first batch before dying in its first commit
+            expected = {log_entry(1, number)['MessageId'] for number in range(min(args.batch, args.rows))}
+            expected |= {log_entry(2, number)['MessageId'] for number in range(args.rows)}
+            ok &= report(f"Crash {description}, recovered by the next run", check(database, expected))
+
+        # A crash in the middle of an append leaves a torn last line; it is skipped and later writes kept
+        database = new_database(directory, 'torn')
+        ExcelStorage(database).append_logs([log_entry(1, 0)])
+        with open(sidecar_path(database, '.journal'), 'a', encoding='utf-8') as fp:
+            fp.write('{"op": "logs", "rows": [{"MessageId": "torn')
+        worker(database, 2, 1, 1)
+        expected = {log_entry(1, 0)['MessageId'], log_entry(2, 0)['MessageId']}
+        processed = ProcessedMessageStore(sidecar_path(database, '.processed'))
+        processed.add(log_entry(1, 0)['MessageId'])
+        processed.save()
+        ExcelStorage(database).update_statistics(DAY, 1, 1, 0)
+        ok &= report("Torn journal line skipped, later writes kept", check(database, expected))
+
+        # A workbook that cannot be read is moved aside and a new one created, once
+        database = directory / 'unreadable.xlsx'
+        database.write_bytes(b'not a workbook')
+        with contextlib.redirect_stdout(io.StringIO()):
+            clusterer = EmailClusterer(database_path=str(database))
+        problems = check(database, set())
+        if not list(directory.glob('unreadable.unreadable-*.xlsx')):
+            problems.append("unreadable workbook not kept")
+        if not clusterer.categories:
+            problems.append("no rules loaded from the new workbook")
+        ok &= report("Unreadable workbook moved aside and recreated", problems)
+
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Parallel classification benchmark
+Measures bulk classification throughput for different worker counts
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from event_index import EventIndex  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from parallel import classify, classify_parallel  # noqa: E402
+from synthetic import SyntheticCorpus  # noqa: E402
+
+
+def main():
+    """Classify a synthetic corpus with 1..N workers and report emails per second"""
+    parser = argparse.ArgumentParser(description='Benchmark parallel classification')
+    parser.add_argument('--emails', type=int, default=200000)
+    parser.add_argument('--keywords', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(seed=args.seed, vocabulary_size=args.keywords * 2)
+    matcher = KeywordMatcher(corpus.keyword_table(args.keywords))
+    event_index = EventIndex(corpus.events(args.events))
+    emails = corpus.emails(args.emails)
+
+    start = time.perf_counter()
+    expected = [classify(matcher, event_index, email['subject'], email['sender']) for email in emails]
+    serial_time = time.perf_counter() - start
+    print(f"{'serial':>8}: {args.emails / serial_time:>10.0f} emails/s")
+
+    for workers in sorted(set(args.workers)):
+        start = time.perf_counter()
+        results = [result for _, result in classify_parallel(emails, matcher, event_index, workers)]
+        elapsed = time.perf_counter() - start
+        if results != expected:
+            print(f"✗ {workers} workers produced different results")
+            return 1
+        print(f"{workers:>8}: {args.emails / elapsed:>10.0f} emails/s ({serial_time / elapsed:.2f}x)")
+
+    print("✓ Results identical and in input order")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+AppleScript output parser benchmark
+Checks the streaming record tokenizer against the recorded fixtures and
+compares it with the legacy regex parser for speed and peak memory
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from applescript_records import iter_mail_records, iter_event_records  # noqa: E402
+from email_clusterer import EmailClusterer  # noqa: E402
+from records import EmailRecord  # noqa: E402
+from synthetic import SyntheticCorpus, applescript_mail_output, mail_record_output  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+
+
+def check_fixtures(legacy_parser) -> bool:
+    """Parse the recorded fixtures and compare with the expected records"""
+    ok = True
+    for name, tokenizer in (('mail_records', iter_mail_records), ('calendar_records', iter_event_records)):
+        expected = json.loads((FIXTURES / f'{name}.expected.json').read_text(encoding='utf-8'))
+        with open(FIXTURES / f'{name}.txt', encoding='utf-8', newline='') as fp:
+            parsed = [record.to_dict() if isinstance(record, EmailRecord) else record for record in tokenizer(fp)]
+        if parsed == expected:
+            print(f"✓ {name}: {len(parsed)} records parsed exactly")
+        else:
+            print(f"✗ {name}: parsed records differ from {name}.expected.json")
+            ok = False
+
+    expected = json.loads((FIXTURES / 'mail_records.expected.json').read_text(encoding='utf-8'))
+    legacy = legacy_parser((FIXTURES / 'mail_legacy.txt').read_text(encoding='utf-8'))
+    correct = sum(1 for record in legacy if record.to_dict() in expected)
+    print(f"  legacy regex parser: {correct}/{len(expected)} records correct on the same mail")
+    return ok
+
+
+def measure(func):
+    """Return (seconds, peak traced bytes) for one call"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    """Check fixtures, then compare both parsers on a synthetic inbox"""
+    parser = argparse.ArgumentParser(description='Benchmark AppleScript output parsing')
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    clusterer = EmailClusterer.__new__(EmailClusterer)
+    if not check_fixtures(clusterer.parse_applescript_list):
+        return 1
+
+    emails = SyntheticCorpus(seed=args.seed).emails(args.records)
+    legacy_output = applescript_mail_output(emails)
+    record_output = mail_record_output(emails)
+    del emails
+
+    # The legacy path needs all of stdout as one string before parsing
+    legacy_time, legacy_peak = measure(lambda: len(clusterer.parse_applescript_list(legacy_output)))
+
+    # The streaming path sees stdout one line at a time and keeps no records
+    stream = io.StringIO(record_output)
+    stream_time, stream_peak = measure(lambda: sum(1 for _ in iter_mail_records(stream)))
+
+    print(f"\nRecords: {args.records}")
+    print(f"Legacy regex:     {legacy_time:.3f} s, peak {legacy_peak / 1e6:.1f} MB (excluding captured stdout)")
+    print(f"Streaming tokens: {stream_time:.3f} s, peak {stream_peak / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
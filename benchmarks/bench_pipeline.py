@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Pipelined fetch benchmark
+Runs the Apple Mail path end to end against the stub osascript, once with
+the sequential fetch and once with paged, concurrent fetching, and reports
+wall time for each. Works on Linux; delays emulate Mail and Calendar.
+"""
+
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from synthetic import SyntheticCorpus, mail_record_output, calendar_record_output  # noqa: E402
+
+
+def run(database: Path, env, limit: int, page_size: int) -> float:
+    """Run one Apple Mail pass with the stub and return its wall time"""
+    command = [sys.executable, str(BENCH_DIR.parent / 'email_clusterer.py'), '--database', str(database),
+               '--limit', str(limit), '--reprocess', '--page-size', str(page_size)]
+    start = time.perf_counter()
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def logged(database: Path):
+    """Return the classified rows of a database in log order"""
+    with sqlite3.connect(database) as conn:
+        return conn.execute('SELECT message_id, category, calendar_match, matched_event '
+                            'FROM logs ORDER BY id').fetchall()
+
+
+def main():
+    """Compare sequential and pipelined fetching of a synthetic inbox"""
+    parser = argparse.ArgumentParser(description='Benchmark pipelined Mail and Calendar fetching')
+    parser.add_argument('--emails', type=int, default=200)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--mail-delay', type=float, default=0.2, help='Seconds per Mail call')
+    parser.add_argument('--record-delay', type=float, default=0.01, help='Seconds per Mail record')
+    parser.add_argument('--calendar-delay', type=float, default=1.5, help='Seconds per Calendar call')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / 'mail.txt').write_text(mail_record_output(corpus.emails(args.emails)), encoding='utf-8')
+        (tmp / 'calendar.txt').write_text(calendar_record_output(corpus.events(args.events)), encoding='utf-8')
+
+        env = dict(os.environ,
+                   PATH=f"{BENCH_DIR / 'stub'}{os.pathsep}{os.environ.get('PATH', '')}",
+                   STUB_OSASCRIPT_MAIL=str(tmp / 'mail.txt'),
+                   STUB_OSASCRIPT_CALENDAR=str(tmp / 'calendar.txt'),
+                   STUB_OSASCRIPT_MAIL_DELAY=str(args.mail_delay),
+                   STUB_OSASCRIPT_RECORD_DELAY=str(args.record_delay),
+                   STUB_OSASCRIPT_CALENDAR_DELAY=str(args.calendar_delay))
+
+        # Each run gets its own database, so neither sees the other's calendar cache
+        sequential = run(tmp / 'sequential.sqlite', env, args.emails, 0)
+        pipelined = run(tmp / 'pipelined.sqlite', env, args.emails, args.page_size)
+
+        print(f"{'sequential':>10}: {sequential:6.2f}s")
+        print(f"{'pipelined':>10}: {pipelined:6.2f}s ({sequential / pipelined:.2f}x, "
+              f"pages of {args.page_size})")
+
+        if logged(tmp / 'sequential.sqlite') != logged(tmp / 'pipelined.sqlite'):
+            print("✗ Pipelined run logged different results")
+            return 1
+
+    print("✓ Results identical and in inbox order")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Email record benchmark
+Compares the per-message dict pipeline of earlier versions with EmailRecord
+for memory held per parsed email, live allocations, and the time and peak
+memory of a streamed parse, classify and log run
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from applescript_records import MAIL_FIELDS, iter_mail_records, iter_records  # noqa: E402
+from email_clusterer import EmailClusterer, LogSink  # noqa: E402
+from event_index import EventIndex  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from synthetic import SyntheticCorpus, mail_record_output  # noqa: E402
+
+
+# Log entries per sink flush, as for a streamed source
+LOG_BATCH_SIZE = 1000
+
+
+def parse_dicts(lines):
+    """Parse the Mail script output into one dict per email, as earlier versions did"""
+    return iter_records(lines, MAIL_FIELDS)
+
+
+def run_dicts(clusterer, lines, event_index):
+    """Classify and log emails parsed as dicts, copying each result into email_data"""
+    for email in parse_dicts(lines):
+        category, confidence = clusterer.categorize_email(email)
+        has_calendar_match, matched_event = clusterer.check_calendar_match(email, event_index)
+        email_data = {
+            'subject': email.get('subject', 'No Subject'),
+            'sender': email.get('sender', 'Unknown'),
+            'category': category,
+            'confidence': confidence,
+            'calendar_match': has_calendar_match,
+            'matched_event': matched_event,
+            'message_id': email.get('message_id', '')
+        }
+        clusterer.save_log_entry(email_data)
+    clusterer.flush_logs()
+
+
+def run_records(clusterer, lines, event_index):
+    """Classify and log emails parsed as EmailRecords"""
+    for email in iter_mail_records(lines):
+        category, confidence = clusterer.categorize_email(email)
+        has_calendar_match, matched_event = clusterer.check_calendar_match(email, event_index)
+        clusterer.log_result(email, category, confidence, has_calendar_match, matched_event)
+    clusterer.flush_logs()
+
+
+def held(parse, lines, classify):
+    """Return (bytes, live blocks) per email for a parsed inbox held in a list
+
+    With classify, every email is also categorized, matched and logged
+    first, as process_emails does.
+    """
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    emails = list(parse(iter(lines)))
+    if classify is not None:
+        for email in emails:
+            classify(email)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks
+    count = len(emails)
+    del emails
+    return size / count, blocks / count
+
+
+def streamed(run, clusterer, lines, event_index):
+    """Return (seconds, peak traced bytes) for one streamed run"""
+    start = time.perf_counter()
+    run(clusterer, iter(lines), event_index)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    run(clusterer, iter(lines), event_index)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def new_clusterer(corpus, keywords):
+    """A clusterer with synthetic rules whose log batches are discarded"""
+    clusterer = EmailClusterer.__new__(EmailClusterer)
+    clusterer.categories = corpus.keyword_table(keywords)
+    clusterer.matcher = KeywordMatcher(clusterer.categories)
+    clusterer.log_sink = LogSink(lambda entries: None, batch_size=LOG_BATCH_SIZE)
+    return clusterer
+
+
+def main():
+    """Compare dict and record pipelines on a synthetic inbox"""
+    parser = argparse.ArgumentParser(description='Benchmark email dicts against EmailRecords')
+    parser.add_argument('--emails', type=int, default=200000)
+    parser.add_argument('--keywords', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(seed=args.seed)
+    clusterer = new_clusterer(corpus, args.keywords)
+    event_index = EventIndex(corpus.events(args.events))
+    # Output lines are split up front so only the pipeline's own memory is traced
+    lines = mail_record_output(corpus.emails(args.emails)).splitlines(keepends=True)
+
+    def classify(email):
+        category, confidence = clusterer.categorize_email(email)
+        has_calendar_match, matched_event = clusterer.check_calendar_match(email, event_index)
+        clusterer.log_result(email, category, confidence, has_calendar_match, matched_event)
+
+    print(f"Emails: {args.emails}, keywords: {args.keywords}, events: {args.events}\n")
+    print(f"{'':28}{'dict':>12}{'EmailRecord':>14}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        dict_parsed = held(parse_dicts, lines, None)
+        record_parsed = held(iter_mail_records, lines, None)
+        dict_classified = held(parse_dicts, lines, classify)
+        record_classified = held(iter_mail_records, lines, classify)
+    print(f"{'Bytes per parsed email':28}{dict_parsed[0]:>12.0f}{record_parsed[0]:>14.0f}")
+    print(f"{'Live blocks per email':28}{dict_parsed[1]:>12.1f}{record_parsed[1]:>14.1f}")
+    print(f"{'Bytes per classified email':28}{dict_classified[0]:>12.0f}{record_classified[0]:>14.0f}")
+
+    dict_time, dict_peak = streamed(run_dicts, clusterer, lines, event_index)
+    record_time, record_peak = streamed(run_records, clusterer, lines, event_index)
+    print(f"{'Streamed run (s)':28}{dict_time:>12.2f}{record_time:>14.2f}")
+    print(f"{'Streamed run peak (MB)':28}{dict_peak / 1e6:>12.1f}{record_peak / 1e6:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Log replay benchmark
+Compares replay_logs with re-categorizing the logged emails one at a time
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from email_clusterer import EmailClusterer  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from replay import replay_logs  # noqa: E402
+from storage import LOG_READ_BATCH_SIZE, require_pandas  # noqa: E402
+from synthetic import SyntheticCorpus  # noqa: E402
+
+
+def main():
+    """Check identical transition counts and report logged rows per second"""
+    parser = argparse.ArgumentParser(description='Benchmark replay_logs')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--distinct', type=int, default=0,
+                        help='Number of distinct subject/sender pairs in the log (default: all distinct)')
+    parser.add_argument('--keywords', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    pd = require_pandas()
+    corpus = SyntheticCorpus(seed=args.seed, vocabulary_size=args.keywords * 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clusterer = EmailClusterer(database_path=str(Path(tmp) / 'bench.sqlite'))
+
+    clusterer.categories = corpus.keyword_table(args.keywords)
+    clusterer.matcher = KeywordMatcher(clusterer.categories)
+    logged_categories = list(clusterer.categories) + ['Uncategorized']
+
+    emails = [(email['subject'], email['sender']) for email in corpus.emails(args.rows, args.distinct)]
+    logs = pd.DataFrame({
+        'Timestamp': pd.date_range('2024-01-01', periods=args.rows, freq='min'),
+        'Subject': [subject for subject, _ in emails],
+        'Sender': [sender for _, sender in emails],
+        'Category': [corpus.rng.choice(logged_categories) for _ in range(args.rows)],
+    })
+    batches = [logs.iloc[start:start + LOG_READ_BATCH_SIZE] for start in range(0, args.rows, LOG_READ_BATCH_SIZE)]
+
+    start = time.perf_counter()
+    expected = {}
+    for (subject, sender), old in zip(emails, logs['Category'].tolist()):
+        new, _ = clusterer.categorize_email({'subject': subject, 'sender': sender})
+        expected[(old, new)] = expected.get((old, new), 0) + 1
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix, sample = replay_logs(batches, clusterer.categorize_many)
+    replay_time = time.perf_counter() - start
+
+    actual = {pair: count for pair, count in matrix.stack().items() if count}
+    if actual != expected:
+        print("✗ replay_logs differs from categorize_email")
+        return 1
+
+    changed = args.rows - sum(count for (old, new), count in expected.items() if old == new)
+    label = f"{args.distinct} distinct" if args.distinct else "all distinct"
+    print(f"Logged rows: {args.rows} ({label}), keywords: {args.keywords}, changed: {changed}")
+    print(f"Per-email loop: {args.rows / loop_time:>10.0f} rows/s")
+    print(f"replay_logs:    {args.rows / replay_time:>10.0f} rows/s ({loop_time / replay_time:.1f}x)")
+    print("✓ Transition counts identical to categorize_email")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
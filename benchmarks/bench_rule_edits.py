@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Rule edit benchmark
+Applies random add-keyword, disable-keyword and move-keyword edits and checks
+after each one that the rules patched in place, and the rules cache saved
+from them, match a fresh load of the database: same categories in the same
+order, same keyword mappings and the same category for every test text. On a
+workbook the edits are journaled, so it also checks the workbook once they
+are committed, and times edits on a workbook with a large keyword table and log
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from email_clusterer import EmailClusterer  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from rules_cache import RulesCache  # noqa: E402
+from storage import ExcelStorage  # noqa: E402
+from synthetic import SyntheticCorpus  # noqa: E402
+
+
+# Few keywords and categories, so edits collide and scores tie often
+KEYWORDS = ['meeting', 'project', 'family', 'invoice', 'order', 'event', 'party', 'flight', 'hotel',
+            'update', 'ticket', 'help', 'report', 'dinner', 'trip', 'sale', 'alpha', 'beta']
+CATEGORIES = ['Work', 'Personal', 'Finance', 'Shopping', 'Social', 'Travel', 'Newsletter', 'Support',
+              'Health', 'Hobby']
+
+
+def describe(categories, keyword_mappings, matcher, texts):
+    """Everything a load of the rules decides: order, listings, mappings, compiled outputs, results"""
+    outputs = {keyword: sorted((matcher.category_names[cat_idx], count)
+                               for cat_idx, count in matcher.keyword_outputs[keyword_id])
+               for keyword, keyword_id in matcher.keyword_ids.items()}
+    return {
+        'categories': list(categories.items()),
+        'keyword_mappings': keyword_mappings,
+        'matcher categories': matcher.category_names,
+        'matcher keywords': {keyword: found for keyword, found in outputs.items() if found},
+        'empty keyword scores': matcher.always_scores,
+        'results': [matcher.categorize(text) for text in texts],
+        'batch results': list(zip(*matcher.categorize_many(texts)))
+    }
+
+
+def random_edit(clusterer, rng):
+    """Apply one random edit through the clusterer"""
+    keyword = rng.choice(KEYWORDS)
+    kind = rng.choice(['add', 'add', 'disable', 'move'])
+    if kind == 'add':
+        clusterer.add_keyword(rng.choice(CATEGORIES), keyword)
+    elif kind == 'disable':
+        clusterer.disable_keyword(keyword, rng.choice([None, rng.choice(CATEGORIES)]))
+    else:
+        clusterer.move_keyword(keyword, rng.choice(CATEGORIES), rng.choice([None, rng.choice(CATEGORIES)]))
+
+
+def fresh_load(storage, texts):
+    """Describe the rules as a new run would load them from the database"""
+    categories, keyword_mappings = EmailClusterer._parse_rules(EmailClusterer._active_rules(storage.load_rules()))
+    return describe(categories, keyword_mappings, KeywordMatcher(categories), texts)
+
+
+def check_edits(backend: str, edits: int, rng, texts) -> bool:
+    """Run random edits on a new database and compare each result with a fresh load"""
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Path(tmp) / f'rules.{backend}'
+        with contextlib.redirect_stdout(io.StringIO()):
+            clusterer = EmailClusterer(database_path=str(database))
+
+        edit_time = 0.0
+        compile_time = 0.0
+        for edit in range(1, edits + 1):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                random_edit(clusterer, rng)
+                edit_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            fresh = fresh_load(clusterer.storage, texts)
+            compile_time += time.perf_counter() - start
+
+            patched = describe(clusterer.categories, clusterer.keyword_mappings, clusterer.matcher, texts)
+            cached_rules = RulesCache(database).load()
+            cached = describe(*cached_rules[1:], texts) if cached_rules is not None else None
+
+            for label, state in (('patched rules', patched), ('rules cache', cached)):
+                if state is None:
+                    print(f"✗ Edit {edit} on {backend}: the rules cache was not kept warm")
+                    return False
+                differing = [key for key in fresh if state[key] != fresh[key]]
+                if differing:
+                    print(f"✗ Edit {edit} on {backend}: {label} differ from a fresh load in {', '.join(differing)}")
+                    return False
+
+        print(f"Edits: {edits} on {backend}, test texts: {len(texts)}")
+        print(f"In-place edit (incl. write): {edit_time / edits * 1000:>8.1f} ms")
+        print(f"Re-read and recompile:       {compile_time / edits * 1000:>8.1f} ms")
+
+        if backend == 'xlsx':
+            # The journaled edits, applied to the sheet, must give the same rules
+            clusterer.storage.commit()
+            committed = fresh_load(ExcelStorage(database), texts)
+            differing = [key for key in committed if patched[key] != committed[key]]
+            if differing or clusterer.storage.rules_journal.pending():
+                print(f"✗ Committed workbook differs from the patched rules in {', '.join(differing) or 'journal'}")
+                return False
+    print(f"✓ Patched rules and rules cache identical to a fresh load after every edit on {backend}")
+    return True
+
+
+def time_large_workbook(keywords: int, logs: int, edits: int, seed: int):
+    """Time add_keyword and disable_keyword on a workbook with many keyword and log rows"""
+    corpus = SyntheticCorpus(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Path(tmp) / 'large.xlsx'
+        storage = ExcelStorage(database)
+        storage.create(corpus.category_rows(keywords))
+        storage.append_logs(corpus.log_rows(logs))
+        storage.commit()
+        with contextlib.redirect_stdout(io.StringIO()):
+            clusterer = EmailClusterer(database_path=str(database))
+
+            added = [f'editword{number}' for number in range(edits)]
+            start = time.perf_counter()
+            for keyword in added:
+                clusterer.add_keyword('Category00', keyword)
+            add_time = (time.perf_counter() - start) / edits
+
+            start = time.perf_counter()
+            for keyword in added:
+                clusterer.disable_keyword(keyword)
+            disable_time = (time.perf_counter() - start) / edits
+
+    print(f"Workbook with {keywords} keywords and {logs} log rows, {edits} edits each:")
+    print(f"add_keyword:     {add_time * 1000:>8.1f} ms")
+    print(f"disable_keyword: {disable_time * 1000:>8.1f} ms")
+
+
+def main():
+    """Run random edits on each backend, then time edits on a large workbook"""
+    parser = argparse.ArgumentParser(description='Check in-place rule edits against fresh loads')
+    parser.add_argument('--edits', type=int, default=300)
+    parser.add_argument('--backend', choices=['sqlite', 'xlsx'], action='append',
+                        help='Backend to check (repeatable; default both)')
+    parser.add_argument('--large-keywords', type=int, default=3000, help='Keyword rows of the timed workbook')
+    parser.add_argument('--large-logs', type=int, default=30000, help='Log rows of the timed workbook (0 to skip)')
+    parser.add_argument('--large-edits', type=int, default=20, help='Timed edits of each kind')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = [' '.join(rng.sample(KEYWORDS, rng.randint(1, 4))) for _ in range(500)]
+
+    for backend in args.backend or ['sqlite', 'xlsx']:
+        if not check_edits(backend, args.edits, rng, texts):
+            return 1
+    if args.large_logs and 'xlsx' in (args.backend or ['xlsx']):
+        time_large_workbook(args.large_keywords, args.large_logs, args.large_edits, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Email Clustering System
+Times the hot paths on seeded synthetic data at sizes from 10^2 up to 10^N
+and writes machine-readable JSON that can be compared between versions.
+Runs on any machine; Mail and Calendar are never touched.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from email_clusterer import EmailClusterer  # noqa: E402
+from event_index import EventIndex  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from processed_store import ProcessedMessageStore  # noqa: E402
+from storage import open_storage  # noqa: E402
+from applescript_records import iter_mail_records, iter_event_records  # noqa: E402
+from synthetic import (SyntheticCorpus, applescript_mail_output, applescript_calendar_output,  # noqa: E402
+                       mail_record_output, calendar_record_output)
+
+
+# Per-item benchmarks time this many emails against each table size
+SAMPLE_EMAILS = 1000
+
+# Writing an xlsx with more rows than this takes minutes, so larger sizes are SQLite only
+XLSX_MAX_ROWS = 100000
+
+# A result this much slower than the comparison run is reported as a regression
+REGRESSION_RATIO = 1.2
+
+
+def quiet():
+    """Swallow the clusterer's progress output"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def new_clusterer(directory: Path, name: str = 'bench.sqlite') -> EmailClusterer:
+    """Create a clusterer on a fresh database"""
+    with quiet():
+        return EmailClusterer(database_path=str(directory / name))
+
+
+def bench_categorize_email(corpus, size, directory, backend):
+    """Per-email categorization time against a table of `size` keywords"""
+    clusterer = new_clusterer(directory)
+    clusterer.categories = corpus.keyword_table(size)
+
+    start = time.perf_counter()
+    clusterer.matcher = KeywordMatcher(clusterer.categories)
+    compile_s = time.perf_counter() - start
+
+    emails = corpus.emails(SAMPLE_EMAILS)
+    start = time.perf_counter()
+    for email in emails:
+        clusterer.categorize_email(email)
+    elapsed = time.perf_counter() - start
+
+    return {'per_item_us': elapsed / len(emails) * 1e6, 'setup_s': compile_s}
+
+
+def bench_check_calendar_match(corpus, size, directory, backend):
+    """Per-email calendar matching time against `size` events"""
+    clusterer = new_clusterer(directory)
+    events = corpus.events(size)
+
+    start = time.perf_counter()
+    index = EventIndex(events)
+    build_s = time.perf_counter() - start
+
+    emails = corpus.emails(SAMPLE_EMAILS)
+    start = time.perf_counter()
+    for email in emails:
+        clusterer.check_calendar_match(email, index)
+    elapsed = time.perf_counter() - start
+
+    return {'per_item_us': elapsed / len(emails) * 1e6, 'setup_s': build_s}
+
+
+def bench_parse_applescript_list(corpus, size, directory, backend):
+    """Time to parse `size` mail records of osascript output"""
+    clusterer = new_clusterer(directory)
+    output = applescript_mail_output(corpus.emails(size))
+
+    start = time.perf_counter()
+    parsed = clusterer.parse_applescript_list(output)
+    elapsed = time.perf_counter() - start
+
+    assert len(parsed) == size
+    return {'seconds': elapsed, 'per_item_us': elapsed / size * 1e6, 'bytes': len(output)}
+
+
+def bench_parse_calendar_events(corpus, size, directory, backend):
+    """Time to parse `size` event records of osascript output"""
+    clusterer = new_clusterer(directory)
+    output = applescript_calendar_output(corpus.events(size))
+
+    start = time.perf_counter()
+    parsed = clusterer.parse_calendar_events(output)
+    elapsed = time.perf_counter() - start
+
+    assert len(parsed) == size
+    return {'seconds': elapsed, 'per_item_us': elapsed / size * 1e6, 'bytes': len(output)}
+
+
+def bench_iter_mail_records(corpus, size, directory, backend):
+    """Time to tokenize `size` mail records in the delimited format, streamed from a file"""
+    path = directory / 'mail.txt'
+    path.write_text(mail_record_output(corpus.emails(size)), encoding='utf-8')
+
+    start = time.perf_counter()
+    with open(path, encoding='utf-8') as fp:
+        count = sum(1 for _ in iter_mail_records(fp))
+    elapsed = time.perf_counter() - start
+
+    assert count == size
+    return {'seconds': elapsed, 'per_item_us': elapsed / size * 1e6, 'bytes': path.stat().st_size}
+
+
+def bench_iter_event_records(corpus, size, directory, backend):
+    """Time to tokenize `size` event records in the delimited format, streamed from a file"""
+    path = directory / 'events.txt'
+    path.write_text(calendar_record_output(corpus.events(size)), encoding='utf-8')
+
+    start = time.perf_counter()
+    with open(path, encoding='utf-8') as fp:
+        count = sum(1 for _ in iter_event_records(fp))
+    elapsed = time.perf_counter() - start
+
+    assert count == size
+    return {'seconds': elapsed, 'per_item_us': elapsed / size * 1e6, 'bytes': path.stat().st_size}
+
+
+def bench_load_database(corpus, size, directory, backend):
+    """Startup time with `size` keyword rows, cold and with a warm rules cache"""
+    database_path = directory / f'rules.{backend}'
+    open_storage(database_path).create(corpus.category_rows(size))
+
+    start = time.perf_counter()
+    with quiet():
+        EmailClusterer(database_path=str(database_path))
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with quiet():
+        EmailClusterer(database_path=str(database_path))
+    warm = time.perf_counter() - start
+
+    return {'seconds': cold, 'warm_seconds': warm}
+
+
+def bench_save_log_entry(corpus, size, directory, backend):
+    """Per-email logging cost and flush time with `size` rows already logged"""
+    clusterer = new_clusterer(directory, f'logs.{backend}')
+    for offset in range(0, size, 100000):
+        clusterer.storage.append_logs(corpus.log_rows(min(100000, size - offset)))
+    clusterer.storage.commit()
+
+    email_data = {'subject': 'Quarterly report', 'sender': 'boss@example.com',
+                  'category': 'Work', 'confidence': 0.33, 'calendar_match': False,
+                  'matched_event': '', 'message_id': 'bench'}
+
+    start = time.perf_counter()
+    for _ in range(100):
+        clusterer.save_log_entry(email_data)
+    per_email = (time.perf_counter() - start) / 100
+
+    start = time.perf_counter()
+    with quiet():
+        clusterer.flush_logs()
+        # Workbook logs are journaled; the rewrite happens at commit
+        clusterer.storage.commit()
+    flush = time.perf_counter() - start
+
+    return {'per_item_us': per_email * 1e6, 'flush_s': flush}
+
+
+def bench_rebuild_rollups(corpus, size, directory, backend):
+    """Time to recompute statistics and rollups from `size` log rows"""
+    clusterer = new_clusterer(directory, f'rollups.{backend}')
+    for offset in range(0, size, 100000):
+        clusterer.storage.append_logs(corpus.log_rows(min(100000, size - offset)))
+    clusterer.storage.commit()
+
+    start = time.perf_counter()
+    with quiet():
+        clusterer.rebuild_statistics()
+    elapsed = time.perf_counter() - start
+
+    return {'seconds': elapsed, 'per_item_us': elapsed / size * 1e6}
+
+
+def bench_processed_save(corpus, size, directory, backend):
+    """Time to record `size` processed message ids saved 1000 at a time, as a streamed backfill does"""
+    processed = ProcessedMessageStore(directory / 'bench.processed')
+
+    start = time.perf_counter()
+    for offset in range(0, size, 1000):
+        processed.update(f'<{number}@bench.example>' for number in range(offset, min(offset + 1000, size)))
+        processed.save()
+    elapsed = time.perf_counter() - start
+
+    return {'seconds': elapsed, 'per_item_us': elapsed / size * 1e6}
+
+
+BENCHMARKS = {
+    'categorize_email': (bench_categorize_email, ['sqlite']),
+    'check_calendar_match': (bench_check_calendar_match, ['sqlite']),
+    'parse_applescript_list': (bench_parse_applescript_list, ['sqlite']),
+    'parse_calendar_events': (bench_parse_calendar_events, ['sqlite']),
+    'iter_mail_records': (bench_iter_mail_records, ['sqlite']),
+    'iter_event_records': (bench_iter_event_records, ['sqlite']),
+    'load_database': (bench_load_database, ['xlsx', 'sqlite']),
+    'save_log_entry': (bench_save_log_entry, ['xlsx', 'sqlite']),
+    'rebuild_rollups': (bench_rebuild_rollups, ['sqlite']),
+    'processed_save': (bench_processed_save, ['sqlite']),
+}
+
+
+def git_revision() -> str:
+    """Return the current commit, if the suite runs inside the repository"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=10).stdout.strip()
+    except Exception:
+        return ''
+
+
+def compare(results, baseline_path):
+    """Print the ratio of each result to a previous run; return the number of regressions"""
+    with open(baseline_path) as fp:
+        baseline = {(r['benchmark'], r['backend'], r['size']): r for r in json.load(fp)['results']}
+
+    regressions = 0
+    print(f"\nComparison with {baseline_path}:")
+    for result in results:
+        previous = baseline.get((result['benchmark'], result['backend'], result['size']))
+        metric = 'per_item_us' if 'per_item_us' in result else 'seconds'
+        if not previous or not previous.get(metric):
+            continue
+        ratio = result[metric] / previous[metric]
+        flag = '  ✗ regression' if ratio > REGRESSION_RATIO else ''
+        regressions += bool(flag)
+        print(f"  {result['benchmark']:<24} {result['backend']:<7} {result['size']:>8}  {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    """Run the selected benchmarks and write JSON results"""
+    parser = argparse.ArgumentParser(description='Benchmark the Email Clustering System')
+    parser.add_argument('--max-exp', type=int, default=5,
+                        help='Largest size is 10^N (default: 5; use 6 for the full range)')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='Run only these benchmarks')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', metavar='JSON', help='Compare with the results of an earlier run')
+    args = parser.parse_args()
+
+    sizes = [10 ** exp for exp in range(2, args.max_exp + 1)]
+    results = []
+
+    for name in args.only or BENCHMARKS:
+        func, backends = BENCHMARKS[name]
+        for backend in backends:
+            for size in sizes:
+                if backend == 'xlsx' and size > XLSX_MAX_ROWS:
+                    continue
+                corpus = SyntheticCorpus(seed=args.seed)
+                with tempfile.TemporaryDirectory() as tmp:
+                    metrics = func(corpus, size, Path(tmp), backend)
+                result = {'benchmark': name, 'backend': backend, 'size': size, **metrics}
+                results.append(result)
+                shown = ', '.join(f"{k}={v:.4g}" for k, v in metrics.items())
+                print(f"{name:<24} {backend:<7} {size:>8}  {shown}", flush=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as fp:
+        json.dump(report, fp, indent=2)
+    print(f"\n✓ Results written to {args.output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
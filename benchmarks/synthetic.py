@@ -0,0 +1,117 @@
+"""
+Seeded synthetic corpora for the benchmarks
+Generates keyword tables, emails, calendar events and AppleScript output
+without needing Mail or Calendar
+"""
+
+import random
+import string
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from applescript_records import EVENT_FIELDS, MAIL_FIELDS, format_record  # noqa: E402
+
+
+SENDER_DOMAINS = ['example.com', 'work.example', 'shop.example', 'news.example', 'bank.example']
+
+
+class SyntheticCorpus:
+    """Deterministic generator for benchmark inputs"""
+
+    def __init__(self, seed: int = 42, vocabulary_size: int = 20000):
+        self.rng = random.Random(seed)
+        self.vocabulary = sorted({self._word() for _ in range(vocabulary_size)})
+
+    def _word(self) -> str:
+        return ''.join(self.rng.choice(string.ascii_lowercase) for _ in range(self.rng.randint(3, 10)))
+
+    def phrase(self, low: int, high: int) -> str:
+        """Return a title-cased phrase of vocabulary words"""
+        return ' '.join(self.rng.choice(self.vocabulary).title() for _ in range(self.rng.randint(low, high)))
+
+    def keyword_table(self, n_keywords: int, n_categories: int = 20) -> Dict[str, List[str]]:
+        """Return a category -> keywords table with n_keywords entries"""
+        categories = {f'Category{i:02d}': [] for i in range(n_categories)}
+        names = list(categories)
+        for _ in range(n_keywords):
+            categories[self.rng.choice(names)].append(self.rng.choice(self.vocabulary))
+        return categories
+
+    def category_rows(self, n_keywords: int, n_categories: int = 20) -> List[Dict]:
+        """Return Categories sheet rows for n_keywords keywords"""
+        created = '2026-01-01 00:00:00'
+        return [{'Category': category, 'Keyword': keyword, 'Active': True, 'Created': created}
+                for category, keywords in self.keyword_table(n_keywords, n_categories).items()
+                for keyword in keywords]
+
+    def emails(self, n: int, distinct: int = 0) -> List[Dict]:
+        """Return n email dicts shaped like get_inbox_emails output, repeating distinct ones if given"""
+        if distinct:
+            pool = self.emails(distinct)
+            return [self.rng.choice(pool) for _ in range(n)]
+
+        start = datetime(2026, 1, 1)
+        result = []
+        for i in range(n):
+            user = self.rng.choice(self.vocabulary)
+            result.append({
+                'subject': self.phrase(3, 10),
+                'sender': f'{user.title()} <{user}@{self.rng.choice(SENDER_DOMAINS)}>',
+                'date_received': (start + timedelta(minutes=7 * i)).strftime('%A, %d %B %Y at %H:%M:%S'),
+                'message_id': str(100000 + i)
+            })
+        return result
+
+    def events(self, n: int) -> List[Dict]:
+        """Return n event dicts shaped like get_calendar_events output"""
+        start = datetime(2026, 1, 1, 9)
+        return [{
+            'summary': self.phrase(2, 6),
+            'start_date': (start + timedelta(minutes=30 * i)).strftime('%A, %d %B %Y at %H:%M:%S'),
+            'location': self.phrase(1, 3),
+            'start_offset': str(1800 * i)
+        } for i in range(n)]
+
+    def log_rows(self, n: int) -> List[Dict]:
+        """Return n EmailLogs rows"""
+        return [{
+            'Timestamp': '2026-01-01 00:00:00',
+            'Subject': email['subject'],
+            'Sender': email['sender'],
+            'Category': f'Category{self.rng.randrange(20):02d}',
+            'CalendarMatch': False,
+            'MatchedEvent': '',
+            'Confidence': 0.33,
+            'MessageId': email['message_id']
+        } for email in self.emails(n)]
+
+
+def applescript_mail_output(emails: List[Dict]) -> str:
+    """Render emails the way osascript prints the get_inbox_emails record list"""
+    return ', '.join(
+        f'{{subject:"{e["subject"]}", sender:"{e["sender"]}", '
+        f'dateReceived:"{e["date_received"]}", messageId:"{e["message_id"]}"}}'
+        for e in emails
+    )
+
+
+def applescript_calendar_output(events: List[Dict]) -> str:
+    """Render events the way osascript prints the get_calendar_events record list"""
+    return ', '.join(
+        f'{{summary:"{e["summary"]}", startDate:"{e["start_date"]}", location:"{e["location"]}"}}'
+        for e in events
+    )
+
+
+def mail_record_output(emails: List[Dict]) -> str:
+    """Render emails in the delimited record format of the Mail script"""
+    return ''.join(format_record([e[field] for field in MAIL_FIELDS]) + '\n' for e in emails)
+
+
+def calendar_record_output(events: List[Dict]) -> str:
+    """Render events in the delimited record format of the Calendar script"""
+    return ''.join(format_record([e[field] for field in EVENT_FIELDS]) + '\n' for e in events)
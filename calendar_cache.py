@@ -0,0 +1,99 @@
+"""
+On-disk calendar event cache for the Email Clustering System
+Reuses recently fetched events between runs and, once they expire, only
+fetches the part of the look-ahead window that is new since the last fetch
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+
+# Seconds a fetched event list is reused as-is
+DEFAULT_TTL = 15 * 60
+
+# Incremental refreshes only add new days at the end of the window, so edits to
+# events already cached are picked up by a full refresh at least this often
+FULL_REFRESH_INTERVAL = 6 * 60 * 60
+
+
+class CalendarCache:
+    """Persistent upcoming-event list with TTL, incremental refresh and hit/miss counters
+
+    fetch(start_offset, days_ahead) must return events starting between
+    start_offset seconds and days_ahead days from now, each with a
+    'start_ts' epoch timestamp, and raise if Calendar cannot be read. A
+    failed fetch is never cached; the previous events are served instead.
+    """
+
+    def __init__(self, path, ttl: int = DEFAULT_TTL, incremental: bool = True):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.incremental = incremental
+        self.state = self._read()
+        self.last_result = None
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, encoding='utf-8') as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {'hits': 0, 'misses': 0, 'incremental': 0}
+
+    def _write(self):
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as fp:
+                json.dump(self.state, fp)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not write calendar cache: {e}")
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Lifetime hit, miss and incremental refresh counts"""
+        return {key: self.state.get(key, 0) for key in ('hits', 'misses', 'incremental')}
+
+    def get(self, fetch: Callable[[int, int], List[Dict]], days_ahead: int,
+            refresh: bool = False) -> List[Dict]:
+        """Return upcoming events, fetching only what the cache cannot answer"""
+        now = time.time()
+        window_end = now + days_ahead * 86400
+        events = self.state.get('events')
+        fetched_at = self.state.get('fetched_at', 0)
+        usable = (events is not None and not refresh
+                  and self.state.get('days_ahead') == days_ahead
+                  and fetched_at <= now)
+
+        if usable and now - fetched_at < self.ttl:
+            self.last_result = 'hit'
+            self.state['hits'] = self.state.get('hits', 0) + 1
+            self._write()
+            return [event for event in events if event['start_ts'] >= now]
+
+        cached_end = self.state.get('window_end', 0)
+        try:
+            if (usable and self.incremental and now < cached_end
+                    and now - self.state.get('full_fetched_at', 0) < FULL_REFRESH_INTERVAL):
+                # Keep events still ahead of us and fetch only the newly exposed days
+                kept = [event for event in events if now <= event['start_ts'] < cached_end]
+                new_events = [event for event in fetch(int(cached_end - now), days_ahead)
+                              if event['start_ts'] >= cached_end]
+                self.last_result = 'incremental'
+                self.state['incremental'] = self.state.get('incremental', 0) + 1
+                self.state.update(events=kept + new_events, fetched_at=now, window_end=window_end)
+            else:
+                fetched = fetch(0, days_ahead)
+                self.last_result = 'miss'
+                self.state['misses'] = self.state.get('misses', 0) + 1
+                self.state.update(events=fetched, fetched_at=now, full_fetched_at=now,
+                                  window_end=window_end, days_ahead=days_ahead)
+        except Exception as e:
+            print(f"Calendar access error: {e}")
+            self.last_result = 'stale'
+            return [event for event in events or [] if event['start_ts'] >= now]
+
+        self._write()
+        return list(self.state['events'])
@@ -0,0 +1,219 @@
+"""
+Near-duplicate clustering of uncategorized email for the Email Clustering System
+Groups similar subjects with MinHash signatures and locality-sensitive
+hashing, so finding clusters costs roughly linear time in the number of
+distinct subjects instead of comparing every pair
+"""
+
+import hashlib
+import re
+from collections import Counter
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
+
+from rollups import sender_domain
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# Signature length; split into BANDS bands of NUM_PERM // BANDS rows. Two
+# subjects share a band with high probability once their token sets overlap
+# by about (1 / BANDS) ** (BANDS / NUM_PERM), roughly 50% here
+NUM_PERM = 64
+BANDS = 16
+
+# Signature agreement a subject needs with its bucket's first subject to join it
+MIN_SIMILARITY = 0.5
+
+# Clusters smaller than this many emails are not reported
+MIN_CLUSTER_SIZE = 3
+
+# Share of a cluster's emails a word must appear in to count as representative
+TERM_SHARE = 0.5
+
+# Distinct subjects hashed per numpy step
+SIGNATURE_CHUNK = 20000
+
+STOPWORDS = {
+    'the', 'and', 'for', 'you', 'your', 'our', 'are', 'with', 'from', 'this',
+    'that', 'has', 'have', 'was', 'will', 'not', 'can', 'all', 'new', 'now',
+    'get', 'out', 'about', 'just', 'more', 'here', 'fwd', 'fw', 're', 'aw'
+}
+
+_WORD_RE = re.compile(r'[^\W\d_]{3,}')
+
+
+def subject_tokens(subject: str) -> Tuple[str, ...]:
+    """Return the sorted distinct words of a subject, ignoring numbers and stopwords"""
+    words = set(_WORD_RE.findall(str(subject or '').lower())) - STOPWORDS
+    return tuple(sorted(words))
+
+
+def token_hash(token: str) -> int:
+    """Stable 32-bit hash of a token, the same in every run"""
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+def minhash_signatures(docs: List[Tuple[str, ...]], seed: int = 1) -> 'np.ndarray':
+    """Return a (len(docs), NUM_PERM) uint32 MinHash signature per token tuple
+
+    Uses multiply-shift hashing, ((a * x + b) mod 2**64) >> 32 with odd a,
+    as the family of permutations. Every doc must have at least one token.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+
+    vocabulary = {}
+    signatures = np.empty((len(docs), NUM_PERM), dtype=np.uint32)
+
+    for start in range(0, len(docs), SIGNATURE_CHUNK):
+        chunk = docs[start:start + SIGNATURE_CHUNK]
+        lengths = np.fromiter((len(doc) for doc in chunk), dtype=np.int64, count=len(chunk))
+        hashes = np.fromiter(
+            (vocabulary[token] if token in vocabulary else vocabulary.setdefault(token, token_hash(token))
+             for doc in chunk for token in doc),
+            dtype=np.uint64, count=int(lengths.sum())
+        )
+        offsets = np.zeros(len(chunk), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+
+        with np.errstate(over='ignore'):
+            permuted = (a[:, None] * hashes[None, :] + b[:, None]) >> np.uint64(32)
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+
+    return signatures
+
+
+def lsh_components(signatures: 'np.ndarray') -> 'np.ndarray':
+    """Return a component label per row, joining rows that collide in an LSH band
+
+    A row is only joined to its bucket's first row when their signatures
+    agree in at least MIN_SIMILARITY of positions, which keeps unrelated
+    subjects from chaining large clusters together.
+    """
+    import numpy as np
+
+    count = len(signatures)
+    rows = NUM_PERM // BANDS
+    sources, targets = [], []
+
+    for band in range(BANDS):
+        keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * rows))).ravel()
+        _, first, bucket = np.unique(keys, return_index=True, return_inverse=True)
+        leader = first[bucket.ravel()]
+
+        candidates = np.nonzero(leader != np.arange(count))[0]
+        if not len(candidates):
+            continue
+        agreement = (signatures[candidates] == signatures[leader[candidates]]).mean(axis=1)
+        similar = candidates[agreement >= MIN_SIMILARITY]
+        sources.append(similar)
+        targets.append(leader[similar])
+
+    labels = np.arange(count)
+    if not sources:
+        return labels
+
+    sources = np.concatenate(sources)
+    targets = np.concatenate(targets)
+
+    # Propagate the smallest label along edges until every component agrees
+    while True:
+        smallest = np.minimum(labels[sources], labels[targets])
+        updated = labels.copy()
+        np.minimum.at(updated, sources, smallest)
+        np.minimum.at(updated, targets, smallest)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def cluster_subjects(subjects: Iterable[str], senders: Iterable[str], top: int = 10,
+                     min_size: int = MIN_CLUSTER_SIZE) -> List[Dict]:
+    """Group near-duplicate subjects and return the largest clusters
+
+    Each cluster is a dict with size (emails), subjects (distinct), terms
+    (representative words, most common first), example (most common
+    subject) and domain (most common sender domain).
+    """
+    import numpy as np
+
+    # Identical token sets are hashed once, however many emails share them
+    doc_ids = {}
+    docs = []
+    doc_emails = []
+    for subject, sender in zip(subjects, senders):
+        tokens = subject_tokens(subject)
+        if not tokens:
+            continue
+        doc_id = doc_ids.get(tokens)
+        if doc_id is None:
+            doc_id = doc_ids[tokens] = len(docs)
+            docs.append(tokens)
+            doc_emails.append([])
+        doc_emails[doc_id].append((subject, sender))
+
+    if not docs:
+        return []
+
+    labels = lsh_components(minhash_signatures(docs))
+    sizes = np.bincount(labels, weights=[len(emails) for emails in doc_emails])
+    largest = [int(label) for label in np.argsort(-sizes, kind='stable')[:top] if sizes[label] >= min_size]
+
+    members = {label: [] for label in largest}
+    for doc_id, label in enumerate(labels.tolist()):
+        if label in members:
+            members[label].append(doc_id)
+
+    clusters = []
+    for label in largest:
+        size = int(sizes[label])
+        terms = Counter()
+        examples = Counter()
+        domains = Counter()
+        for doc_id in members[label]:
+            for token in docs[doc_id]:
+                terms[token] += len(doc_emails[doc_id])
+            for subject, sender in doc_emails[doc_id]:
+                examples[subject] += 1
+                domains[sender_domain(sender)] += 1
+
+        common = [term for term, count in terms.most_common() if count >= size * TERM_SHARE]
+        clusters.append({
+            'size': size,
+            'subjects': len(examples),
+            'terms': common or [terms.most_common(1)[0][0]],
+            'example': examples.most_common(1)[0][0],
+            'domain': domains.most_common(1)[0][0]
+        })
+
+    return clusters
+
+
+def suggested_keyword_rows(clusters: List[Dict], existing_keywords: Iterable[str],
+                           terms_per_cluster: int = 3) -> List[Dict]:
+    """Return inactive Categories rows suggesting each cluster's terms as keywords
+
+    The category is named after the cluster's terms; keywords already in
+    the Categories sheet, active or not, are not suggested again.
+    """
+    seen = {str(keyword).lower() for keyword in existing_keywords}
+    created = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+
+    for cluster in clusters:
+        terms = cluster['terms'][:terms_per_cluster]
+        category = 'Suggested: ' + ' '.join(terms)
+        for term in terms:
+            if term in seen:
+                continue
+            seen.add(term)
+            rows.append({'Category': category, 'Keyword': term, 'Active': False, 'Created': created})
+
+    return rows
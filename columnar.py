@@ -0,0 +1,192 @@
+"""
+Columnar export and reports for the Email Clustering System
+Writes logs, statistics and rollups as Parquet, with logs partitioned by
+month, and answers common questions by reading only the columns and
+months a report needs
+"""
+
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+from rollups import DOMAIN_PATTERN
+from sender_cache import ADDRESS_PATTERN
+from storage import require_pandas
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+
+# Reports and the columns they read
+REPORT_COLUMNS = {
+    'category-mix': ['Week', 'Category'],
+    'calendar-rate': ['Week', 'CalendarMatch'],
+    'top-senders': ['Category', 'SenderAddress'],
+}
+
+
+def require_pyarrow():
+    """Import pyarrow on first use; it is only needed for Parquet export and reports"""
+    try:
+        import pyarrow
+        import pyarrow.dataset  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        print("ERROR: Parquet export and reports need pyarrow.")
+        print("Please run: pip3 install pyarrow")
+        sys.exit(1)
+    return pyarrow
+
+
+def _log_frame(logs: 'pd.DataFrame') -> 'pd.DataFrame':
+    """Add the derived columns reports filter and group on"""
+    pd = require_pandas()
+    logs = logs.copy()
+    timestamps = pd.to_datetime(logs['Timestamp'].astype(str), errors='coerce')
+    logs['Timestamp'] = timestamps
+    days = timestamps.dt.normalize()
+    logs['Date'] = days.dt.date
+    logs['Week'] = (days - pd.to_timedelta(timestamps.dt.weekday, unit='D')).dt.date
+    logs['month'] = timestamps.dt.strftime('%Y-%m')
+
+    senders = logs['Sender'].fillna('').astype(str)
+    logs['SenderAddress'] = (senders.str.extract(ADDRESS_PATTERN, expand=False)
+                             .fillna(senders).str.strip().str.lower())
+    logs['SenderDomain'] = senders.str.extract(DOMAIN_PATTERN, expand=False).str.lower().fillna('')
+    logs['CalendarMatch'] = logs['CalendarMatch'].fillna(False).astype(bool)
+    logs['Confidence'] = pd.to_numeric(logs['Confidence'], errors='coerce').fillna(0.0)
+    for column in ('Subject', 'Sender', 'Category', 'MatchedEvent', 'MessageId'):
+        logs[column] = logs[column].fillna('').astype(str)
+    return logs
+
+
+def export_parquet(storage, output_dir) -> Tuple[int, int]:
+    """Write logs, statistics and rollups under output_dir as Parquet
+
+    Logs go to output_dir/logs/month=YYYY-MM/, statistics and rollups to
+    one file each. The export replaces any earlier one in a single rename.
+    Returns (log rows, months) written.
+    """
+    pa = require_pyarrow()
+    import pyarrow.parquet as pq
+
+    output_dir = Path(output_dir)
+    staging = output_dir.with_name(output_dir.name + '.tmp')
+    if staging.exists():
+        shutil.rmtree(staging)
+    (staging / 'logs').mkdir(parents=True)
+
+    rows = 0
+    months = set()
+    for batch in storage.iter_logs():
+        if batch.empty:
+            continue
+        frame = _log_frame(batch)
+        for month, part in frame.groupby('month'):
+            directory = staging / 'logs' / f'month={month}'
+            directory.mkdir(exist_ok=True)
+            # Months split across batches get one file per batch
+            path = directory / f'part-{len(list(directory.iterdir()))}.parquet'
+            pq.write_table(pa.Table.from_pandas(part.drop(columns='month'), preserve_index=False), path)
+            rows += len(part)
+            months.add(month)
+
+    for name, frame in (('statistics', storage.read_statistics()), ('rollups', storage.read_rollups())):
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), staging / f'{name}.parquet')
+
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    staging.rename(output_dir)
+    return rows, len(months)
+
+
+def read_logs(data_dir, columns, start: Optional[str] = None, end: Optional[str] = None) -> 'pa.Table':
+    """Read only the given log columns for dates from start to end (YYYY-MM-DD, inclusive)
+
+    Month partitions outside the range are skipped without being opened.
+    """
+    require_pyarrow()
+    import pyarrow.dataset as ds
+
+    logs_dir = Path(data_dir) / 'logs'
+    if not logs_dir.is_dir():
+        raise FileNotFoundError(f"No Parquet export in {data_dir}; run with --export-parquet first")
+
+    dataset = ds.dataset(logs_dir, format='parquet', partitioning='hive')
+    conditions = []
+    if start is not None:
+        conditions += [ds.field('month') >= start[:7], ds.field('Date') >= _date(start)]
+    if end is not None:
+        conditions += [ds.field('month') <= end[:7], ds.field('Date') <= _date(end)]
+
+    condition = None
+    for item in conditions:
+        condition = item if condition is None else condition & item
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+def _date(day: str):
+    """Return a pyarrow date scalar for a YYYY-MM-DD string"""
+    pa = require_pyarrow()
+    return pa.scalar(datetime.strptime(day, '%Y-%m-%d').date(), type=pa.date32())
+
+
+def category_mix(table: 'pa.Table', top: int) -> 'pd.DataFrame':
+    """Emails per category per week, as a week x category table"""
+    counts = table.group_by(['Week', 'Category']).aggregate([('Category', 'count')]).to_pandas()
+    mix = counts.pivot_table(index='Week', columns='Category', values='Category_count', fill_value=0)
+    mix.index = mix.index.astype(str)
+    return mix.astype(int)
+
+
+def calendar_rate(table: 'pa.Table', top: int) -> 'pd.DataFrame':
+    """Emails, calendar matches and match rate per week"""
+    weekly = (table.group_by('Week')
+              .aggregate([('CalendarMatch', 'count'), ('CalendarMatch', 'sum')])
+              .to_pandas()
+              .rename(columns={'CalendarMatch_count': 'Emails', 'CalendarMatch_sum': 'CalendarMatches'})
+              .sort_values('Week')
+              .set_index('Week'))
+    weekly.index = weekly.index.astype(str)
+    weekly['MatchRate'] = (weekly['CalendarMatches'] / weekly['Emails']).round(3)
+    return weekly
+
+
+def top_senders(table: 'pa.Table', top: int) -> 'pd.DataFrame':
+    """The most frequent sender addresses of each category"""
+    import numpy as np
+    import pyarrow.compute as pc
+
+    counts = (table.group_by(['Category', 'SenderAddress'])
+              .aggregate([('SenderAddress', 'count')])
+              .sort_by([('Category', 'ascending'), ('SenderAddress_count', 'descending')]))
+
+    # Keep the first `top` rows of each category run without converting every sender to Python
+    categories = counts.column('Category').combine_chunks()
+    starts = np.ones(len(categories), dtype=bool)
+    if len(categories) > 1:
+        starts[1:] = pc.not_equal(categories.slice(1), categories.slice(0, len(categories) - 1)).to_numpy(
+            zero_copy_only=False)
+    run_start = np.maximum.accumulate(np.where(starts, np.arange(len(categories)), 0))
+    keep = np.flatnonzero(np.arange(len(categories)) - run_start < top)
+
+    return (counts.take(keep).to_pandas()
+            .rename(columns={'SenderAddress_count': 'Emails'})
+            .set_index(['Category', 'SenderAddress']))
+
+
+REPORTS: Dict[str, Callable] = {
+    'category-mix': category_mix,
+    'calendar-rate': calendar_rate,
+    'top-senders': top_senders,
+}
+
+
+def run_report(name: str, data_dir, start: Optional[str] = None, end: Optional[str] = None,
+               top: int = 5) -> 'pd.DataFrame':
+    """Run a named report over the Parquet export"""
+    table = read_logs(data_dir, REPORT_COLUMNS[name], start, end)
+    return REPORTS[name](table, top)
@@ -0,0 +1,213 @@
+"""
+Resident daemon for the Email Clustering System
+Keeps one EmailClusterer loaded with its compiled rules and calendar event
+index, polls Apple Mail on an interval and answers requests on a local Unix
+socket, so a new email costs milliseconds instead of a fresh interpreter,
+pandas import and workbook parse
+"""
+
+import json
+import os
+import signal
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from daemon_client import DaemonNotRunning, send_request
+from event_index import EventIndex
+from snippet_cache import normalize_snippet
+
+
+# Seconds between mail polls
+DEFAULT_POLL_INTERVAL = 5 * 60
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line in, one JSON reply per line out"""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                reply = self.server.owner.handle(request)
+            except Exception as e:
+                reply = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _SocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ClassifierDaemon:
+    """Serve classification requests and poll for mail from one warm EmailClusterer
+
+    Polls, on-demand 'process' requests, rule reloads and keyword edits
+    hold a lock so only one of them touches the database at a time.
+    'classify' only takes the clusterer's rules lock, which keyword edits
+    hold just while they patch the loaded rules, so it is answered even
+    while a poll is running.
+    """
+
+    def __init__(self, clusterer, socket_path, poll_interval: int = DEFAULT_POLL_INTERVAL,
+                 process_options: Optional[Dict] = None):
+        self.clusterer = clusterer
+        self.socket_path = Path(socket_path)
+        self.poll_interval = poll_interval
+        self.process_options = dict(process_options or {})
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.started = time.time()
+        self.polls = 0
+        self.classified = 0
+        self.last_poll = None
+        self.last_counts = {}
+        self.server = None
+
+    def warm(self):
+        """Load the calendar event index before the first request arrives"""
+        if self.process_options.get('use_calendar', True):
+            events = self.clusterer.get_upcoming_events(days_ahead=14)
+            self.clusterer.event_index = EventIndex(events)
+            print(f"✓ Warmed {len(events)} upcoming events")
+
+    def reload_rules(self) -> bool:
+        """Reload the rules if the database changed; return whether they were reloaded"""
+        if self.clusterer.rules_cache.is_current():
+            return False
+        with self.lock:
+            return self.clusterer.reload_rules()
+
+    def poll(self) -> Dict:
+        """Process new mail now and return the run's counters"""
+        with self.lock:
+            self.clusterer.reload_rules()
+            try:
+                self.clusterer.process_emails(**self.process_options)
+            except Exception as e:
+                print(f"Error processing emails: {e}")
+                raise
+            finally:
+                self.polls += 1
+                self.last_poll = time.time()
+            self.last_counts = {name: self.clusterer.metrics.counters.get(name, 0)
+                                for name in ('emails', 'categorized', 'calendar_matches')}
+            return self.last_counts
+
+    def classify(self, subject: str, sender: str, body: str = '') -> Dict:
+        """Classify one message with the warm rules and event index, without logging it
+
+        With snippet_bytes set, that much of body is matched as well.
+        """
+        self.reload_rules()
+        email = {'subject': subject, 'sender': sender}
+        snippet_bytes = self.process_options.get('snippet_bytes')
+        if body and snippet_bytes:
+            email['snippet'] = normalize_snippet(body, snippet_bytes)
+        with self.clusterer.rules_lock:
+            category, confidence = self.clusterer.categorize_email(email)
+        calendar_match, matched_event = self.clusterer.check_calendar_match(email, self.clusterer.event_index)
+        self.classified += 1
+        return {'category': category, 'confidence': confidence,
+                'calendar_match': calendar_match, 'matched_event': matched_event}
+
+    def edit_rules(self, request: Dict) -> Dict:
+        """Apply an add-keyword, disable-keyword or move-keyword request to the warm rules
+
+        The change is written to the database and patched into the loaded
+        rules, so the next 'classify' sees it without a reload.
+        """
+        command = request['command']
+        keyword = str(request.get('keyword') or '')
+        with self.lock:
+            if command == 'add-keyword':
+                return {'added': self.clusterer.add_keyword(str(request.get('category') or ''), keyword)}
+            if command == 'disable-keyword':
+                return {'changed': self.clusterer.disable_keyword(keyword, request.get('category'))}
+            return {'changed': self.clusterer.move_keyword(keyword, str(request.get('category') or ''),
+                                                           request.get('from_category'))}
+
+    def status(self) -> Dict:
+        """Return what the daemon has loaded and done so far"""
+        return {
+            'database': str(self.clusterer.database_path),
+            'uptime_s': round(time.time() - self.started, 1),
+            'categories': len(self.clusterer.categories),
+            'keywords': len(self.clusterer.keyword_mappings),
+            'events': len(self.clusterer.event_index),
+            'polls': self.polls,
+            'last_poll': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.last_poll)) if self.last_poll else None,
+            'last_counts': self.last_counts,
+            'classified': self.classified,
+            'poll_interval_s': self.poll_interval
+        }
+
+    def handle(self, request: Dict) -> Dict:
+        """Answer one socket request"""
+        command = request.get('command')
+        if command == 'classify':
+            return {'ok': True, **self.classify(str(request.get('subject') or ''), str(request.get('sender') or ''),
+                                                str(request.get('body') or ''))}
+        if command == 'process':
+            return {'ok': True, **self.poll()}
+        if command == 'status':
+            return {'ok': True, **self.status()}
+        if command == 'reload':
+            return {'ok': True, 'reloaded': self.reload_rules()}
+        if command in ('add-keyword', 'disable-keyword', 'move-keyword'):
+            return {'ok': True, **self.edit_rules(request)}
+        if command == 'stop':
+            self.stop()
+            return {'ok': True}
+        return {'ok': False, 'error': f"Unknown command: {command!r}"}
+
+    def stop(self):
+        """Ask the poll loop to exit; the socket is closed on the way out"""
+        self.stopping.set()
+
+    def _bind(self):
+        """Bind the socket, replacing a stale one left by a daemon that died"""
+        if self.socket_path.exists():
+            try:
+                send_request(self.socket_path, {'command': 'status'}, timeout=2)
+            except (DaemonNotRunning, OSError, ValueError):
+                self.socket_path.unlink()
+            else:
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+
+        self.server = _SocketServer(str(self.socket_path), _RequestHandler)
+        self.server.owner = self
+        os.chmod(self.socket_path, 0o600)
+
+    def serve_forever(self):
+        """Serve the socket and poll for mail until stopped by a request, SIGTERM or Ctrl-C"""
+        self.warm()
+        self._bind()
+        thread = threading.Thread(target=self.server.serve_forever, name='daemon-socket', daemon=True)
+        thread.start()
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stop())
+        print(f"✓ Listening on {self.socket_path}; polling every {self.poll_interval}s")
+
+        try:
+            while not self.stopping.is_set():
+                try:
+                    self.poll()
+                except Exception:
+                    # Already reported; try again at the next interval
+                    pass
+                self.stopping.wait(self.poll_interval)
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+            print("✓ Daemon stopped")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Thin client for the Email Clustering System daemon
+Sends one request over the daemon's Unix socket and prints the reply. Only
+uses the standard library, so it starts in a few milliseconds; exits with
+status 2 when no daemon is listening so callers can fall back to a full run.
+"""
+
+import json
+import socket
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Seconds to wait for a reply; a 'process' request runs a whole mail poll
+DEFAULT_TIMEOUT = 300
+
+# Exit status when no daemon is listening on the socket
+EXIT_NOT_RUNNING = 2
+
+
+class DaemonNotRunning(Exception):
+    """Raised when nothing is listening on the daemon socket"""
+    pass
+
+
+def default_socket_path(database_path=None) -> Path:
+    """Return the socket of the daemon serving a database, next to the database"""
+    # Same default database as email_clusterer.py, without importing it
+    database_path = Path(database_path) if database_path else Path.home() / "Documents" / "EmailClusterDatabase.xlsx"
+    return database_path.with_name(database_path.name + '.sock')
+
+
+def send_request(socket_path, request: Dict, timeout: Optional[float] = DEFAULT_TIMEOUT) -> Dict:
+    """Send one JSON request to the daemon and return its JSON reply"""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        try:
+            client.connect(str(socket_path))
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise DaemonNotRunning(f"No daemon listening on {socket_path}") from e
+
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with client.makefile('rb') as reader:
+            line = reader.readline()
+        if not line:
+            raise ConnectionError("Daemon closed the connection without replying")
+        return json.loads(line)
+    finally:
+        client.close()
+
+
+def main():
+    """Main entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Talk to a running email_clusterer.py --daemon'
+    )
+    parser.add_argument('--database', help='Database the daemon serves (default: the default database)',
+                        default=None)
+    parser.add_argument('--socket', metavar='PATH', help='Daemon socket (default: next to the database)',
+                        default=None)
+    parser.add_argument('--timeout', type=float, help=f'Seconds to wait for a reply (default: {DEFAULT_TIMEOUT})',
+                        default=DEFAULT_TIMEOUT)
+
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+    classify_parser = subparsers.add_parser('classify', help='Classify one message with the warm rules')
+    classify_parser.add_argument('--subject', default='', help='Message subject')
+    classify_parser.add_argument('--sender', default='', help='Message sender')
+    classify_parser.add_argument('--body', default='',
+                                 help='Message body, matched when the daemon runs with --snippet-bytes')
+    subparsers.add_parser('process', help='Poll Apple Mail now and process new messages')
+    subparsers.add_parser('status', help='Show what the daemon has loaded and done')
+    subparsers.add_parser('reload', help='Reload the rules if the database changed')
+    add_keyword_parser = subparsers.add_parser('add-keyword', help='Add an active keyword to a category')
+    add_keyword_parser.add_argument('category', help='Category to add the keyword to (created if new)')
+    add_keyword_parser.add_argument('keyword', help='Keyword to match')
+    disable_keyword_parser = subparsers.add_parser('disable-keyword', help='Deactivate a keyword')
+    disable_keyword_parser.add_argument('keyword', help='Keyword to deactivate')
+    disable_keyword_parser.add_argument('--category', default=None,
+                                        help='Only deactivate it in this category (default: everywhere)')
+    move_keyword_parser = subparsers.add_parser('move-keyword', help='Move a keyword to another category')
+    move_keyword_parser.add_argument('keyword', help='Keyword to move')
+    move_keyword_parser.add_argument('category', help='Category to move it to (created if new)')
+    move_keyword_parser.add_argument('--from', dest='from_category', default=None,
+                                     help='Only move it out of this category (default: every category)')
+    subparsers.add_parser('stop', help='Stop the daemon')
+
+    args = parser.parse_args()
+
+    request = {'command': args.command}
+    if args.command == 'classify':
+        request.update(subject=args.subject, sender=args.sender, body=args.body)
+    elif args.command == 'add-keyword':
+        request.update(category=args.category, keyword=args.keyword)
+    elif args.command == 'disable-keyword':
+        request.update(keyword=args.keyword, category=args.category)
+    elif args.command == 'move-keyword':
+        request.update(keyword=args.keyword, category=args.category, from_category=args.from_category)
+
+    try:
+        reply = send_request(args.socket or default_socket_path(args.database), request, timeout=args.timeout)
+    except DaemonNotRunning as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(EXIT_NOT_RUNNING)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Daemon request failed: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(reply, indent=2))
+    sys.exit(0 if reply.get('ok') else 1)
+
+
+if __name__ == '__main__':
+    main()
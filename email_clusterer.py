@@ -4,42 +4,150 @@ Email Clustering System for macOS Apple Mail
 Automatically clusters emails by themes and checks calendar relevance
 """
 
-import subprocess
 import json
 import re
-from datetime import datetime, timedelta
+from datetime import datetime
+from contextlib import nullcontext
+from functools import partial
+from itertools import islice
 from pathlib import Path
 import sys
-from typing import List, Dict, Tuple, Optional
+import threading
+from typing import TYPE_CHECKING, List, Dict, Tuple, Optional
 import os
-
-try:
+import time
+
+# pandas and openpyxl are imported by the storage layer only when a workbook
+# is read or written, so a run on a warm rules cache starts quickly
+from storage import apply_rule_write, migrate_sidecars, open_storage, require_pandas, sidecar_path
+from keyword_matcher import KeywordMatcher, email_text
+from event_index import EventIndex
+from records import EmailRecord
+from mail_sources import open_mail_source
+from processed_store import ProcessedMessageStore
+from parallel import classify_parallel
+from rules_cache import RulesCache
+from calendar_cache import CalendarCache, DEFAULT_TTL
+from rollups import RollupAccumulator, rebuild_rollups
+from clustering import cluster_subjects, suggested_keyword_rows
+from sender_cache import SenderCache, rules_fingerprint
+from metrics import RunMetrics, profiled
+from log_partitions import PartitionedLogStore
+from columnar import REPORTS, export_parquet, run_report
+from async_fetch import PipelinedFetch
+from snippet_cache import DEFAULT_SNIPPET_BYTES, SnippetCache, snippet_key
+from daemon import ClassifierDaemon, DEFAULT_POLL_INTERVAL
+from replay import DEFAULT_SAMPLE_SIZE, replay_logs
+from daemon_client import default_socket_path
+from applescript_records import (APPLESCRIPT_HELPERS, SNIPPET_FIELDS, AppleScriptError, iter_fields,
+                                 iter_mail_records, iter_event_records, stream_osascript)
+
+if TYPE_CHECKING:
     import pandas as pd
-    import openpyxl
-except ImportError:
-    print("ERROR: Required packages not installed.")
-    print("Please run: pip3 install pandas openpyxl")
-    sys.exit(1)
+
+
+# Log batch size used when streaming from an offline source with no batch size set
+STREAM_LOG_BATCH_SIZE = 1000
+
+# How often to print progress when streaming from an offline source
+STREAM_PROGRESS_INTERVAL = 10000
+
+# Message bodies fetched per osascript call
+SNIPPET_BATCH_SIZE = 25
+
+
+def default_database_path() -> Path:
+    """Return the database used when none is given"""
+    # Default to user's Documents folder
+    return Path.home() / "Documents" / "EmailClusterDatabase.xlsx"
+
+
+def parquet_dir(database_path) -> Path:
+    """Return the default Parquet export folder of a database"""
+    database_path = Path(database_path)
+    return sidecar_path(database_path, '.parquet')
+
+
+class LogSink:
+    """Buffer email log entries in memory and append them to the database in batches
+
+    Adding an entry only appends to an in-memory list, so the per-email cost
+    does not depend on how many rows are already logged. The storage backend
+    is written once per flush instead of once per email.
+    """
+
+    def __init__(self, write, batch_size: int = 0, on_flush=None):
+        """Create a sink that hands batches to write; batch_size 0 means flush only when asked
+
+        on_flush, if given, is called with each batch after it is written.
+        """
+        self.write = write
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.pending = []
+        self.rows_written = 0
+        self.flush_count = 0
+
+    def add(self, entry: Dict):
+        """Buffer one log entry, flushing if the batch is full"""
+        self.pending.append(entry)
+        if self.batch_size and len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Append all buffered entries to the database in one write"""
+        if not self.pending:
+            return
+
+        try:
+            self.write(self.pending)
+            if self.on_flush is not None:
+                self.on_flush(self.pending)
+
+            self.rows_written += len(self.pending)
+            self.flush_count += 1
+            self.pending = []
+
+        except Exception as e:
+            print(f"Warning: Could not save {len(self.pending)} log entries: {e}")
 
 
 class EmailClusterer:
     """Main class for email clustering and calendar integration"""
 
-    def __init__(self, database_path: str = None):
+    def __init__(self, database_path: str = None, log_batch_size: int = 0,
+                 calendar_ttl: int = DEFAULT_TTL, metrics_path: str = None,
+                 log_retention_months: Optional[int] = None):
         """Initialize the email clusterer with database path"""
         if database_path is None:
-            # Default to user's Documents folder
-            home = Path.home()
-            database_path = home / "Documents" / "EmailClusterDatabase.xlsx"
-
-        self.database_path = Path(database_path)
+            database_path = default_database_path()
+
+        self.database_path = Path(database_path).expanduser()
+        migrate_sidecars(self.database_path)
+        self.log_retention_months = log_retention_months
+        self.storage = open_storage(self.database_path, log_retention_months=log_retention_months)
+        # (category, keyword) of every active keyword row, in row order; edits are applied to it in memory
+        self.rule_rows = []
         self.categories = {}
         self.keyword_mappings = {}
+        self.matcher = KeywordMatcher({})
+        # Held while the rules are edited in place; threads classifying alongside take it too
+        self.rules_lock = threading.Lock()
+        self.event_index = EventIndex([])
+        self.rules_cache = RulesCache(self.database_path)
+        self.calendar_cache = CalendarCache(sidecar_path(self.database_path, '.calendar.json'), ttl=calendar_ttl)
+        self.metrics = RunMetrics()
+        self.metrics_path = Path(metrics_path) if metrics_path else sidecar_path(self.database_path, '.metrics.jsonl')
+        self.sender_cache = SenderCache(sidecar_path(self.database_path, '.senders.cache'))
+        self.snippet_cache = SnippetCache(sidecar_path(self.database_path, '.snippets.sqlite'))
+        self.processed = ProcessedMessageStore(sidecar_path(self.database_path, '.processed'))
+        self.rollups = RollupAccumulator()
+        self.log_sink = LogSink(self.append_logs, batch_size=log_batch_size, on_flush=self.logs_written)
         self.load_or_create_database()
 
     def load_or_create_database(self):
         """Load existing database or create new one"""
-        if self.database_path.exists():
+        if self.storage.exists():
             print(f"Loading database from: {self.database_path}")
             self.load_database()
         else:
@@ -47,7 +155,7 @@ class EmailClusterer:
             self.create_database()
 
     def create_database(self):
-        """Create a new Excel database with default structure"""
+        """Create a new database with default structure"""
         # Create default categories
         default_categories = {
             'Work': ['meeting', 'project', 'deadline', 'report', 'presentation'],
@@ -61,7 +169,6 @@ class EmailClusterer:
             'Uncategorized': []
         }
 
-        # Create DataFrames
         categories_data = []
         for category, keywords in default_categories.items():
             for keyword in keywords:
@@ -72,146 +179,379 @@ class EmailClusterer:
                     'Created': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 })
 
-        df_categories = pd.DataFrame(categories_data)
-        df_logs = pd.DataFrame(columns=[
-            'Timestamp', 'Subject', 'Sender', 'Category',
-            'CalendarMatch', 'MatchedEvent', 'Confidence'
-        ])
-        df_stats = pd.DataFrame(columns=[
-            'Date', 'TotalEmails', 'Categorized', 'WithCalendarMatch'
-        ])
-
-        # Save to Excel
-        with pd.ExcelWriter(self.database_path, engine='openpyxl') as writer:
-            df_categories.to_excel(writer, sheet_name='Categories', index=False)
-            df_logs.to_excel(writer, sheet_name='EmailLogs', index=False)
-            df_stats.to_excel(writer, sheet_name='Statistics', index=False)
+        self.storage.create(categories_data)
 
         print(f"✓ Database created with {len(default_categories)} default categories")
+        self.load_database(recreate=False)
+
+    def load_database(self, recreate: bool = True):
+        """Load categories and keyword mappings from database
+
+        An unreadable database is moved aside and a new one created in its
+        place; with recreate False the error is raised instead.
+        """
+        cached = self.rules_cache.load()
+        if cached is None:
+            try:
+                rule_rows = self._active_rules(self.storage.load_rules())
+            except Exception as e:
+                if not recreate:
+                    raise
+                print(f"Error loading database: {e}")
+                aside = self.storage.set_aside()
+                if aside is not None:
+                    print(f"Warning: Moved the unreadable database to {aside}")
+                self.create_database()
+                return
+
+            # The file changed but the rules may not have, e.g. logs written by another run
+            cached = self.rules_cache.load(rule_rows)
+            if cached is None:
+                self.rule_rows = rule_rows
+                self.categories, self.keyword_mappings = self._parse_rules(rule_rows)
+                self.matcher = KeywordMatcher(self.categories)
+                self.rules_cache.save(*self._loaded_rules())
+                print(f"✓ Loaded {len(self.categories)} categories with {len(self.keyword_mappings)} keywords")
+                return
+
+        self.rule_rows, self.categories, self.keyword_mappings, self.matcher = cached
+        print(f"✓ Loaded {len(self.categories)} categories with {len(self.keyword_mappings)} keywords (cached)")
+
+    def _loaded_rules(self) -> tuple:
+        """Return the loaded (rule_rows, categories, keyword_mappings, matcher), as the rules cache stores them"""
+        return self.rule_rows, self.categories, self.keyword_mappings, self.matcher
+
+    @staticmethod
+    def _active_rules(rules: List[Tuple[str, str, object]]) -> List[Tuple[str, str]]:
+        """Return (category, lowercased keyword) for the active ones of (category, keyword, active) rows"""
+        return [(category, str(keyword).lower()) for category, keyword, active in rules if active]
+
+    @staticmethod
+    def _parse_rules(rule_rows: List[Tuple[str, str]]) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+        """Build categories and keyword mappings from active (category, keyword) rows
+
+        Categories come in the order of their first active row, and a keyword
+        maps to the category of its last active row.
+        """
+        categories = {}
+        keyword_mappings = {}
+        for category, keyword in rule_rows:
+            if category not in categories:
+                categories[category] = []
+
+            categories[category].append(keyword)
+            keyword_mappings[keyword] = category
+        return categories, keyword_mappings
+
+    def reload_rules(self) -> bool:
+        """Reload the rules if the database changed since they were loaded; return whether it did
+
+        Lets a long-running process pick up keyword edits made in the workbook.
+        """
+        if self.rules_cache.is_current():
+            return False
+
+        self.rule_rows = []
+        self.categories = {}
+        self.keyword_mappings = {}
         self.load_database()
-
-    def load_database(self):
-        """Load categories and keyword mappings from database"""
-        try:
-            df = pd.read_excel(self.database_path, sheet_name='Categories')
-
-            # Build keyword mappings
-            for _, row in df.iterrows():
-                if row['Active']:
-                    category = row['Category']
-                    keyword = str(row['Keyword']).lower()
-
-                    if category not in self.categories:
-                        self.categories[category] = []
-
-                    self.categories[category].append(keyword)
-                    self.keyword_mappings[keyword] = category
-
-            print(f"✓ Loaded {len(self.categories)} categories with {len(self.keyword_mappings)} keywords")
-        except Exception as e:
-            print(f"Error loading database: {e}")
-            self.create_database()
+        return True
+
+    def add_keyword(self, category: str, keyword: str) -> bool:
+        """Add an active keyword to a category; return False if it is already there
+
+        Only the new row is written (to the rules journal, for a workbook),
+        and the compiled matcher is updated in place instead of being
+        recompiled.
+        """
+        keyword = str(keyword).lower()
+        if not keyword.strip():
+            raise ValueError("Keyword must not be empty")
+        self.reload_rules()
+        if keyword in self.categories.get(category, []):
+            print(f"✓ '{keyword}' is already a keyword of {category}")
+            return False
+
+        row = {
+            'Category': category,
+            'Keyword': keyword,
+            'Active': True,
+            'Created': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with self.rules_cache.own_write(self._loaded_rules()):
+            self.storage.add_categories([row])
+            self._apply_rule_edit({'op': 'categories', 'rows': [row]}, added=[(category, keyword)])
+        print(f"✓ Added keyword '{keyword}' to {category}")
+        return True
+
+    def disable_keyword(self, keyword: str, category: Optional[str] = None) -> int:
+        """Deactivate a keyword everywhere, or only in category; return how many rows changed"""
+        keyword = str(keyword).lower()
+        self.reload_rules()
+        listed = self._categories_listing(keyword, category)
+        if not listed:
+            print(f"✗ No active keyword '{keyword}'" + (f" in {category}" if category else ""))
+            return 0
+
+        removed = self._listings(keyword, listed)
+        with self.rules_cache.own_write(self._loaded_rules()):
+            self.storage.disable_keyword(keyword, category)
+            self._apply_rule_edit({'op': 'disable_keyword', 'rows': [{'keyword': keyword, 'category': category}]},
+                                  removed=removed)
+        print(f"✓ Disabled keyword '{keyword}' in {', '.join(listed)}")
+        return len(removed)
+
+    def move_keyword(self, keyword: str, to_category: str, category: Optional[str] = None) -> int:
+        """Move a keyword to another category from every category, or only from category
+
+        Returns how many rows changed.
+        """
+        keyword = str(keyword).lower()
+        self.reload_rules()
+        listed = [name for name in self._categories_listing(keyword, category) if name != to_category]
+        if not listed:
+            print(f"✗ No active keyword '{keyword}' to move to {to_category}")
+            return 0
+
+        removed = self._listings(keyword, listed)
+        edit = {'keyword': keyword, 'category': category, 'to_category': to_category}
+        with self.rules_cache.own_write(self._loaded_rules()):
+            self.storage.move_keyword(keyword, to_category, category)
+            self._apply_rule_edit({'op': 'move_keyword', 'rows': [edit]},
+                                  added=[(to_category, keyword) for _ in removed], removed=removed)
+        print(f"✓ Moved keyword '{keyword}' from {', '.join(listed)} to {to_category}")
+        return len(removed)
+
+    def _categories_listing(self, keyword: str, category: Optional[str] = None) -> List[str]:
+        """Return the categories a keyword is active in, limited to category if given"""
+        return [name for name, keywords in self.categories.items()
+                if keyword in keywords and category in (None, name)]
+
+    def _listings(self, keyword: str, categories: List[str]) -> List[Tuple[str, str]]:
+        """Return a (category, keyword) pair for every time keyword is listed under one of categories"""
+        return [(category, keyword) for category in categories for listed in self.categories[category]
+                if listed == keyword]
+
+    def _apply_rule_edit(self, write: Dict, added: List[Tuple[str, str]] = (), removed: List[Tuple[str, str]] = ()):
+        """Patch (category, keyword) listings into the compiled matcher after the rows were written
+
+        The write is applied to the loaded rows as the database applies it,
+        the categories and keyword mappings rebuilt from them, and the
+        matcher's categories put in the same order, so ties go the way a
+        fresh load of the database would send them.
+        """
+        rule_rows = self._active_rules(apply_rule_write([(category, keyword, True)
+                                                         for category, keyword in self.rule_rows], write))
+        categories, keyword_mappings = self._parse_rules(rule_rows)
+        with self.rules_lock:
+            for category, keyword in removed:
+                self.matcher.remove(category, keyword)
+            for category, keyword in added:
+                self.matcher.add(category, keyword)
+            self.matcher.reorder(list(categories))
+
+            # Updated in place: the rules cache saves these same objects after the write
+            self.rule_rows[:] = rule_rows
+            self.categories.clear()
+            self.categories.update(categories)
+            self.keyword_mappings.clear()
+            self.keyword_mappings.update(keyword_mappings)
 
     def save_log_entry(self, email_data: Dict):
-        """Save email processing log to database"""
-        try:
-            # Read existing logs
-            df_logs = pd.read_excel(self.database_path, sheet_name='EmailLogs')
-
-            # Append new entry
-            new_entry = pd.DataFrame([{
-                'Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'Subject': email_data.get('subject', ''),
-                'Sender': email_data.get('sender', ''),
-                'Category': email_data.get('category', 'Uncategorized'),
-                'CalendarMatch': email_data.get('calendar_match', False),
-                'MatchedEvent': email_data.get('matched_event', ''),
-                'Confidence': email_data.get('confidence', 0)
-            }])
-
-            df_logs = pd.concat([df_logs, new_entry], ignore_index=True)
-
-            # Save back to Excel
-            with pd.ExcelWriter(self.database_path, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
-                df_logs.to_excel(writer, sheet_name='EmailLogs', index=False)
-
-        except Exception as e:
-            print(f"Warning: Could not save log entry: {e}")
+        """Queue an email processing log entry for the database"""
+        self.log_sink.add({
+            'Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'Subject': email_data.get('subject', ''),
+            'Sender': email_data.get('sender', ''),
+            'Category': email_data.get('category', 'Uncategorized'),
+            'CalendarMatch': email_data.get('calendar_match', False),
+            'MatchedEvent': email_data.get('matched_event', ''),
+            'Confidence': email_data.get('confidence', 0),
+            'MessageId': email_data.get('message_id', '')
+        })
+
+    def log_result(self, email, category: str, confidence: float, calendar_match: bool, matched_event: str):
+        """Queue the log entry of one classified email, without an intermediate dict"""
+        if isinstance(email, EmailRecord):
+            email.release()
+        self.log_sink.add({
+            'Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'Subject': email.get('subject', 'No Subject'),
+            'Sender': email.get('sender', 'Unknown'),
+            'Category': category,
+            'CalendarMatch': calendar_match,
+            'MatchedEvent': matched_event,
+            'Confidence': confidence,
+            'MessageId': email.get('message_id', '')
+        })
+
+    def append_logs(self, entries: List[Dict]):
+        """Write log entries to storage without invalidating the rules cache"""
+        with self.metrics.stage('write_logs'), self.rules_cache.own_write():
+            self.storage.append_logs(entries)
+        self.metrics.count('rows_written', len(entries))
+
+    def flush_logs(self):
+        """Write any buffered log entries to the database"""
+        self.log_sink.flush()
+
+    def logs_written(self, entries: List[Dict]):
+        """Mark written log entries as processed and fold them into the run's rollups"""
+        self.mark_processed(entries)
+        self.rollups.add(entries)
+
+    def mark_processed(self, entries: List[Dict]):
+        """Record the message ids of log entries that were just written"""
+        self.processed.update(entry.get('MessageId', '') for entry in entries)
+        self.processed.save()
+
+    def skip_processed(self, emails):
+        """Yield only emails whose message id has not been processed yet"""
+        for email in emails:
+            if email.get('message_id', '') not in self.processed:
+                yield email
 
     def update_statistics(self, total_emails: int, categorized: int, calendar_matches: int):
-        """Update daily statistics"""
+        """Add this run's counts to the daily statistics and rollups, and commit the run's writes"""
         try:
-            df_stats = pd.read_excel(self.database_path, sheet_name='Statistics')
-
             today = datetime.now().strftime('%Y-%m-%d')
-
-            # Update or create today's entry
-            if today in df_stats['Date'].values:
-                idx = df_stats[df_stats['Date'] == today].index[0]
-                df_stats.at[idx, 'TotalEmails'] = total_emails
-                df_stats.at[idx, 'Categorized'] = categorized
-                df_stats.at[idx, 'WithCalendarMatch'] = calendar_matches
-            else:
-                new_stat = pd.DataFrame([{
-                    'Date': today,
-                    'TotalEmails': total_emails,
-                    'Categorized': categorized,
-                    'WithCalendarMatch': calendar_matches
-                }])
-                df_stats = pd.concat([df_stats, new_stat], ignore_index=True)
-
-            with pd.ExcelWriter(self.database_path, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
-                df_stats.to_excel(writer, sheet_name='Statistics', index=False)
+            with self.rules_cache.own_write():
+                self.storage.update_statistics(today, total_emails, categorized, calendar_matches)
+                self.storage.add_rollups(self.rollups.rows())
+                # One locked rewrite for the logs, statistics and rollups journaled by this run
+                self.storage.commit()
+            self.rollups.clear()
 
         except Exception as e:
             print(f"Warning: Could not update statistics: {e}")
 
-    def get_inbox_emails(self, limit: int = 50) -> List[Dict]:
-        """Fetch recent emails from Apple Mail inbox using AppleScript"""
-        applescript = f'''
+    def partition_logs(self):
+        """Move EmailLogs out of the database into monthly compressed partitions
+
+        From then on, logs are appended to <database>.logs/ and the database
+        only holds rules and statistics.
+        """
+        if self.storage.log_store is not None:
+            print(f"✓ Logs are already partitioned in {self.storage.log_store.directory}")
+            return
+
+        directory = sidecar_path(self.database_path, '.logs')
+        staging = PartitionedLogStore(directory.with_name(directory.name + '.tmp'))
+        staging.directory.mkdir(parents=True, exist_ok=True)
+
+        logs = self.storage.read_logs()
+        logs = logs.astype(object).where(logs.notna(), '')
+        staging.append(logs.to_dict('records'))
+
+        # Partitions become live before the old rows are removed, so a crash loses nothing
+        staging.directory.rename(directory)
+        with self.rules_cache.own_write():
+            self.storage.clear_logs()
+        self.storage.log_store = PartitionedLogStore(directory, retention_months=self.log_retention_months)
+
+        months = self.storage.log_store.months()
+        print(f"✓ Moved {len(logs)} log rows into {len(months)} monthly partitions in {directory}")
+
+    def query_logs(self, start: Optional[str] = None, end: Optional[str] = None) -> 'pd.DataFrame':
+        """Return logged emails dated from start to end (YYYY-MM-DD, inclusive; None is open)
+
+        With partitioned logs, only the months in the range are read.
+        """
+        return self.storage.read_logs(start, end)
+
+    def export_parquet(self, output_dir=None):
+        """Export logs, statistics and rollups as Parquet for the report command"""
+        output_dir = Path(output_dir) if output_dir else parquet_dir(self.database_path)
+        rows, months = export_parquet(self.storage, output_dir)
+        print(f"✓ Exported {rows} log rows in {months} monthly partitions to: {output_dir}")
+
+    def rebuild_statistics(self):
+        """Recompute the statistics and rollups from the full email log"""
+        rollups, statistics = rebuild_rollups(self.storage.read_logs())
+        with self.rules_cache.own_write():
+            self.storage.replace_rollups(rollups, statistics)
+        self.rollups.clear()
+        print(f"✓ Rebuilt {len(statistics)} daily statistics rows and {len(rollups)} rollup rows")
+
+    def replay(self, start: Optional[str] = None, end: Optional[str] = None,
+               sample_size: int = DEFAULT_SAMPLE_SIZE) -> Tuple['pd.DataFrame', 'pd.DataFrame']:
+        """Re-categorize logged emails dated from start to end with the current rules and report the changes
+
+        The log is streamed in batches through categorize_many; nothing is
+        written and Mail and Calendar are never asked. Body snippets are not
+        logged, so emails are matched on subject and sender only.
+        """
+        pd = require_pandas()
+        started = time.perf_counter()
+        matrix, sample = replay_logs(self.storage.iter_logs(start, end), self.categorize_many,
+                                     sample_size=sample_size)
+        elapsed = time.perf_counter() - started
+
+        if matrix.empty:
+            print("No logged emails in that range.")
+            return matrix, sample
+
+        total = int(matrix.to_numpy().sum())
+        unchanged = sum(int(matrix.at[category, category]) for category in matrix.index if category in matrix.columns)
+        changed = total - unchanged
+        print(f"✓ Replayed {total} logged emails in {elapsed:.1f}s: "
+              f"{changed} ({changed/total*100:.1f}%) would change category")
+
+        print("\nCategory transitions (rows: logged, columns: current rules):")
+        print(matrix.to_string())
+        if not sample.empty:
+            print(f"\nSample of {len(sample)} changed emails:")
+            with pd.option_context('display.max_colwidth', 50, 'display.width', 200):
+                print(sample.to_string(index=False))
+        return matrix, sample
+
+    def inbox_script(self, start: int, end: int) -> str:
+        """AppleScript printing unread messages start..end (1-based, inclusive) as records"""
+        return f'''
+        {APPLESCRIPT_HELPERS}
+
         tell application "Mail"
-            set emailList to {{}}
+            set outputLines to {{}}
             set inboxMessages to messages of inbox whose read status is false
 
-            repeat with i from 1 to (count of inboxMessages)
-                if i > {limit} then exit repeat
+            repeat with i from {int(start)} to (count of inboxMessages)
+                if i > {int(end)} then exit repeat
 
                 set theMessage to item i of inboxMessages
-                set emailData to {{}}
-                set emailData to emailData & {{subject:(subject of theMessage)}}
-                set emailData to emailData & {{sender:(sender of theMessage)}}
-                set emailData to emailData & {{dateReceived:(date received of theMessage as string)}}
-                set emailData to emailData & {{messageId:(id of theMessage as string)}}
-
-                set end of emailList to emailData
+                set end of outputLines to my joinList({{¬
+                    my escapeField(subject of theMessage), ¬
+                    my escapeField(sender of theMessage), ¬
+                    my escapeField(date received of theMessage as string), ¬
+                    my escapeField(id of theMessage as string)}}, tab)
             end repeat
 
-            return emailList
+            return my joinList(outputLines, linefeed)
         end tell
         '''
 
-        try:
-            result = subprocess.run(
-                ['osascript', '-e', applescript],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+    def get_inbox_emails(self, limit: int = 50) -> List[EmailRecord]:
+        """Fetch recent emails from Apple Mail inbox using AppleScript"""
+        applescript = self.inbox_script(1, limit)
 
-            if result.returncode != 0:
-                print(f"AppleScript error: {result.stderr}")
-                return []
+        try:
+            # Records are tokenized line by line as osascript writes them
+            lines = self.metrics.counted_bytes('mail_bytes', stream_osascript(applescript, timeout=30))
+            return list(iter_mail_records(lines))
 
-            # Parse AppleScript output
-            emails = self.parse_applescript_list(result.stdout)
-            return emails
+        except AppleScriptError as e:
+            print(f"AppleScript error: {e}")
+            return []
 
         except Exception as e:
             print(f"Error fetching emails: {e}")
             return []
 
-    def parse_applescript_list(self, output: str) -> List[Dict]:
-        """Parse AppleScript list output into Python dictionaries"""
+    def parse_applescript_list(self, output: str) -> List[EmailRecord]:
+        """Parse legacy AppleScript record-list output into EmailRecords
+
+        Kept for output captured before the delimited record format; a subject
+        containing ", sender:" or braces is mis-split by this parser.
+        """
         emails = []
 
         # Simple parsing of AppleScript record format
@@ -220,67 +560,145 @@ class EmailClusterer:
         records = re.findall(r'\{subject:(.*?), sender:(.*?), dateReceived:(.*?), messageId:(.*?)\}', output, re.DOTALL)
 
         for record in records:
-            email = {
-                'subject': record[0].strip('"'),
-                'sender': record[1].strip('"'),
-                'date_received': record[2].strip('"'),
-                'message_id': record[3].strip('"')
-            }
-            emails.append(email)
+            emails.append(EmailRecord(*(field.strip('"') for field in record)))
 
         return emails
 
+    def snippet_script(self, message_ids: List[str], max_bytes: int) -> str:
+        """AppleScript printing (id, body length, first max_bytes characters of body) per message"""
+        return f'''
+        {APPLESCRIPT_HELPERS}
+
+        tell application "Mail"
+            set outputLines to {{}}
+
+            repeat with messageId in {{{', '.join(message_ids)}}}
+                try
+                    set theMessage to first message of inbox whose id is (messageId as integer)
+                    set bodyText to content of theMessage
+                    if bodyText is missing value then set bodyText to ""
+                    set bodyLength to length of bodyText
+                    if bodyLength > {int(max_bytes)} then set bodyText to text 1 thru {int(max_bytes)} of bodyText
+                    set end of outputLines to my joinList({{¬
+                        (messageId as string), ¬
+                        (bodyLength as string), ¬
+                        my escapeField(bodyText)}}, tab)
+                end try
+            end repeat
+
+            return my joinList(outputLines, linefeed)
+        end tell
+        '''
+
+    def fetch_snippets(self, emails: List[EmailRecord], max_bytes: int):
+        """Attach a body snippet of at most max_bytes to each email
+
+        Snippets come from the snippet cache when possible; the rest are
+        fetched from Mail in batches, normalized and cached. An email whose
+        body cannot be read is classified without one.
+        """
+        keys = [snippet_key(email) for email in emails]
+        cached = self.snippet_cache.get_many(keys, max_bytes)
+
+        missing = {}
+        for email, key in zip(emails, keys):
+            if key in cached:
+                email.snippet = cached[key]
+            elif str(email.message_id).isdigit():
+                missing.setdefault(str(email.message_id), []).append((email, key))
+        self.metrics.count('snippet_cache_hits', len(cached))
+
+        message_ids = list(missing)
+        for start in range(0, len(message_ids), SNIPPET_BATCH_SIZE):
+            script = self.snippet_script(message_ids[start:start + SNIPPET_BATCH_SIZE], max_bytes)
+            bodies = {}
+            try:
+                lines = self.metrics.counted_bytes('snippet_bytes', stream_osascript(script, timeout=60))
+                for message_id, length, body in iter_fields(lines, SNIPPET_FIELDS):
+                    for email, key in missing.get(message_id, ()):
+                        bodies[key] = (body, int(length or 0))
+            except Exception as e:
+                print(f"Warning: Could not fetch message bodies: {e}")
+
+            snippets = self.snippet_cache.put_many(bodies, max_bytes)
+            for message_id in message_ids[start:start + SNIPPET_BATCH_SIZE]:
+                for email, key in missing[message_id]:
+                    if key in snippets:
+                        email.snippet = snippets[key]
+            self.metrics.count('snippets_fetched', len(snippets))
+
+    def with_snippets(self, emails, max_bytes: int, batch_size: int = SNIPPET_BATCH_SIZE):
+        """Yield emails from a stream with body snippets attached, fetching them a batch at a time"""
+        emails = iter(emails)
+        while True:
+            batch = list(islice(emails, batch_size))
+            if not batch:
+                return
+            with self.metrics.stage('fetch_snippets'):
+                self.fetch_snippets(batch, max_bytes)
+            yield from batch
+
     def get_calendar_events(self, days_ahead: int = 7) -> List[Dict]:
         """Fetch upcoming calendar events using AppleScript"""
-        start_date = datetime.now()
-        end_date = start_date + timedelta(days=days_ahead)
+        try:
+            return self.fetch_calendar_events(0, days_ahead)
+
+        except AppleScriptError as e:
+            print(f"Calendar access error: {e}")
+            return []
+
+        except Exception as e:
+            print(f"Error fetching calendar events: {e}")
+            return []
+
+    def fetch_calendar_events(self, start_offset: int, days_ahead: int) -> List[Dict]:
+        """Fetch events starting between start_offset seconds and days_ahead days from now
+
+        Raises AppleScriptError or OSError if Calendar cannot be read. Each
+        event gets a 'start_ts' epoch timestamp for the event cache.
+        """
+        fetched_at = time.time()
 
         applescript = f'''
+        {APPLESCRIPT_HELPERS}
+
         tell application "Calendar"
-            set startDate to (current date)
-            set endDate to startDate + ({days_ahead} * days)
+            set nowDate to (current date)
+            set startDate to nowDate + {int(start_offset)}
+            set endDate to nowDate + ({days_ahead} * days)
 
-            set eventList to {{}}
+            set outputLines to {{}}
             set allCalendars to every calendar
 
             repeat with cal in allCalendars
                 set calEvents to (every event of cal whose start date ≥ startDate and start date ≤ endDate)
 
                 repeat with evt in calEvents
-                    set eventData to {{}}
-                    set eventData to eventData & {{summary:(summary of evt)}}
-                    set eventData to eventData & {{startDate:(start date of evt as string)}}
-                    set eventData to eventData & {{location:(location of evt)}}
-
-                    set end of eventList to eventData
+                    set end of outputLines to my joinList({{¬
+                        my escapeField(summary of evt), ¬
+                        my escapeField(start date of evt as string), ¬
+                        my escapeField(location of evt), ¬
+                        my escapeField(((start date of evt) - nowDate) as integer)}}, tab)
                 end repeat
             end repeat
 
-            return eventList
+            return my joinList(outputLines, linefeed)
         end tell
         '''
 
-        try:
-            result = subprocess.run(
-                ['osascript', '-e', applescript],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-
-            if result.returncode != 0:
-                print(f"Calendar access error: {result.stderr}")
-                return []
-
-            events = self.parse_calendar_events(result.stdout)
-            return events
+        events = []
+        lines = self.metrics.counted_bytes('calendar_bytes', stream_osascript(applescript, timeout=30))
+        for event in iter_event_records(lines):
+            event['start_ts'] = fetched_at + float(event.pop('start_offset') or 0)
+            events.append(event)
+        return events
 
-        except Exception as e:
-            print(f"Error fetching calendar events: {e}")
-            return []
+    def get_upcoming_events(self, days_ahead: int = 14, refresh: bool = False) -> List[Dict]:
+        """Return upcoming events through the on-disk event cache"""
+        return self.calendar_cache.get(self.fetch_calendar_events, days_ahead, refresh=refresh)
 
     def parse_calendar_events(self, output: str) -> List[Dict]:
-        """Parse calendar events from AppleScript output"""
+        """Parse calendar events from legacy AppleScript record-list output"""
         events = []
 
         records = re.findall(r'\{summary:(.*?), startDate:(.*?), location:(.*?)\}', output, re.DOTALL)
@@ -295,143 +713,329 @@ class EmailClusterer:
 
         return events
 
-    def categorize_email(self, email: Dict) -> Tuple[str, float]:
-        """Categorize an email based on subject and learned patterns"""
-        subject = email.get('subject', '').lower()
-        sender = email.get('sender', '').lower()
-
-        # Combined text for analysis
-        text = f"{subject} {sender}"
-
-        # Score each category
-        category_scores = {}
-
-        for category, keywords in self.categories.items():
-            score = 0
-            matched_keywords = []
-
-            for keyword in keywords:
-                if keyword in text:
-                    score += 1
-                    matched_keywords.append(keyword)
-
-            if score > 0:
-                category_scores[category] = {
-                    'score': score,
-                    'keywords': matched_keywords
-                }
-
-        # Determine best category
-        if category_scores:
-            best_category = max(category_scores.items(), key=lambda x: x[1]['score'])
-            confidence = min(best_category[1]['score'] / 3.0, 1.0)  # Normalize confidence
-            return best_category[0], confidence
-
-        return 'Uncategorized', 0.0
-
-    def check_calendar_match(self, email: Dict, events: List[Dict]) -> Tuple[bool, str]:
-        """Check if email subject relates to any calendar event"""
-        subject = email.get('subject', '').lower()
-        subject_words = set(re.findall(r'\w+', subject))
-
-        best_match = None
-        best_score = 0
-
-        for event in events:
-            event_summary = event.get('summary', '').lower()
-            event_words = set(re.findall(r'\w+', event_summary))
-
-            # Calculate word overlap
-            common_words = subject_words & event_words
-
-            # Filter out common words
-            common_words = {w for w in common_words if len(w) > 3}
-
-            if len(common_words) > best_score:
-                best_score = len(common_words)
-                best_match = event.get('summary', '')
-
-        # Threshold for considering a match
-        if best_score >= 2:
-            return True, best_match
-
-        return False, ''
-
-    def process_emails(self, limit: int = 50):
-        """Main processing function"""
+    def cluster_uncategorized(self, top: int = 10, suggest: bool = False) -> List[Dict]:
+        """Cluster near-duplicate Uncategorized emails in the log and report the largest clusters
+
+        With suggest, each reported cluster's representative terms are added
+        to the Categories sheet as inactive keywords to review and enable.
+        """
+        logs = self.storage.read_logs()
+        uncategorized = logs[logs['Category'].fillna('Uncategorized') == 'Uncategorized']
+        print(f"Clustering {len(uncategorized)} uncategorized emails...")
+
+        clusters = cluster_subjects(uncategorized['Subject'].fillna('').astype(str),
+                                    uncategorized['Sender'].fillna('').astype(str), top=top)
+        if not clusters:
+            print("No clusters found.")
+            return clusters
+
+        for number, cluster in enumerate(clusters, 1):
+            print(f"\n[{number}] {cluster['size']} emails, {cluster['subjects']} distinct subjects")
+            print(f"    Terms: {', '.join(cluster['terms'][:6])}")
+            print(f"    Example: {cluster['example'][:60]}")
+            if cluster['domain']:
+                print(f"    Sender domain: {cluster['domain']}")
+
+        if suggest:
+            existing = [keyword for _, keyword, _ in self.storage.load_rules()]
+            rows = suggested_keyword_rows(clusters, existing)
+            if rows:
+                # Inactive rows leave the compiled rules unchanged
+                with self.rules_cache.own_write():
+                    self.storage.add_categories(rows)
+            print(f"\n✓ Added {len(rows)} suggested keywords to Categories as inactive rows")
+
+        return clusters
+
+    def categorize_email(self, email) -> Tuple[str, float]:
+        """Categorize an email (an EmailRecord or dict) based on subject and learned patterns
+
+        A body snippet attached to the email, normalized as the snippet
+        cache stores it, is matched along with the subject and sender.
+        """
+        # Combined subject, sender and snippet text, scored in one pass; records keep it lowercased
+        if isinstance(email, EmailRecord):
+            text = email.text
+        else:
+            text = email_text(email.get('subject', ''), email.get('sender', ''), email.get('snippet') or '')
+        return self.matcher.categorize(text)
+
+    def categorize_by_sender(self, email) -> Tuple[str, float]:
+        """Categorize from the sender cache when the sender is trusted
+
+        Otherwise, and on the sender cache's periodic re-checks, fall back to
+        categorize_email and learn from its result.
+        """
+        sender = email.get('sender', '')
+        cached = self.sender_cache.lookup(sender)
+        if cached is not None:
+            return cached
+
+        category, confidence = self.categorize_email(email)
+        self.sender_cache.learn(sender, category, confidence)
+        return category, confidence
+
+    def categorize_many(self, emails) -> 'pd.DataFrame':
+        """Categorize a batch of emails at once
+
+        emails is a list of EmailRecords or email dicts, or a DataFrame with
+        subject and sender columns and optionally a snippet column. Returns
+        a DataFrame with category and confidence columns, identical to
+        calling categorize_email on each row.
+        """
+        pd = require_pandas()
+
+        if isinstance(emails, pd.DataFrame):
+            index = emails.index
+            # Plain lists; iterating string Series element by element is several times slower
+            subjects = emails['subject'].fillna('').astype(str).str.lower().tolist()
+            senders = emails['sender'].fillna('').astype(str).str.lower().tolist()
+            if 'snippet' in emails:
+                snippets = emails['snippet'].fillna('').astype(str).tolist()
+                texts = [f"{subject} {sender} {snippet}" if snippet else f"{subject} {sender}"
+                         for subject, sender, snippet in zip(subjects, senders, snippets)]
+            else:
+                texts = [f"{subject} {sender}" for subject, sender in zip(subjects, senders)]
+        else:
+            index = None
+            texts = [email.text if isinstance(email, EmailRecord) else
+                     email_text(email.get('subject') or '', email.get('sender') or '', email.get('snippet') or '')
+                     for email in emails]
+
+        categories, confidence = self.matcher.categorize_many(texts)
+        return pd.DataFrame({'category': categories, 'confidence': confidence}, index=index)
+
+    def check_calendar_match(self, email, events) -> Tuple[bool, str]:
+        """Check if email subject relates to any calendar event
+
+        events is either the list from get_calendar_events or an EventIndex
+        built from it; pass an EventIndex when matching many emails.
+        """
+        if not isinstance(events, EventIndex):
+            events = EventIndex(events)
+
+        if isinstance(email, EmailRecord):
+            return events.match(email.subject, email.words)
+        return events.match(email.get('subject', ''))
+
+    def process_emails(self, limit: Optional[int] = 50, source=None, use_calendar: bool = True,
+                       reprocess: bool = False, workers: int = 1, refresh_calendar: bool = False,
+                       page_size: int = 0, use_sender_cache: bool = True, profile: bool = False,
+                       snippet_bytes: int = 0):
+        """Main processing function
+
+        With no source, unread messages are fetched from Apple Mail. A source
+        from mail_sources is streamed lazily instead, with logs flushed in
+        batches so memory stays constant; limit of None means no limit.
+        Messages already processed by an earlier run are skipped unless
+        reprocess is set. With workers > 1, classification runs in a process
+        pool and results are merged back in input order. A page_size fetches
+        Apple Mail in pages of that many messages, concurrently with the
+        calendar, while earlier pages are being classified. Trusted senders
+        are classified from the sender cache instead of by keyword, unless
+        use_sender_cache is off or workers > 1. With
+        snippet_bytes, the first that many bytes of each Apple Mail body are
+        matched as well, fetched once and kept in the snippet cache.
+
+        Stage timings and counters are appended to the metrics file as one
+        JSON line. With profile, the run is wrapped in cProfile and
+        tracemalloc and the hotspots and peak memory are printed.
+        """
+        self.metrics = RunMetrics()
+        self.metrics.extra.update(source=str(source) if source is not None else 'Apple Mail',
+                                  workers=workers, database=str(self.database_path))
+        profile_result = {}
+        try:
+            with profiled() if profile else nullcontext(profile_result) as profile_result:
+                self._process_emails(limit, source, use_calendar, reprocess, workers,
+                                     refresh_calendar, page_size, use_sender_cache, snippet_bytes)
+        finally:
+            if 'peak_memory_bytes' in profile_result:
+                self.metrics.extra['peak_memory_bytes'] = profile_result['peak_memory_bytes']
+            self.metrics.write(self.metrics_path)
+
+    def _process_emails(self, limit, source, use_calendar, reprocess, workers,
+                        refresh_calendar, page_size, use_sender_cache, snippet_bytes):
         print("\n" + "="*60)
         print("EMAIL CLUSTERING SYSTEM")
         print("="*60)
 
-        # Fetch emails
-        print("\n[1/4] Fetching emails from Apple Mail...")
-        emails = self.get_inbox_emails(limit)
-        print(f"✓ Found {len(emails)} unread emails")
+        fetch = None
 
-        if not emails:
-            print("No unread emails to process.")
-            return
+        # Fetch emails
+        if source is None and page_size:
+            print(f"\n[1/4] Fetching emails from Apple Mail in pages of {page_size}...")
+            if use_calendar:
+                get_events = partial(self.get_upcoming_events, days_ahead=14, refresh=refresh_calendar)
+            else:
+                get_events = list
+            fetch = PipelinedFetch(self.inbox_script, limit if limit is not None else 50,
+                                   get_events, page_size=page_size).start()
+            emails = self.metrics.timed('fetch_emails', fetch.emails())
+            if not reprocess:
+                emails = self.skip_processed(emails)
+            if snippet_bytes:
+                emails = self.with_snippets(emails, snippet_bytes, batch_size=page_size)
+            total = None
+        elif source is None:
+            print("\n[1/4] Fetching emails from Apple Mail...")
+            with self.metrics.stage('fetch_emails'):
+                emails = self.get_inbox_emails(limit if limit is not None else 50)
+            print(f"✓ Found {len(emails)} unread emails")
+
+            if not emails:
+                print("No unread emails to process.")
+                return
+
+            if not reprocess:
+                with self.metrics.stage('skip_processed'):
+                    emails = list(self.skip_processed(emails))
+                print(f"✓ {len(emails)} not processed by an earlier run")
+
+                if not emails:
+                    print("No new emails to process.")
+                    return
+
+            if snippet_bytes:
+                with self.metrics.stage('fetch_snippets'):
+                    self.fetch_snippets(emails, snippet_bytes)
+                counters = self.metrics.counters
+                print(f"✓ Body snippets: {counters['snippet_cache_hits']} cached, "
+                      f"{counters['snippets_fetched']} fetched")
+
+            total = len(emails)
+        else:
+            print(f"\n[1/4] Streaming emails from {source}...")
+            emails = iter(source)
+            if not reprocess:
+                emails = self.skip_processed(emails)
+            if limit is not None:
+                emails = islice(emails, limit)
+            emails = self.metrics.timed('fetch_emails', emails)
+            total = None
+
+            if not self.log_sink.batch_size:
+                self.log_sink.batch_size = STREAM_LOG_BATCH_SIZE
+            if snippet_bytes:
+                print("Note: Body snippets are only fetched from Apple Mail; matching headers only")
 
         # Fetch calendar events
-        print("\n[2/4] Fetching calendar events...")
-        events = self.get_calendar_events(days_ahead=14)
-        print(f"✓ Found {len(events)} upcoming events")
+        if use_calendar:
+            print("\n[2/4] Fetching calendar events...")
+            with self.metrics.stage('fetch_calendar'):
+                if fetch is not None:
+                    # Already running alongside the first inbox page
+                    events = fetch.events()
+                else:
+                    events = self.get_upcoming_events(days_ahead=14, refresh=refresh_calendar)
+            stats = self.calendar_cache.stats
+            print(f"✓ Found {len(events)} upcoming events (cache {self.calendar_cache.last_result}; "
+                  f"{stats['hits']} hits, {stats['incremental']} incremental, {stats['misses']} misses)")
+        else:
+            print("\n[2/4] Skipping calendar events")
+            events = []
+
+        # Tokenize event summaries once for the whole run
+        with self.metrics.stage('index_events'):
+            event_index = EventIndex(events)
+        self.event_index = event_index
+        self.metrics.count('events', len(events))
 
         # Process each email
         print("\n[3/4] Processing and categorizing emails...")
         print("-" * 60)
 
+        processed_count = 0
         categorized_count = 0
         calendar_match_count = 0
 
-        for idx, email in enumerate(emails, 1):
-            subject = email.get('subject', 'No Subject')
-            sender = email.get('sender', 'Unknown')
-
-            # Categorize
-            category, confidence = self.categorize_email(email)
-            if category != 'Uncategorized':
-                categorized_count += 1
-
-            # Check calendar
-            has_calendar_match, matched_event = self.check_calendar_match(email, events)
-            if has_calendar_match:
-                calendar_match_count += 1
-
-            # Display result
-            print(f"\n[{idx}/{len(emails)}] {subject[:50]}")
-            print(f"    From: {sender[:40]}")
-            print(f"    Category: {category} (confidence: {confidence:.2f})")
-
-            if has_calendar_match:
-                print(f"    📅 Calendar Match: {matched_event}")
-
-            # Save log
-            email_data = {
-                'subject': subject,
-                'sender': sender,
-                'category': category,
-                'confidence': confidence,
-                'calendar_match': has_calendar_match,
-                'matched_event': matched_event
-            }
-            self.save_log_entry(email_data)
+        # Categorize and check the calendar
+        if workers > 1:
+            results = classify_parallel(emails, self.matcher, event_index, workers)
+            use_sender_cache = False
+        elif use_sender_cache:
+            with self.metrics.stage('sender_cache'):
+                self.sender_cache.load(rules_fingerprint(self.categories), self.storage.read_logs)
+            results = ((email, self.categorize_by_sender(email) + self.check_calendar_match(email, event_index))
+                       for email in emails)
+        else:
+            results = ((email, self.categorize_email(email) + self.check_calendar_match(email, event_index))
+                       for email in emails)
+
+        with self.metrics.stage('classify'):
+            for idx, (email, result) in enumerate(results, 1):
+                processed_count = idx
+                subject = email.get('subject', 'No Subject')
+                sender = email.get('sender', 'Unknown')
+                category, confidence, has_calendar_match, matched_event = result
+
+                if category != 'Uncategorized':
+                    categorized_count += 1
+
+                if has_calendar_match:
+                    calendar_match_count += 1
+
+                # Display result
+                if source is None:
+                    print(f"\n[{idx}/{total}] {subject[:50]}" if total is not None else f"\n[{idx}] {subject[:50]}")
+                    print(f"    From: {sender[:40]}")
+                    print(f"    Category: {category} (confidence: {confidence:.2f})")
+
+                    if has_calendar_match:
+                        print(f"    📅 Calendar Match: {matched_event}")
+                elif idx % STREAM_PROGRESS_INTERVAL == 0:
+                    print(f"  ... {idx} emails processed")
+
+                # Save log
+                self.log_result(email, category, confidence, has_calendar_match, matched_event)
+
+        self.flush_logs()
+        if snippet_bytes and source is None:
+            self.snippet_cache.prune()
+        if use_sender_cache:
+            with self.metrics.stage('sender_cache'):
+                self.sender_cache.save()
+            self.metrics.count('sender_cache_hits', self.sender_cache.hits)
+        if fetch is not None:
+            self.metrics.count('mail_bytes', fetch.bytes_read)
+
+        self.metrics.count('emails', processed_count)
+        self.metrics.count('categorized', categorized_count)
+        self.metrics.count('calendar_matches', calendar_match_count)
+
+        if not processed_count:
+            print("No new emails to process.")
+            return
 
         # Update statistics
         print("\n[4/4] Updating statistics...")
-        self.update_statistics(len(emails), categorized_count, calendar_match_count)
+        with self.metrics.stage('statistics'):
+            self.update_statistics(processed_count, categorized_count, calendar_match_count)
 
         # Summary
         print("\n" + "="*60)
         print("SUMMARY")
         print("="*60)
-        print(f"Total Emails Processed: {len(emails)}")
-        print(f"Successfully Categorized: {categorized_count} ({categorized_count/len(emails)*100:.1f}%)")
-        print(f"Calendar Matches Found: {calendar_match_count} ({calendar_match_count/len(emails)*100:.1f}%)")
+        print(f"Total Emails Processed: {processed_count}")
+        print(f"Successfully Categorized: {categorized_count} ({categorized_count/processed_count*100:.1f}%)")
+        print(f"Calendar Matches Found: {calendar_match_count} ({calendar_match_count/processed_count*100:.1f}%)")
+        if use_sender_cache:
+            cache = self.sender_cache
+            print(f"Sender Cache Hits: {cache.hits} of {cache.lookups} ({cache.hit_rate*100:.1f}%)")
         print(f"\nDatabase: {self.database_path}")
         print("="*60)
 
 
+def iso_date(value: str) -> str:
+    """argparse type for YYYY-MM-DD dates"""
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        import argparse
+        raise argparse.ArgumentTypeError(f"expected a YYYY-MM-DD date, got {value!r}")
+    return value
+
+
 def main():
     """Main entry point"""
     import argparse
@@ -441,23 +1045,286 @@ def main():
     )
     parser.add_argument(
         '--database',
-        help='Path to Excel database file',
+        help='Path to database file (.xlsx, or .sqlite/.db for the SQLite backend)',
         default=None
     )
     parser.add_argument(
         '--limit',
         type=int,
-        help='Maximum number of emails to process',
-        default=50
+        help='Maximum number of emails to process (default: 50 from Apple Mail, all from an offline source)',
+        default=None
+    )
+    source_group = parser.add_mutually_exclusive_group()
+    source_group.add_argument(
+        '--maildir',
+        metavar='PATH',
+        help='Read messages from a Maildir instead of Apple Mail',
+        default=None
+    )
+    source_group.add_argument(
+        '--mbox',
+        metavar='PATH',
+        help='Read messages from an mbox file instead of Apple Mail',
+        default=None
+    )
+    source_group.add_argument(
+        '--emlx-dir',
+        metavar='PATH',
+        help='Read messages from a directory of exported .emlx files instead of Apple Mail',
+        default=None
+    )
+    parser.add_argument(
+        '--no-calendar',
+        action='store_true',
+        help='Skip calendar matching (useful for offline sources and non-macOS machines)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Classify in N worker processes (for large backfills)',
+        default=1
+    )
+    parser.add_argument(
+        '--calendar-ttl',
+        type=int,
+        help='Reuse cached calendar events for this many minutes (default: 15)',
+        default=DEFAULT_TTL // 60
+    )
+    parser.add_argument(
+        '--refresh-calendar',
+        action='store_true',
+        help='Ignore the calendar event cache and fetch the full window'
+    )
+    parser.add_argument(
+        '--page-size',
+        type=int,
+        help='Fetch Apple Mail in pages of N messages, overlapping fetching with classification',
+        default=0
+    )
+    parser.add_argument(
+        '--snippet-bytes',
+        type=int,
+        nargs='?',
+        const=DEFAULT_SNIPPET_BYTES,
+        metavar='N',
+        help='Also match the first N bytes of each message body, fetched once from Apple Mail '
+             f'and cached next to the database (default N: {DEFAULT_SNIPPET_BYTES})',
+        default=0
+    )
+    parser.add_argument(
+        '--no-sender-cache',
+        action='store_true',
+        help='Classify every email by keyword, even from senders with a consistent history'
+    )
+    parser.add_argument(
+        '--reprocess',
+        action='store_true',
+        help='Process messages again even if an earlier run already handled them'
+    )
+    parser.add_argument(
+        '--log-batch-size',
+        type=int,
+        help='Write email logs every N emails (default: once at the end of the run)',
+        default=0
+    )
+    parser.add_argument(
+        '--rebuild-stats',
+        action='store_true',
+        help='Recompute daily statistics and rollups from the full email log and exit'
+    )
+    parser.add_argument(
+        '--partition-logs',
+        action='store_true',
+        help='Move EmailLogs into monthly compressed files next to the database and exit'
+    )
+    parser.add_argument(
+        '--log-retention-months',
+        type=int,
+        help='With partitioned logs, delete months older than N months (default: keep all)',
+        default=None
+    )
+    parser.add_argument(
+        '--metrics-file',
+        metavar='PATH',
+        help='Append per-run stage timings and counters as JSON lines here '
+             '(default: next to the database, ending in .metrics.jsonl)',
+        default=None
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile the run with cProfile and tracemalloc and print hotspots and peak memory'
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Stay resident: poll for new mail on an interval and classify on demand over a Unix socket'
+    )
+    parser.add_argument(
+        '--poll-interval',
+        type=int,
+        help=f'With --daemon, seconds between mail polls (default: {DEFAULT_POLL_INTERVAL})',
+        default=DEFAULT_POLL_INTERVAL
+    )
+    parser.add_argument(
+        '--socket',
+        metavar='PATH',
+        help='With --daemon, the Unix socket to listen on (default: next to the database, ending in .sock)',
+        default=None
     )
+    parser.add_argument(
+        '--cluster',
+        action='store_true',
+        help='Report the largest clusters of similar Uncategorized emails in the log and exit'
+    )
+    parser.add_argument(
+        '--top-clusters',
+        type=int,
+        help='Number of clusters to report (default: 10)',
+        default=10
+    )
+    parser.add_argument(
+        '--suggest-keywords',
+        action='store_true',
+        help='With --cluster, add each cluster\'s terms to Categories as inactive keywords'
+    )
+    parser.add_argument(
+        '--export-parquet',
+        metavar='DIR',
+        nargs='?',
+        const='',
+        help='Export logs, statistics and rollups as Parquet for reports and exit '
+             '(default DIR: next to the database, ending in .parquet)',
+        default=None
+    )
+    parser.add_argument(
+        '--export-xlsx',
+        metavar='PATH',
+        help='Export categories, logs and statistics to an Excel workbook and exit',
+        default=None
+    )
+
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    report_parser = subparsers.add_parser(
+        'report',
+        help='Answer common questions from the Parquet export',
+        description='Report on the Parquet export. Reads only the columns and months the report needs.'
+    )
+    report_parser.add_argument('report', choices=sorted(REPORTS), help='Which report to run')
+    report_parser.add_argument('--from', dest='start', type=iso_date, metavar='YYYY-MM-DD',
+                               help='First day to include', default=None)
+    report_parser.add_argument('--to', dest='end', type=iso_date, metavar='YYYY-MM-DD',
+                               help='Last day to include', default=None)
+    report_parser.add_argument('--top', type=int, help='Senders per category for top-senders (default: 5)',
+                               default=5)
+    report_parser.add_argument('--data', metavar='DIR', default=None,
+                               help='Parquet export to read (default: the database\'s export)')
+    report_parser.add_argument('--refresh', action='store_true',
+                               help='Export the database to Parquet before reporting')
+
+    replay_parser = subparsers.add_parser(
+        'replay',
+        help='Show how logged emails would be categorized by the current rules',
+        description='Stream the email log through the current keyword rules and report category changes. '
+                    'Reads only the database; Mail and Calendar are not used.'
+    )
+    replay_parser.add_argument('--from', dest='start', type=iso_date, metavar='YYYY-MM-DD',
+                               help='First day to include', default=None)
+    replay_parser.add_argument('--to', dest='end', type=iso_date, metavar='YYYY-MM-DD',
+                               help='Last day to include', default=None)
+    replay_parser.add_argument('--sample', type=int, metavar='N',
+                               help=f'Changed emails to show (default: {DEFAULT_SAMPLE_SIZE})',
+                               default=DEFAULT_SAMPLE_SIZE)
+
+    add_keyword_parser = subparsers.add_parser('add-keyword', help='Add an active keyword to a category')
+    add_keyword_parser.add_argument('category', help='Category to add the keyword to (created if new)')
+    add_keyword_parser.add_argument('keyword', help='Keyword to match')
+    disable_keyword_parser = subparsers.add_parser('disable-keyword', help='Deactivate a keyword')
+    disable_keyword_parser.add_argument('keyword', help='Keyword to deactivate')
+    disable_keyword_parser.add_argument('--category', default=None,
+                                        help='Only deactivate it in this category (default: everywhere)')
+    move_keyword_parser = subparsers.add_parser('move-keyword', help='Move a keyword to another category')
+    move_keyword_parser.add_argument('keyword', help='Keyword to move')
+    move_keyword_parser.add_argument('category', help='Category to move it to (created if new)')
+    move_keyword_parser.add_argument('--from', dest='from_category', default=None,
+                                     help='Only move it out of this category (default: every category)')
 
     args = parser.parse_args()
 
+    if args.command == 'report':
+        data_dir = args.data or parquet_dir(args.database or default_database_path())
+        if args.refresh:
+            EmailClusterer(database_path=args.database).export_parquet(data_dir)
+        try:
+            result = run_report(args.report, data_dir, args.start, args.end, top=args.top)
+        except FileNotFoundError as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        print(result.to_string() if not result.empty else "No logged emails in that range.")
+        return
+
     # Create clusterer instance
-    clusterer = EmailClusterer(database_path=args.database)
+    clusterer = EmailClusterer(database_path=args.database, log_batch_size=args.log_batch_size,
+                               calendar_ttl=args.calendar_ttl * 60, metrics_path=args.metrics_file,
+                               log_retention_months=args.log_retention_months)
+
+    if args.command == 'replay':
+        clusterer.replay(args.start, args.end, sample_size=args.sample)
+        return
+
+    if args.command in ('add-keyword', 'disable-keyword', 'move-keyword'):
+        try:
+            if args.command == 'add-keyword':
+                clusterer.add_keyword(args.category, args.keyword)
+            elif args.command == 'disable-keyword':
+                clusterer.disable_keyword(args.keyword, args.category)
+            else:
+                clusterer.move_keyword(args.keyword, args.category, args.from_category)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        return
+
+    if args.partition_logs:
+        clusterer.partition_logs()
+        return
+
+    if args.cluster:
+        clusterer.cluster_uncategorized(top=args.top_clusters, suggest=args.suggest_keywords)
+        return
+
+    if args.rebuild_stats:
+        clusterer.rebuild_statistics()
+        return
+
+    if args.export_parquet is not None:
+        clusterer.export_parquet(args.export_parquet or None)
+        return
+
+    if args.export_xlsx:
+        clusterer.storage.export_xlsx(Path(args.export_xlsx))
+        print(f"✓ Exported database to: {args.export_xlsx}")
+        return
+
+    source = open_mail_source(maildir=args.maildir, mbox=args.mbox, emlx_dir=args.emlx_dir)
+    options = dict(limit=args.limit, source=source, use_calendar=not args.no_calendar,
+                   reprocess=args.reprocess, workers=args.workers,
+                   refresh_calendar=args.refresh_calendar, page_size=args.page_size,
+                   use_sender_cache=not args.no_sender_cache, profile=args.profile,
+                   snippet_bytes=args.snippet_bytes)
+
+    if args.daemon:
+        daemon = ClassifierDaemon(clusterer, args.socket or default_socket_path(clusterer.database_path),
+                                  poll_interval=args.poll_interval, process_options=options)
+        try:
+            daemon.serve_forever()
+        except (OSError, RuntimeError) as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        return
 
     # Process emails
-    clusterer.process_emails(limit=args.limit)
+    clusterer.process_emails(**options)
 
 
 if __name__ == '__main__':
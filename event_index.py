@@ -0,0 +1,66 @@
+"""
+Inverted token index over calendar events
+Lets calendar matching look only at events that share a word with the email
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Words of this length or shorter are too common to count as a match
+MIN_WORD_LENGTH = 4
+MIN_COMMON_WORDS = 2
+
+
+def significant_words(text: str) -> set:
+    """Return the lowercased words of text long enough to count towards a match"""
+    return {word for word in re.findall(r'\w+', text.lower()) if len(word) >= MIN_WORD_LENGTH}
+
+
+class EventIndex:
+    """Word -> event postings built once per run from get_calendar_events output"""
+
+    def __init__(self, events: List[Dict]):
+        """Tokenize every event summary once"""
+        self.events = events
+        self.postings = {}
+
+        for event_idx, event in enumerate(events):
+            for word in significant_words(event.get('summary', '')):
+                self.postings.setdefault(word, []).append(event_idx)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def best_match(self, subject: str, words: Optional[Iterable[str]] = None) -> Tuple[int, int]:
+        """Return (event index, common word count) of the best event, or (-1, 0)
+
+        words, if given, are the subject's significant words already extracted.
+        """
+        if words is None:
+            words = significant_words(subject)
+
+        overlap = {}
+        for word in words:
+            for event_idx in self.postings.get(word, ()):
+                overlap[event_idx] = overlap.get(event_idx, 0) + 1
+
+        best_idx = -1
+        best_score = 0
+        for event_idx, score in overlap.items():
+            # The earliest event wins ties, as in a linear scan
+            if score > best_score or (score == best_score and event_idx < best_idx):
+                best_idx = event_idx
+                best_score = score
+
+        return best_idx, best_score
+
+    def match(self, subject: str, words: Optional[Iterable[str]] = None) -> Tuple[bool, str]:
+        """Return whether subject matches an event and the event summary"""
+        best_idx, best_score = self.best_match(subject, words)
+
+        # Threshold for considering a match
+        if best_score >= MIN_COMMON_WORDS:
+            return True, self.events[best_idx].get('summary', '')
+
+        return False, ''
@@ -0,0 +1,166 @@
+"""
+Write-ahead journal and file locks for the Email Clustering System
+Runs append their log rows and counts to a small journal file instead of
+rewriting the workbook; the journal is later applied to the workbook in
+one locked rewrite that replaces the file with an atomic rename, so
+overlapping runs lose nothing and a crash cannot leave a half-written
+database
+"""
+
+import fcntl
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# Seconds to wait for another process to release a lock
+LOCK_TIMEOUT = 300
+
+# Seconds between attempts to take a busy lock
+LOCK_POLL_INTERVAL = 0.05
+
+# Seconds of waiting for a lock before telling the user
+LOCK_NOTICE_AFTER = 1.0
+
+
+class DatabaseLocked(TimeoutError):
+    """Another process held a database lock for longer than the timeout"""
+    pass
+
+
+class FileLock:
+    """Exclusive advisory lock (flock) on a lock file
+
+    Each acquisition opens its own file descriptor, so two threads of one
+    process exclude each other just like two processes do. Not reentrant.
+    """
+
+    def __init__(self, path, timeout: float = LOCK_TIMEOUT):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._fd = None
+
+    def acquire(self):
+        """Wait until the lock is free and take it; raise DatabaseLocked after the timeout"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        start = time.monotonic()
+        noticed = False
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                waited = time.monotonic() - start
+                if waited >= self.timeout:
+                    os.close(fd)
+                    raise DatabaseLocked(f"{self.path} is still locked by another run after {self.timeout:.0f}s")
+                if waited >= LOCK_NOTICE_AFTER and not noticed:
+                    print(f"Waiting for another run to release {self.path.name}...")
+                    noticed = True
+                time.sleep(LOCK_POLL_INTERVAL)
+        self._fd = fd
+
+    def release(self):
+        """Release the lock"""
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _json_default(value):
+    """Serialize numpy scalars and anything else json does not know"""
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+class WriteJournal:
+    """Append-only JSON-lines file of pending writes, applied to the database in groups
+
+    The first line of a journal holds a random generation id; each further
+    line is one write, {"op": ..., "rows": [...]}. To commit, the journal
+    is renamed to <journal>.committing so new writes start a fresh one,
+    and the database records the generation it applied, so a commit
+    interrupted after the database was replaced is not applied twice.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.committing_path = self.path.with_name(self.path.name + '.committing')
+        self.lock = FileLock(self.path.with_name(self.path.name + '.lock'))
+
+    def append(self, op: str, rows: List[Dict]):
+        """Durably record one write"""
+        if not rows:
+            return
+        line = json.dumps({'op': op, 'rows': rows}, default=_json_default) + '\n'
+        with self.lock:
+            with open(self.path, 'a+b') as fp:
+                size = fp.seek(0, os.SEEK_END)
+                if size == 0:
+                    fp.write((json.dumps({'generation': uuid.uuid4().hex}) + '\n').encode('utf-8'))
+                else:
+                    # A crash in the middle of an append leaves a torn last line; start a new one after it
+                    fp.seek(size - 1)
+                    if fp.read(1) != b'\n':
+                        fp.write(b'\n')
+                fp.write(line.encode('utf-8'))
+                fp.flush()
+                os.fsync(fp.fileno())
+
+    def pending(self) -> bool:
+        """Check whether any writes are waiting to be committed"""
+        return self.path.exists() or self.committing_path.exists()
+
+    def rotate(self) -> bool:
+        """Move the current journal aside for committing; return False if there was none"""
+        with self.lock:
+            if not self.path.exists():
+                return False
+            os.replace(self.path, self.committing_path)
+            return True
+
+    def read_committing(self) -> Tuple[Optional[str], List[Dict]]:
+        """Return the generation and writes of the journal being committed"""
+        return self._read(self.committing_path)
+
+    def read_pending(self) -> List[Dict]:
+        """Return the writes of the current journal, which no commit has picked up yet"""
+        with self.lock:
+            if not self.path.exists():
+                return []
+            return self._read(self.path)[1]
+
+    def _read(self, path: Path) -> Tuple[Optional[str], List[Dict]]:
+        """Return the generation and writes of a journal file
+
+        A torn last line, left by a crash in the middle of an append, is
+        ignored; that write was never reported as done.
+        """
+        generation = None
+        writes = []
+        with open(path, encoding='utf-8') as fp:
+            for number, line in enumerate(fp):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"Warning: Ignoring an incomplete journal entry in {path.name}")
+                    continue
+                if number == 0:
+                    generation = record.get('generation')
+                else:
+                    writes.append(record)
+        return generation, writes
+
+    def finish(self):
+        """Drop the committed journal"""
+        self.committing_path.unlink()
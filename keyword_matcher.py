@@ -0,0 +1,380 @@
+"""
+Multi-keyword matcher for email categorization
+Compiles the category keyword table into an Aho-Corasick automaton so every
+category can be scored in a single pass over the email text
+"""
+
+from collections import deque
+from itertools import repeat
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# Distinct tokens whose keyword hits find_keywords_many remembers between calls
+TOKEN_CACHE_SIZE = 500000
+
+
+def email_text(subject: str, sender: str, snippet: str = '') -> str:
+    """Return the lowercased text an email is categorized on
+
+    snippet is a body snippet already normalized by the snippet cache.
+    """
+    if snippet:
+        return f"{subject.lower()} {sender.lower()} {snippet}"
+    return f"{subject.lower()} {sender.lower()}"
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over all active keywords
+
+    Scores match the plain `keyword in text` loop: each keyword counts once
+    per category it is listed under (duplicates count again), no matter how
+    often it occurs in the text, and ties go to the category listed first.
+
+    add() and remove() edit the compiled rules in place. A removed keyword
+    stays in the trie with no categories to score until the matcher is
+    rebuilt; reorder() then puts the categories in the order a fresh compile
+    of the edited rules would have, dropping emptied ones.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]]):
+        """Compile the category -> keywords table"""
+        self.category_names = list(categories)
+
+        # Per distinct keyword: [(category index, times listed), ...]
+        self.keywords = []
+        self.keyword_outputs = []
+        self.keyword_ids = {}
+        self.always_scores = [0] * len(self.category_names)
+
+        for cat_idx, (category, keywords) in enumerate(categories.items()):
+            for keyword in keywords:
+                if keyword == '':
+                    # An empty keyword is a substring of every text
+                    self.always_scores[cat_idx] += 1
+                    continue
+
+                if keyword not in self.keyword_ids:
+                    self.keyword_ids[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+                    self.keyword_outputs.append({})
+
+                outputs = self.keyword_outputs[self.keyword_ids[keyword]]
+                outputs[cat_idx] = outputs.get(cat_idx, 0) + 1
+
+        self.keyword_outputs = [list(outputs.items()) for outputs in self.keyword_outputs]
+        self._build(self.keywords)
+        self.weight_ptr = None
+
+    def _build(self, keywords: List[str]):
+        """Build the trie, failure links and merged output sets"""
+        self.goto = [{}]
+        self.terminal = [[]]
+        self.fail = [0]
+        self.output = [[]]
+
+        for keyword_id, keyword in enumerate(keywords):
+            self._insert(keyword_id, keyword)
+        self._link()
+
+    def _insert(self, keyword_id: int, keyword: str):
+        """Add a keyword's path to the trie; _link() must run before it can match"""
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto.append({})
+                self.terminal.append([])
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = next_state
+            state = next_state
+        self.terminal[state].append(keyword_id)
+
+    def _link(self):
+        """Compute failure links and merged output sets over the whole trie"""
+        goto = self.goto
+        fail = [0] * len(goto)
+        output = [list(keyword_ids) for keyword_ids in self.terminal]
+        queue = deque(goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+
+                if output[fail[next_state]]:
+                    output[next_state] = output[next_state] + output[fail[next_state]]
+
+        self.fail = fail
+        self.output = output
+
+    def _category_index(self, category: str) -> int:
+        """Return a category's index, adding it after the existing categories if new"""
+        if category not in self.category_names:
+            self.always_scores.append(0)
+            self.category_names.append(category)
+        return self.category_names.index(category)
+
+    def add(self, category: str, keyword: str):
+        """Score keyword for category as well, without recompiling the other keywords
+
+        A keyword already in the trie only gets another output; a new one is
+        inserted and the failure links are recomputed, which costs a walk
+        over the trie but no rebuild of it.
+        """
+        cat_idx = self._category_index(category)
+        if keyword == '':
+            self.always_scores[cat_idx] += 1
+            return
+
+        keyword_id = self.keyword_ids.get(keyword)
+        if keyword_id is None:
+            keyword_id = len(self.keywords)
+            self.keywords.append(keyword)
+            self.keyword_outputs.append([])
+            self._insert(keyword_id, keyword)
+            self._link()
+            self.keyword_ids[keyword] = keyword_id
+
+        outputs = dict(self.keyword_outputs[keyword_id])
+        outputs[cat_idx] = outputs.get(cat_idx, 0) + 1
+        self.keyword_outputs[keyword_id] = list(outputs.items())
+        self.weight_ptr = None
+
+    def remove(self, category: str, keyword: str):
+        """Stop scoring one listing of keyword for category"""
+        if category not in self.category_names:
+            return
+        cat_idx = self.category_names.index(category)
+        if keyword == '':
+            self.always_scores[cat_idx] = max(self.always_scores[cat_idx] - 1, 0)
+            return
+
+        keyword_id = self.keyword_ids.get(keyword)
+        if keyword_id is None:
+            return
+        outputs = dict(self.keyword_outputs[keyword_id])
+        if outputs.get(cat_idx, 0) > 1:
+            outputs[cat_idx] -= 1
+        else:
+            outputs.pop(cat_idx, None)
+        self.keyword_outputs[keyword_id] = list(outputs.items())
+        self.weight_ptr = None
+
+    def reorder(self, category_names: List[str]):
+        """Renumber the categories to follow category_names, as compiling the rules in that order would
+
+        Categories missing from category_names must have no keywords left;
+        ones not seen before start with none.
+        """
+        new_index = {category: idx for idx, category in enumerate(category_names)}
+        moved = [new_index.get(category) for category in self.category_names]
+
+        always_scores = [0] * len(category_names)
+        for old_idx, new_idx in enumerate(moved):
+            if new_idx is not None:
+                always_scores[new_idx] = self.always_scores[old_idx]
+        self.keyword_outputs = [sorted((moved[cat_idx], count) for cat_idx, count in outputs
+                                       if moved[cat_idx] is not None)
+                                for outputs in self.keyword_outputs]
+        self.category_names = list(category_names)
+        self.always_scores = always_scores
+        self.weight_ptr = None
+
+    def _build_weights(self):
+        """Flatten keyword outputs into a CSR-style keyword x category weight table"""
+        import numpy as np
+
+        # Keywords that can span space-separated tokens, for find_keywords_many
+        self.spaced_keywords = [(keyword_id, keyword) for keyword_id, keyword in enumerate(self.keywords)
+                                if ' ' in keyword]
+        self._clear_token_cache()
+
+        pair_counts = [len(outputs) for outputs in self.keyword_outputs]
+        self.weight_ptr = np.zeros(len(pair_counts) + 1, dtype=np.int64)
+        np.cumsum(pair_counts, out=self.weight_ptr[1:])
+        self.weight_category = np.array(
+            [cat_idx for outputs in self.keyword_outputs for cat_idx, _ in outputs], dtype=np.int64
+        )
+        self.weight_value = np.array(
+            [count for outputs in self.keyword_outputs for _, count in outputs], dtype=np.float64
+        )
+
+    def _clear_token_cache(self):
+        """Forget the keyword hits of tokens seen by find_keywords_many"""
+        # Token -> id, and the keyword ids found in each token id, CSR-style
+        self.token_ids = {}
+        self.token_hit_ptr = [0]
+        self.token_hits = []
+
+    def __getstate__(self) -> Dict:
+        """Pickle the compiled rules without the bulk tables; they are rebuilt on first use"""
+        state = dict(self.__dict__)
+        for name in ('weight_category', 'weight_value', 'spaced_keywords',
+                     'token_ids', 'token_hit_ptr', 'token_hits'):
+            state.pop(name, None)
+        state['weight_ptr'] = None
+        return state
+
+    def find_keywords(self, text: str) -> set:
+        """Return the ids of all keywords occurring in text"""
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        found = set()
+        state = 0
+
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+
+        return found
+
+    def find_keywords_many(self, texts: List[str]) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Return (text index, keyword id) arrays with one entry per keyword occurring in each text
+
+        A keyword without a space always lies inside one space-separated
+        token, so those are found once per distinct token rather than once
+        per text; mail repeats most of its words. Token hits are remembered
+        across calls until the rules change. Keywords containing a space are
+        looked for in each text directly.
+        """
+        import numpy as np
+
+        if self.weight_ptr is None:
+            self._build_weights()
+        if not texts or not self.keywords:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        tokens = ' '.join(texts).split(' ')
+        token_counts = np.fromiter(map(str.count, texts, repeat(' ')), dtype=np.int64, count=len(texts)) + 1
+        token_rows = np.repeat(np.arange(len(texts), dtype=np.int64), token_counts)
+
+        distinct = dict.fromkeys(tokens)
+        if len(self.token_ids) + len(distinct) > TOKEN_CACHE_SIZE:
+            self._clear_token_cache()
+        token_ids = self.token_ids
+        for token in distinct:
+            if token not in token_ids:
+                token_ids[token] = len(token_ids)
+                self.token_hits.extend(self.find_keywords(token))
+                self.token_hit_ptr.append(len(self.token_hits))
+        codes = np.fromiter(map(token_ids.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+        del tokens, distinct
+
+        found_ptr = np.asarray(self.token_hit_ptr, dtype=np.int64)
+        found = np.asarray(self.token_hits, dtype=np.int64)
+
+        # Expand each token occurrence into its keyword hits
+        starts = found_ptr[codes]
+        lengths = found_ptr[codes + 1] - starts
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        hit_rows = [np.repeat(token_rows, lengths)]
+        hit_keywords = [found[np.repeat(starts, lengths) + offsets]]
+
+        for keyword_id, keyword in self.spaced_keywords:
+            rows = [row for row, text in enumerate(texts) if keyword in text]
+            hit_rows.append(np.asarray(rows, dtype=np.int64))
+            hit_keywords.append(np.full(len(rows), keyword_id, dtype=np.int64))
+
+        # A keyword counts once per text however many tokens contain it; sorting
+        # and dropping repeats is much faster than np.unique's hashing here
+        pairs = np.sort(np.concatenate(hit_rows) * len(self.keywords) + np.concatenate(hit_keywords))
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))] if len(pairs) else pairs
+        return pairs // len(self.keywords), pairs % len(self.keywords)
+
+    def score(self, text: str) -> List[int]:
+        """Return the keyword score of every category for text"""
+        scores = list(self.always_scores)
+        outputs = self.keyword_outputs
+
+        for keyword_id in self.find_keywords(text):
+            for cat_idx, count in outputs[keyword_id]:
+                scores[cat_idx] += count
+
+        return scores
+
+    def categorize(self, text: str) -> Tuple[str, float]:
+        """Return the best category and confidence for already-lowercased text"""
+        scores = self.score(text)
+
+        best_idx = -1
+        best_score = 0
+        for cat_idx, score in enumerate(scores):
+            if score > best_score:
+                best_idx = cat_idx
+                best_score = score
+
+        if best_idx >= 0:
+            return self.category_names[best_idx], min(best_score / 3.0, 1.0)
+
+        return 'Uncategorized', 0.0
+
+    def score_many(self, texts: List[str]) -> 'np.ndarray':
+        """Return a texts x categories score matrix
+
+        Keyword hits are collected as a sparse text x keyword matrix and
+        reduced with the keyword x category weights in one vectorized step.
+        """
+        import numpy as np
+
+        if self.weight_ptr is None:
+            self._build_weights()
+
+        n_categories = len(self.category_names)
+        hit_rows, hit_keywords = self.find_keywords_many(texts)
+
+        # Expand each (text, keyword) hit into one entry per category the keyword scores
+        starts = self.weight_ptr[hit_keywords]
+        lengths = self.weight_ptr[hit_keywords + 1] - starts
+        entry_rows = np.repeat(hit_rows, lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        entries = np.repeat(starts, lengths) + offsets
+
+        flat = entry_rows * n_categories + self.weight_category[entries]
+        scores = np.bincount(flat, weights=self.weight_value[entries],
+                             minlength=len(texts) * n_categories).reshape(len(texts), n_categories)
+        return scores + np.asarray(self.always_scores, dtype=np.float64)
+
+    def categorize_many(self, texts: Iterable[str]) -> Tuple[List[str], 'np.ndarray']:
+        """Categorize many already-lowercased texts; same results as categorize per text"""
+        import numpy as np
+
+        # Score each distinct text once; bulk mail repeats subjects a lot.
+        # last_seen maps each distinct text to the position of its last copy
+        texts = list(texts)
+        last_seen = dict(zip(texts, range(len(texts))))
+        unique_texts = list(last_seen)
+        if len(unique_texts) == len(texts):
+            codes = np.arange(len(texts))
+        else:
+            unique_ids = np.empty(len(texts), dtype=np.int64)
+            unique_ids[np.fromiter(last_seen.values(), dtype=np.int64, count=len(last_seen))] = \
+                np.arange(len(last_seen))
+            codes = unique_ids[np.fromiter(map(last_seen.__getitem__, texts), dtype=np.int64, count=len(texts))]
+
+        if not self.category_names:
+            return ['Uncategorized'] * len(codes), np.zeros(len(codes))
+
+        scores = self.score_many(unique_texts)
+        best_idx = scores.argmax(axis=1)
+        best_score = scores[np.arange(len(unique_texts)), best_idx]
+
+        names = np.array(list(self.category_names) + ['Uncategorized'], dtype=object)
+        best_idx = np.where(best_score > 0, best_idx, len(self.category_names))
+        confidence = np.minimum(best_score / 3.0, 1.0)
+
+        return list(names[best_idx[codes]]), confidence[codes]
@@ -0,0 +1,131 @@
+"""
+Partitioned email log storage for the Email Clustering System
+Keeps EmailLogs as one gzip-compressed CSV file per month in a folder next
+to the database, so the rules workbook stays small and a date-range query
+only reads the months it covers
+"""
+
+import csv
+import gzip
+import io
+import re
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from journal import FileLock
+from storage import LOG_COLUMNS, require_pandas
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+PARTITION_RE = re.compile(r'^logs-(\d{4}-\d{2})\.csv\.gz$')
+
+
+def partition_month(timestamp) -> str:
+    """Return the YYYY-MM partition of a log timestamp"""
+    return str(timestamp)[:7]
+
+
+def months_ago(months: int, today: Optional[date] = None) -> str:
+    """Return the YYYY-MM of the month that many months before today's"""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class PartitionedLogStore:
+    """EmailLogs rows stored as logs-YYYY-MM.csv.gz files, one per month
+
+    Appends add a gzip member to the current month's file, so old months
+    are never rewritten and a new month starts a new file. With retention,
+    months older than that many months are deleted when logs are appended.
+    Appends hold a lock on the folder, so overlapping runs never interleave
+    their gzip members.
+    """
+
+    def __init__(self, directory, retention_months: Optional[int] = None):
+        self.directory = Path(directory)
+        self.retention_months = retention_months
+
+    def exists(self) -> bool:
+        """Check whether partitioned logs are in use"""
+        return self.directory.is_dir()
+
+    def path(self, month: str) -> Path:
+        """Return the file of a YYYY-MM partition"""
+        return self.directory / f'logs-{month}.csv.gz'
+
+    def months(self) -> List[str]:
+        """Return the YYYY-MM partitions present, oldest first"""
+        if not self.exists():
+            return []
+        matches = (PARTITION_RE.match(path.name) for path in self.directory.iterdir())
+        return sorted(match.group(1) for match in matches if match)
+
+    def append(self, entries: List[Dict]):
+        """Append log entries to the partitions of their months"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        by_month = defaultdict(list)
+        for entry in entries:
+            by_month[partition_month(entry.get('Timestamp', ''))].append(entry)
+
+        with FileLock(self.directory / '.lock'):
+            for month, rows in by_month.items():
+                path = self.path(month)
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=LOG_COLUMNS, extrasaction='ignore')
+                if not path.exists():
+                    writer.writeheader()
+                writer.writerows(rows)
+                # Each append is a new gzip member; readers see one continuous file
+                with gzip.open(path, 'at', encoding='utf-8', newline='') as fp:
+                    fp.write(buffer.getvalue())
+
+            if self.retention_months is not None:
+                self.rotate()
+
+    def rotate(self) -> List[str]:
+        """Delete partitions older than the retention period and return their months"""
+        oldest = months_ago(self.retention_months)
+        removed = [month for month in self.months() if month < oldest]
+        for month in removed:
+            self.path(month).unlink()
+        return removed
+
+    def read(self, start: Optional[str] = None, end: Optional[str] = None) -> 'pd.DataFrame':
+        """Return log rows with timestamps from start to end, inclusive
+
+        start and end are YYYY-MM-DD dates, or None for an open range. Only
+        the partitions of months inside the range are read.
+        """
+        pd = require_pandas()
+
+        months = [month for month in self.months()
+                  if (start is None or month >= start[:7]) and (end is None or month <= end[:7])]
+        frames = [pd.read_csv(self.path(month), compression='gzip', keep_default_na=False,
+                              dtype={'Subject': str, 'Sender': str, 'MatchedEvent': str, 'MessageId': str})
+                  for month in months]
+        if not frames:
+            return pd.DataFrame(columns=LOG_COLUMNS)
+
+        logs = pd.concat(frames, ignore_index=True)
+        logs['CalendarMatch'] = logs['CalendarMatch'].astype(str) == 'True'
+        logs['Confidence'] = pd.to_numeric(logs['Confidence'], errors='coerce').fillna(0.0)
+
+        day = logs['Timestamp'].astype(str).str[:10]
+        mask = pd.Series(True, index=logs.index)
+        if start is not None:
+            mask &= day >= start
+        if end is not None:
+            mask &= day <= end
+        return logs[mask].reset_index(drop=True)
+
+    def iter_read(self, start: Optional[str] = None, end: Optional[str] = None):
+        """Yield the same rows as read(start, end), one month at a time"""
+        for month in self.months():
+            if (start is None or month >= start[:7]) and (end is None or month <= end[:7]):
+                yield self.read(max(start or '', f'{month}-01'), min(end or '9999-12-31', f'{month}-31'))
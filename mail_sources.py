@@ -0,0 +1,157 @@
+"""
+Offline mail sources for the Email Clustering System
+Stream messages lazily from a Maildir, an mbox file or a directory of Apple
+Mail .emlx exports, yielding the same EmailRecords as get_inbox_emails
+"""
+
+import os
+import re
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from email import policy
+from pathlib import Path
+from typing import Iterator, Optional, BinaryIO
+
+from records import EmailRecord
+
+
+_header_parser = BytesHeaderParser(policy=policy.compat32)
+
+
+def _decode(value) -> str:
+    """Decode an RFC 2047 encoded header value to plain text"""
+    if value is None:
+        return ''
+    # Unfold continuation lines before decoding
+    value = re.sub(r'\r?\n[ \t]', ' ', str(value))
+    try:
+        return str(make_header(decode_header(value))).strip()
+    except Exception:
+        return value.strip()
+
+
+def read_header_block(fp: BinaryIO) -> bytes:
+    """Read header lines up to the first blank line, leaving the body unread"""
+    lines = []
+    for line in fp:
+        if line in (b'\n', b'\r\n'):
+            break
+        lines.append(line)
+    return b''.join(lines)
+
+
+def parse_message_headers(header_bytes: bytes, fallback_id: str = '') -> EmailRecord:
+    """Turn a raw header block into an EmailRecord"""
+    msg = _header_parser.parsebytes(header_bytes)
+    return EmailRecord(
+        subject=_decode(msg.get('Subject')),
+        sender=_decode(msg.get('From')),
+        date_received=_decode(msg.get('Date')),
+        message_id=_decode(msg.get('Message-ID')) or fallback_id
+    )
+
+
+class MaildirSource:
+    """Messages from a Maildir tree (every cur/ and new/ folder below the path)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def __str__(self) -> str:
+        return f"Maildir {self.path}"
+
+    def __iter__(self) -> Iterator[EmailRecord]:
+        for dirpath, dirnames, _ in os.walk(self.path):
+            dirnames.sort()
+            if os.path.basename(dirpath) not in ('cur', 'new'):
+                continue
+            dirnames[:] = []
+
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    if not entry.is_file() or entry.name.startswith('.'):
+                        continue
+                    try:
+                        with open(entry.path, 'rb') as fp:
+                            header_bytes = read_header_block(fp)
+                    except OSError as e:
+                        print(f"Warning: Could not read {entry.path}: {e}")
+                        continue
+                    # Maildir file names are unique; drop the ":2,FLAGS" info suffix
+                    yield parse_message_headers(header_bytes, entry.name.split(':', 1)[0])
+
+
+class MboxSource:
+    """Messages from an mbox file, read one line at a time"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def __str__(self) -> str:
+        return f"mbox {self.path}"
+
+    def __iter__(self) -> Iterator[EmailRecord]:
+        with open(self.path, 'rb') as fp:
+            header_lines = None
+            in_headers = False
+            offset = 0
+            message_offset = 0
+            previous_blank = True
+
+            for line in fp:
+                # A separator is a "From " line at the start of the file or after a blank line
+                if line.startswith(b'From ') and previous_blank and not in_headers:
+                    if header_lines is not None:
+                        yield parse_message_headers(b''.join(header_lines), f"{self.path.name}:{message_offset}")
+                    header_lines = []
+                    in_headers = True
+                    message_offset = offset
+                elif in_headers:
+                    if line in (b'\n', b'\r\n'):
+                        in_headers = False
+                    else:
+                        header_lines.append(line)
+                offset += len(line)
+                previous_blank = line in (b'\n', b'\r\n')
+
+            if header_lines is not None:
+                yield parse_message_headers(b''.join(header_lines), f"{self.path.name}:{message_offset}")
+
+
+class EmlxSource:
+    """Messages from a directory tree of Apple Mail .emlx files"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def __str__(self) -> str:
+        return f".emlx files in {self.path}"
+
+    def __iter__(self) -> Iterator[EmailRecord]:
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.endswith('.emlx'):
+                    continue
+                file_path = os.path.join(dirpath, filename)
+                try:
+                    with open(file_path, 'rb') as fp:
+                        # First line holds the byte length of the RFC 822 message
+                        fp.readline()
+                        header_bytes = read_header_block(fp)
+                except OSError as e:
+                    print(f"Warning: Could not read {file_path}: {e}")
+                    continue
+                yield parse_message_headers(header_bytes, filename.split('.', 1)[0])
+
+
+def open_mail_source(maildir: Optional[str] = None, mbox: Optional[str] = None,
+                     emlx_dir: Optional[str] = None):
+    """Return the mail source selected on the command line, or None for Apple Mail"""
+    if maildir:
+        return MaildirSource(maildir)
+    if mbox:
+        return MboxSource(mbox)
+    if emlx_dir:
+        return EmlxSource(emlx_dir)
+    return None
@@ -0,0 +1,123 @@
+"""
+Run metrics and profiling for the Email Clustering System
+Times each processing stage and counts what it handled, appending one JSON
+line per run to a metrics file so cost can be tracked over time
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, Iterator
+
+
+# Hotspots and allocation sites printed by --profile
+PROFILE_TOP = 20
+
+
+class RunMetrics:
+    """Exclusive wall time per stage plus named counters for one run
+
+    Stages may nest; time spent in an inner stage is not counted for the
+    outer one, so the stage times add up to the run's total.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timestamp = datetime.now().isoformat(timespec='seconds')
+        self.stages = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.extra = {}
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """Attribute the time spent in the block to a stage"""
+        now = time.perf_counter()
+        if self._stack:
+            self.stages[self._stack[-1][0]] += now - self._stack[-1][1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, start = self._stack.pop()
+            self.stages[name] += now - start
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def timed(self, name: str, items: Iterable) -> Iterator:
+        """Yield from items, attributing the time spent producing each one to a stage"""
+        iterator = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name: str, amount: int = 1):
+        """Add to a counter"""
+        self.counters[name] += amount
+
+    def counted_bytes(self, name: str, lines: Iterable[str]) -> Iterator[str]:
+        """Yield lines unchanged, adding their UTF-8 size to a counter"""
+        for line in lines:
+            self.counters[name] += len(line.encode('utf-8'))
+            yield line
+
+    def record(self) -> dict:
+        """Return the run as a JSON-serializable dict"""
+        return {
+            'timestamp': self.timestamp,
+            'total_s': round(time.perf_counter() - self.started, 6),
+            'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            'counters': dict(self.counters),
+            **self.extra
+        }
+
+    def write(self, path):
+        """Append the run as one JSON line"""
+        try:
+            with open(path, 'a', encoding='utf-8') as fp:
+                fp.write(json.dumps(self.record()) + '\n')
+        except OSError as e:
+            print(f"Warning: Could not write metrics: {e}")
+
+
+@contextmanager
+def profiled(top: int = PROFILE_TOP):
+    """Run the block under cProfile and tracemalloc, then print hotspots and peak memory
+
+    Yields a dict that receives 'peak_memory_bytes' when the block ends.
+    """
+    result = {}
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peak_memory_bytes'] = peak
+
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(top)
+        print("\n" + "=" * 60)
+        print("PROFILE")
+        print("=" * 60)
+        print(output.getvalue().strip())
+
+        print(f"\nPeak traced memory: {peak / 1024 / 1024:.1f} MiB")
+        print("Largest live allocations at exit:")
+        for stat in snapshot.statistics('lineno')[:top]:
+            print(f"  {stat}")
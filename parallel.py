@@ -0,0 +1,66 @@
+"""
+Parallel bulk classification for the Email Clustering System
+Splits an email stream into chunks and classifies them in a process pool,
+yielding results in input order
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from keyword_matcher import email_text
+
+
+# Emails sent to a worker per task
+CHUNK_SIZE = 1000
+
+# Chunks in flight per worker; bounds memory when the input is a stream
+CHUNKS_PER_WORKER = 2
+
+_matcher = None
+_event_index = None
+
+
+def _init_worker(matcher, event_index):
+    """Keep the compiled rules and event index for the life of the worker"""
+    global _matcher, _event_index
+    _matcher = matcher
+    _event_index = event_index
+
+
+def classify(matcher, event_index, subject: str, sender: str, snippet: str = '') -> Tuple[str, float, bool, str]:
+    """Return (category, confidence, calendar match, matched event) for one email"""
+    category, confidence = matcher.categorize(email_text(subject, sender, snippet))
+    has_calendar_match, matched_event = event_index.match(subject)
+    return category, confidence, has_calendar_match, matched_event
+
+
+def _classify_chunk(chunk: List[Tuple[str, str, str]]) -> List[Tuple[str, float, bool, str]]:
+    """Classify a chunk of (subject, sender, snippet) triples inside a worker"""
+    return [classify(_matcher, _event_index, subject, sender, snippet) for subject, sender, snippet in chunk]
+
+
+def classify_parallel(emails: Iterable[Dict], matcher, event_index, workers: int,
+                      chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[Dict, Tuple[str, float, bool, str]]]:
+    """Yield (email, classification) for every email, in input order"""
+    emails = iter(emails)
+    max_pending = workers * CHUNKS_PER_WORKER
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(matcher, event_index)) as executor:
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(islice(emails, chunk_size))
+                if not chunk:
+                    break
+                triples = [(email.get('subject', ''), email.get('sender', ''), email.get('snippet') or '')
+                           for email in chunk]
+                pending.append((chunk, executor.submit(_classify_chunk, triples)))
+
+            if not pending:
+                break
+
+            chunk, future = pending.popleft()
+            yield from zip(chunk, future.result())
@@ -0,0 +1,147 @@
+"""
+Persistent record of processed message ids
+Lets repeated runs skip messages that were already categorized and logged
+"""
+
+import bisect
+import hashlib
+import os
+from array import array
+from pathlib import Path
+from typing import Iterable, List
+
+from journal import FileLock
+
+
+# Merge the tail into the sorted base once it holds this many ids...
+TAIL_MERGE_THRESHOLD = 4096
+
+# ...or this share of the base size, if larger, so a growing store is rewritten
+# a bounded number of times per doubling rather than every few thousand ids
+TAIL_MERGE_RATIO = 0.125
+
+
+def message_key(message_id: str) -> int:
+    """Hash a message id to a 64-bit integer"""
+    return int.from_bytes(hashlib.blake2b(message_id.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little')
+
+
+def merge_sorted(base: array, keys: List[int]) -> array:
+    """Return the sorted array base with the sorted keys it lacks inserted
+
+    Copies base in slices between insertion points, so the cost is linear
+    in the base size plus a binary search per key.
+    """
+    merged = array('Q')
+    start = 0
+    for key in keys:
+        idx = bisect.bisect_left(base, key, start)
+        if idx < len(base) and base[idx] == key:
+            continue
+        merged.extend(base[start:idx])
+        merged.append(key)
+        start = idx
+    merged.extend(base[start:])
+    return merged
+
+
+class ProcessedMessageStore:
+    """On-disk set of message ids stored as 64-bit hashes
+
+    The base file is a sorted array of 8-byte hashes searched with bisect;
+    new ids go to an append-only tail file that is merged into the base when
+    it grows past TAIL_MERGE_THRESHOLD or TAIL_MERGE_RATIO of the base. A
+    million ids take about 8 MB.
+    Appends and merges hold a file lock, so overlapping runs lose no ids.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tail_path = self.path.with_name(self.path.name + '.tail')
+        self.lock = FileLock(self.path.with_name(self.path.name + '.lock'))
+        self.base = array('Q')
+        self.tail = set()
+        self.pending = []
+        self.load()
+
+    def load(self):
+        """Read the base and tail files"""
+        for target, file_path in ((self.base, self.path), (None, self.tail_path)):
+            if not file_path.exists():
+                continue
+            values = array('Q')
+            with open(file_path, 'rb') as fp:
+                data = fp.read()
+            # Ignore a partial trailing record left by an interrupted write
+            values.frombytes(data[:len(data) - len(data) % values.itemsize])
+            if target is None:
+                self.tail.update(values)
+            else:
+                self.base = values
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.tail)
+
+    def __contains__(self, message_id: str) -> bool:
+        if not message_id:
+            return False
+        key = message_key(message_id)
+        if key in self.tail:
+            return True
+        idx = bisect.bisect_left(self.base, key)
+        return idx < len(self.base) and self.base[idx] == key
+
+    def add(self, message_id: str):
+        """Mark a message id as processed (written on save)"""
+        if not message_id:
+            return
+        key = message_key(message_id)
+        if key not in self.tail:
+            self.tail.add(key)
+            self.pending.append(key)
+
+    def update(self, message_ids: Iterable[str]):
+        """Mark several message ids as processed"""
+        for message_id in message_ids:
+            self.add(message_id)
+
+    def save(self):
+        """Append new ids to the tail file, merging into the base when it is large"""
+        if not self.pending and len(self.tail) < self._merge_threshold():
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            if self.pending:
+                with open(self.tail_path, 'ab') as fp:
+                    array('Q', self.pending).tofile(fp)
+                self.pending = []
+
+            if len(self.tail) >= self._merge_threshold():
+                self._compact_locked()
+
+    def _merge_threshold(self) -> int:
+        """Return the tail size at which save() merges the tail into the base"""
+        return max(TAIL_MERGE_THRESHOLD, int(len(self.base) * TAIL_MERGE_RATIO))
+
+    def compact(self):
+        """Merge the tail into the sorted base file with an atomic rename"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        """Merge with the lock held, re-reading both files for ids other runs have saved"""
+        self.load()
+        merged = merge_sorted(self.base, sorted(self.tail))
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as fp:
+            merged.tofile(fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_path, self.path)
+
+        self.base = merged
+        self.tail = set()
+        if self.tail_path.exists():
+            self.tail_path.unlink()
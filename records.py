@@ -0,0 +1,92 @@
+"""
+Typed email records for the Email Clustering System
+A slotted class in place of a dict per message, which also keeps the
+lowercased match text and the calendar words from when they are computed
+until the message is logged, so each message is lowercased and tokenized
+at most once per run
+"""
+
+from typing import Dict, Optional, Tuple
+
+from event_index import significant_words
+from keyword_matcher import email_text
+
+
+class EmailRecord:
+    """One message: subject, sender, date received and message id
+
+    Supports get() and item access by field name, so code written against
+    the email dicts of earlier versions keeps working.
+    """
+
+    __slots__ = ('subject', 'sender', 'date_received', 'message_id', '_snippet', '_text', '_words')
+
+    FIELDS = ('subject', 'sender', 'date_received', 'message_id')
+
+    def __init__(self, subject: str = '', sender: str = '', date_received: str = '', message_id: str = ''):
+        self.subject = subject
+        self.sender = sender
+        self.date_received = date_received
+        self.message_id = message_id
+        self._snippet = ''
+        self._text = None
+        self._words = None
+
+    @classmethod
+    def from_dict(cls, email: Dict) -> 'EmailRecord':
+        """Build a record from an email dict"""
+        return cls(*(email.get(field, '') for field in cls.FIELDS))
+
+    @property
+    def snippet(self) -> str:
+        """Normalized body snippet from the snippet cache, or '' if none was fetched"""
+        return self._snippet
+
+    @snippet.setter
+    def snippet(self, snippet: str):
+        self._snippet = snippet
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        """Lowercased subject, sender and body snippet, as keyword matching sees them"""
+        if self._text is None:
+            self._text = email_text(self.subject, self.sender, self._snippet)
+        return self._text
+
+    @property
+    def words(self) -> Tuple[str, ...]:
+        """Distinct subject words long enough to count towards a calendar match"""
+        if self._words is None:
+            self._words = tuple(significant_words(self.subject))
+        return self._words
+
+    def release(self):
+        """Drop the cached match text and words once the record is classified
+
+        Keeps a list of classified records as small as freshly parsed ones;
+        they are recomputed if asked for again.
+        """
+        self._text = None
+        self._words = None
+
+    def get(self, key: str, default: Optional[str] = None):
+        """Return a field or the snippet by name, or default if there is no such field"""
+        return getattr(self, key) if key in self.FIELDS or key == 'snippet' else default
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS and key != 'snippet':
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, str]:
+        """Return the fields as an email dict"""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, EmailRecord):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f"EmailRecord(subject={self.subject!r}, sender={self.sender!r}, message_id={self.message_id!r})"
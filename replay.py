@@ -0,0 +1,74 @@
+"""
+Log replay for the Email Clustering System
+Runs the logged email history back through the current keyword rules in
+bulk and reports which categories the emails would land in now, without
+touching Mail or Calendar
+"""
+
+from typing import TYPE_CHECKING, Callable, Iterable, Tuple
+
+from storage import require_pandas
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Changed rows shown when no sample size is given
+DEFAULT_SAMPLE_SIZE = 20
+
+SAMPLE_COLUMNS = ['Timestamp', 'Subject', 'Sender', 'Category', 'NewCategory', 'NewConfidence']
+
+
+def replay_logs(batches: Iterable['pd.DataFrame'], categorize_many: Callable,
+                sample_size: int = DEFAULT_SAMPLE_SIZE, seed: int = 0) -> Tuple['pd.DataFrame', 'pd.DataFrame']:
+    """Re-categorize batches of EmailLogs rows and compare with their logged categories
+
+    categorize_many is EmailClusterer.categorize_many. Returns the
+    transition matrix, counting emails by logged category (rows) and
+    current category (columns), and a uniform random sample of up to
+    sample_size changed rows with their old and new categories. Only the
+    running counts and the sample are kept between batches.
+    """
+    pd = require_pandas()
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    transitions = None
+    sample = None
+
+    for logs in batches:
+        if logs.empty:
+            continue
+        result = categorize_many(pd.DataFrame({'subject': logs['Subject'], 'sender': logs['Sender']}))
+        old = logs['Category'].fillna('Uncategorized').astype(str).to_numpy()
+        new = result['category'].to_numpy()
+
+        counts = pd.DataFrame({'Category': old, 'NewCategory': new}).value_counts()
+        transitions = counts if transitions is None else transitions.add(counts, fill_value=0)
+
+        # Reservoir sample: every changed row gets a random key and the smallest keys are kept
+        changed = np.flatnonzero(old != new)
+        if sample_size and len(changed):
+            keys = rng.random(len(changed))
+            kept = np.argsort(keys)[:sample_size]
+            rows = changed[kept]
+            candidates = logs.iloc[rows][['Timestamp', 'Subject', 'Sender']].assign(
+                Category=old[rows], NewCategory=new[rows],
+                NewConfidence=result['confidence'].to_numpy()[rows].round(2), _key=keys[kept]
+            )
+            if sample is not None:
+                candidates = pd.concat([sample, candidates], ignore_index=True).nsmallest(sample_size, '_key')
+            sample = candidates
+
+    if transitions is None:
+        matrix = pd.DataFrame()
+    else:
+        matrix = transitions.astype(int).unstack(fill_value=0)
+        matrix.index.name = 'Logged'
+        matrix.columns.name = 'Now'
+
+    if sample is None:
+        sample = pd.DataFrame(columns=SAMPLE_COLUMNS)
+    else:
+        sample = sample.drop(columns='_key').sort_values('Timestamp', kind='stable').reset_index(drop=True)
+    return matrix, sample
@@ -0,0 +1,84 @@
+"""
+Statistics rollups for the Email Clustering System
+Counts emails per day, category and sender domain as each run's logs are
+written, so reports never have to rescan the full email log
+"""
+
+import re
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from storage import ROLLUP_COLUMNS, STATISTICS_COLUMNS, require_pandas
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Domain part of an address, with or without a display name around it
+DOMAIN_PATTERN = r'@([^\s<>@]+)'
+_DOMAIN_RE = re.compile(DOMAIN_PATTERN)
+
+
+def sender_domain(sender: str) -> str:
+    """Return the lowercased domain of a sender, or '' if it has none"""
+    match = _DOMAIN_RE.search(sender or '')
+    return match.group(1).lower() if match else ''
+
+
+class RollupAccumulator:
+    """In-memory (day, category, sender domain) counts for the log entries of one run"""
+
+    def __init__(self):
+        self.counts: Dict[Tuple[str, str, str], List[int]] = defaultdict(lambda: [0, 0])
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, entries: List[Dict]):
+        """Fold log entries (LOG_COLUMNS dicts) into the counts"""
+        for entry in entries:
+            key = (str(entry.get('Timestamp', ''))[:10], entry.get('Category', 'Uncategorized'),
+                   sender_domain(entry.get('Sender', '')))
+            counts = self.counts[key]
+            counts[0] += 1
+            counts[1] += bool(entry.get('CalendarMatch'))
+
+    def rows(self) -> List[Dict]:
+        """Return the counts as ROLLUP_COLUMNS rows"""
+        return [dict(zip(ROLLUP_COLUMNS, (*key, emails, matches)))
+                for key, (emails, matches) in sorted(self.counts.items())]
+
+    def clear(self):
+        """Forget counts that have been written"""
+        self.counts.clear()
+
+
+def rebuild_rollups(logs: 'pd.DataFrame') -> Tuple['pd.DataFrame', 'pd.DataFrame']:
+    """Recompute the rollup and daily statistics tables from the full email log
+
+    Returns (rollups, statistics) DataFrames with ROLLUP_COLUMNS and
+    STATISTICS_COLUMNS, computed with one grouped aggregation each.
+    """
+    pd = require_pandas()
+
+    frame = pd.DataFrame({
+        'Date': logs['Timestamp'].astype(str).str[:10],
+        'Category': logs['Category'].fillna('Uncategorized').astype(str),
+        'SenderDomain': logs['Sender'].fillna('').astype(str)
+                                      .str.extract(DOMAIN_PATTERN, expand=False).str.lower().fillna(''),
+        'CalendarMatch': logs['CalendarMatch'].fillna(False).astype(bool).astype(int),
+    })
+
+    rollups = (frame.groupby(['Date', 'Category', 'SenderDomain'], sort=True)['CalendarMatch']
+               .agg(['size', 'sum'])
+               .reset_index())
+    rollups.columns = ROLLUP_COLUMNS
+
+    frame['Categorized'] = (frame['Category'] != 'Uncategorized').astype(int)
+    statistics = (frame.groupby('Date', sort=True)
+                  .agg(TotalEmails=('Category', 'size'), Categorized=('Categorized', 'sum'),
+                       WithCalendarMatch=('CalendarMatch', 'sum'))
+                  .reset_index())
+    statistics.columns = STATISTICS_COLUMNS
+
+    return rollups, statistics
@@ -0,0 +1,162 @@
+"""
+Compiled rules cache for the Email Clustering System
+Stores the loaded rules and compiled keyword matcher next to the database
+so the workbook is only parsed again after it or its journaled keyword
+edits change, and the matcher only compiled again after the rules do
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from storage import sidecar_path
+
+
+# Bump when the cached objects change shape
+CACHE_VERSION = 6
+
+
+def rules_digest(rule_rows: List[Tuple[str, str]]) -> str:
+    """Return a content hash of the active (category, keyword) rows"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(rule_rows).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RulesCache:
+    """Pickled (rule_rows, categories, keyword_mappings, matcher) keyed on the database file
+
+    The pickle holds the rules and their digest. A small stamp file next to
+    it ties the size and mtime of the database, and of its journal of
+    keyword edits, to that digest, and an entry is valid while both match. Once the file stamp differs, the caller can
+    re-read just the rule rows: if they parse to the same rules, the
+    compiled matcher is reused and only the stamp rewritten. Writes this
+    program makes itself (logs, statistics) likewise rewrite only the
+    stamp, and rule edits the pickle as well; nothing ever hashes the whole
+    database, whose size grows with the log.
+    """
+
+    def __init__(self, database_path: Path):
+        self.database_path = Path(database_path)
+        self.path = sidecar_path(self.database_path, '.rules.cache')
+        self.stamp_path = sidecar_path(self.database_path, '.rules.stamp')
+        self.journal_path = sidecar_path(self.database_path, '.rules.journal')
+        self.stamp = None
+        self.digest = None
+
+    def _stat(self) -> Tuple[int, int, int, int]:
+        """Return the size and mtime of the database and of its keyword-edit journal, zeros if it has none"""
+        stat = os.stat(self.database_path)
+        try:
+            journal = os.stat(self.journal_path)
+            return stat.st_size, stat.st_mtime_ns, journal.st_size, journal.st_mtime_ns
+        except FileNotFoundError:
+            return stat.st_size, stat.st_mtime_ns, 0, 0
+
+    def is_current(self) -> bool:
+        """Check whether the database is unchanged since the rules were loaded or re-stamped"""
+        try:
+            return self.stamp is not None and self.stamp == self._stat()
+        except OSError:
+            return False
+
+    def load(self, rule_rows: Optional[List[Tuple[str, str]]] = None) -> Optional[tuple]:
+        """Return the cached (rule_rows, categories, keyword_mappings, matcher), or None if stale
+
+        Without arguments only the file stamp is checked. Pass the active rows
+        just read from the database to also accept an entry whose stamp is out
+        of date but whose rules are the same, e.g. after a log write by
+        another run or a touch.
+        """
+        try:
+            with open(self.stamp_path, encoding='utf-8') as fp:
+                stamp = json.load(fp)
+            if stamp.get('version') != CACHE_VERSION:
+                return None
+
+            digest = stamp['digest']
+            stamped = tuple(stamp['stat']) == self._stat()
+            if not stamped:
+                if rule_rows is None:
+                    return None
+                digest = rules_digest(rule_rows)
+
+            with open(self.path, 'rb') as fp:
+                entry = pickle.load(fp)
+            if entry.get('version') != CACHE_VERSION or entry['digest'] != digest:
+                return None
+
+            self.digest = digest
+            if not stamped:
+                self._write_stamp()
+            self.stamp = self._stat()
+            return entry['rules']
+        except Exception:
+            return None
+
+    def save(self, rule_rows: list, categories: dict, keyword_mappings: dict, matcher):
+        """Cache freshly loaded or edited rules for the current database file"""
+        try:
+            digest = rules_digest(rule_rows)
+            entry = {'version': CACHE_VERSION, 'digest': digest,
+                     'rules': (rule_rows, categories, keyword_mappings, matcher)}
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'wb') as fp:
+                pickle.dump(entry, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+
+            # Stamped after the rules are in place; a crash in between leaves a digest mismatch, i.e. a miss
+            self.digest = digest
+            self._write_stamp()
+            self.stamp = self._stat()
+        except Exception as e:
+            print(f"Warning: Could not write rules cache: {e}")
+
+    def restamp(self):
+        """Record the database's current size and mtimes for the cached rules, if they changed"""
+        try:
+            if self.digest is None or self.stamp == self._stat():
+                return
+            self._write_stamp()
+            self.stamp = self._stat()
+        except Exception as e:
+            print(f"Warning: Could not write rules cache: {e}")
+
+    def _write_stamp(self):
+        """Write the stamp tying the database's current sizes and mtimes to the cached rules' digest"""
+        stamp = {'version': CACHE_VERSION, 'stat': list(self._stat()), 'digest': self.digest}
+        tmp_path = self.stamp_path.with_name(self.stamp_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as fp:
+            json.dump(stamp, fp)
+        os.replace(tmp_path, self.stamp_path)
+
+    def invalidate(self):
+        """Drop the cache entry"""
+        self.stamp = None
+        self.digest = None
+        for path in (self.stamp_path, self.path):
+            if path.exists():
+                path.unlink()
+
+    @contextmanager
+    def own_write(self, rules: Optional[tuple] = None):
+        """Keep the cache valid across a write this program makes to the database
+
+        Pass the loaded rules, as they stand after the write, when the write
+        edits them; they are updated in place inside the block and cached
+        again. Other writes only re-stamp the cache. If the database changed
+        behind our back since the rules were loaded, the entry is left stale
+        so the next run re-parses it.
+        """
+        unchanged = self.is_current()
+        yield
+        if not unchanged:
+            return
+        if rules is not None:
+            self.save(*rules)
+        else:
+            self.restamp()
@@ -0,0 +1,190 @@
+"""
+Sender classification cache for the Email Clustering System
+Remembers which category each sender address has consistently and
+confidently been given, so their messages skip keyword matching. Learned
+from the email log and from each run, bounded with LRU eviction, re-checked
+against the keywords now and then, and dropped when the keyword rules
+change.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Bump when the cached entries change shape
+CACHE_VERSION = 2
+
+# Senders remembered; the least recently used are evicted first
+DEFAULT_CAPACITY = 10000
+
+# A sender is only trusted after this many emails...
+MIN_HISTORY = 5
+
+# ...at least this share of them went to the same category...
+MIN_CONSISTENCY = 0.95
+
+# ...with at least this mean confidence, i.e. more than one keyword hit on average
+MIN_CONFIDENCE = 0.5
+
+# Every this many hits a trusted sender is classified by keyword again, so a
+# sender whose mail changes loses its trust
+RECHECK_INTERVAL = 10
+
+# Never answered from the cache: no keyword matched, so there is nothing to trust
+UNCATEGORIZED = 'Uncategorized'
+
+# Address inside angle brackets, as in 'Name <user@example.com>'
+ADDRESS_PATTERN = r'<([^<>]+)>'
+_ADDRESS_RE = re.compile(ADDRESS_PATTERN)
+
+
+def sender_address(sender: str) -> str:
+    """Return the lowercased address of a sender, without any display name"""
+    sender = str(sender or '')
+    match = _ADDRESS_RE.search(sender)
+    return (match.group(1) if match else sender).strip().lower()
+
+
+def rules_fingerprint(categories: Dict[str, list]) -> str:
+    """Return a hash of the active keyword rules"""
+    text = json.dumps(sorted((category, sorted(keywords)) for category, keywords in categories.items()))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SenderCache:
+    """LRU map from sender address to per-category email counts
+
+    Each entry holds {category: [emails, confidence_sum]}. A lookup hits
+    when the sender has at least MIN_HISTORY emails, one category other than
+    Uncategorized holds MIN_CONSISTENCY of them, and their mean confidence
+    is at least MIN_CONFIDENCE. Every RECHECK_INTERVAL-th hit of a sender is
+    reported as a miss instead, so the caller classifies it and learns.
+    Domains are not cached: a shared domain says little about one message.
+    """
+
+    def __init__(self, path, capacity: int = DEFAULT_CAPACITY):
+        self.path = Path(path)
+        self.capacity = capacity
+        self.entries: 'OrderedDict[str, Dict[str, list]]' = OrderedDict()
+        # Hits per sender since it was last classified by keyword
+        self.unchecked: Dict[str, int] = {}
+        self.fingerprint = None
+        self.hits = 0
+        self.lookups = 0
+
+    def load(self, fingerprint: str, read_logs: Callable[[], 'pd.DataFrame']):
+        """Load the cache for the given rules, seeding it from the log when needed
+
+        If the rules changed since the cache was written, everything learned
+        so far is dropped, since logged categories reflect the old rules, and
+        the cache starts over from this run's results.
+        """
+        try:
+            with open(self.path, 'rb') as fp:
+                state = pickle.load(fp)
+            if state.get('version') != CACHE_VERSION:
+                raise ValueError('old cache version')
+        except Exception:
+            state = None
+
+        self.entries = OrderedDict()
+        self.unchecked = {}
+        if state is not None and state['fingerprint'] == fingerprint:
+            self.entries = state['entries']
+            self.unchecked = state['unchecked']
+        elif state is None:
+            try:
+                self.seed(read_logs())
+            except Exception as e:
+                print(f"Warning: Could not seed sender cache from logs: {e}")
+
+        self.fingerprint = fingerprint
+
+    def seed(self, logs: 'pd.DataFrame'):
+        """Fill the cache from logged results, keeping the highest-volume senders"""
+        if logs.empty:
+            return
+
+        senders = logs['Sender'].fillna('').astype(str)
+        addresses = senders.str.extract(ADDRESS_PATTERN, expand=False).fillna(senders).str.strip().str.lower()
+
+        frame = logs[['Category', 'Confidence']].copy()
+        frame['Confidence'] = frame['Confidence'].fillna(0).astype(float)
+        grouped = (frame.assign(Key=addresses.values)[addresses.values != '']
+                   .groupby(['Key', 'Category'])['Confidence'].agg(['size', 'sum']))
+        entries = {}
+        for (key, category), emails, confidence_sum in zip(grouped.index, grouped['size'], grouped['sum']):
+            entries.setdefault(key, {})[category] = [int(emails), float(confidence_sum)]
+
+        # Most recently used last, so low-volume senders are evicted first
+        ranked = sorted(entries.items(), key=lambda item: sum(count for count, _ in item[1].values()))
+        self.entries = OrderedDict(ranked[-self.capacity:])
+
+    def lookup(self, sender: str) -> Optional[Tuple[str, float]]:
+        """Return (category, confidence) if the sender's history is consistent and confident, else None"""
+        self.lookups += 1
+        key = sender_address(sender)
+        counts = self.entries.get(key)
+        if counts is None:
+            return None
+        self.entries.move_to_end(key)
+
+        total = sum(emails for emails, _ in counts.values())
+        category, (emails, confidence_sum) = max(counts.items(), key=lambda item: item[1][0])
+        if (total < MIN_HISTORY or category == UNCATEGORIZED or emails < total * MIN_CONSISTENCY
+                or confidence_sum < emails * MIN_CONFIDENCE):
+            return None
+
+        unchecked = self.unchecked.get(key, 0) + 1
+        if unchecked >= RECHECK_INTERVAL:
+            self.unchecked.pop(key, None)
+            return None
+        self.unchecked[key] = unchecked
+        self.hits += 1
+        return category, confidence_sum / emails
+
+    def learn(self, sender: str, category: str, confidence: float):
+        """Record the keyword classification of one email"""
+        key = sender_address(sender)
+        if not key:
+            return
+        counts = self.entries.get(key)
+        if counts is None:
+            counts = self.entries[key] = {}
+            if len(self.entries) > self.capacity:
+                evicted, _ = self.entries.popitem(last=False)
+                self.unchecked.pop(evicted, None)
+        else:
+            self.entries.move_to_end(key)
+        self.unchecked.pop(key, None)
+        stats = counts.setdefault(category, [0, 0.0])
+        stats[0] += 1
+        stats[1] += confidence
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups answered from the cache"""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def save(self):
+        """Write the cache next to the database"""
+        if self.fingerprint is None:
+            return
+        state = {'version': CACHE_VERSION, 'fingerprint': self.fingerprint, 'entries': self.entries,
+                 'unchecked': self.unchecked}
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            with open(tmp_path, 'wb') as fp:
+                pickle.dump(state, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not write sender cache: {e}")
@@ -0,0 +1,126 @@
+"""
+Message body snippet cache for the Email Clustering System
+Keeps the first bytes of each message body, already normalized for keyword
+matching, in a SQLite file next to the database, so a body is fetched from
+Mail and normalized at most once however many runs see the message
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+
+# Bytes of each body kept when --snippet-bytes is given without a value
+DEFAULT_SNIPPET_BYTES = 2048
+
+# Snippets not seen by a run for this many days are dropped
+MAX_AGE_DAYS = 90
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_snippet(body: str, max_bytes: int) -> str:
+    """Return body lowercased, with runs of whitespace collapsed, cut to max_bytes of UTF-8"""
+    text = _WHITESPACE_RE.sub(' ', str(body or '')).strip().lower()
+    encoded = text.encode('utf-8')
+    if len(encoded) <= max_bytes:
+        return text
+    # Never split a multi-byte character
+    return encoded[:max_bytes].decode('utf-8', 'ignore').rstrip()
+
+
+def snippet_key(email) -> str:
+    """Return the cache key of an email: a hash of its message id and headers
+
+    Mail's message ids are only unique within one mailbox, so the subject,
+    sender and date are part of the key as well.
+    """
+    text = '\0'.join(str(email.get(field) or '') for field in ('message_id', 'subject', 'sender', 'date_received'))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SnippetCache:
+    """SQLite table of key -> normalized body snippet
+
+    Each row remembers the byte cap it was fetched with and whether the
+    whole body fit, so raising the cap refetches only bodies that were cut.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._connection = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            new = not self.path.exists()
+            # Callers serialize access; the daemon uses the cache from several threads
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            if new:
+                # Snippets are message content; keep them private to the user
+                os.chmod(self.path, 0o600)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS snippets ('
+                'key TEXT PRIMARY KEY, snippet TEXT NOT NULL, max_bytes INTEGER NOT NULL, '
+                'complete INTEGER NOT NULL, seen_at REAL NOT NULL)'
+            )
+        return self._connection
+
+    def get_many(self, keys: Iterable[str], max_bytes: int) -> Dict[str, str]:
+        """Return the cached snippets, cut to max_bytes, of the keys that have a usable one"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        # Stay under SQLite's limit on query parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT key, snippet, max_bytes, complete FROM snippets "
+                f"WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            for key, snippet, cached_bytes, complete in rows:
+                if complete or cached_bytes >= max_bytes:
+                    found[key] = normalize_snippet(snippet, max_bytes) if cached_bytes > max_bytes else snippet
+
+        with self.connection:
+            self.connection.executemany('UPDATE snippets SET seen_at = ? WHERE key = ?',
+                                        [(time.time(), key) for key in found])
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, bodies: Dict[str, Tuple[str, int]], max_bytes: int) -> Dict[str, str]:
+        """Normalize and store freshly fetched bodies; return their snippets by key
+
+        bodies maps each key to (fetched text, length of the whole body), the
+        text being at most max_bytes characters of the body.
+        """
+        now = time.time()
+        snippets = {}
+        rows = []
+        for key, (body, length) in bodies.items():
+            snippet = normalize_snippet(body, max_bytes)
+            complete = length <= max_bytes and len(snippet.encode('utf-8')) < max_bytes
+            snippets[key] = snippet
+            rows.append((key, snippet, max_bytes, int(complete), now))
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO snippets VALUES (?, ?, ?, ?, ?)', rows)
+        return snippets
+
+    def prune(self, max_age_days: int = MAX_AGE_DAYS) -> int:
+        """Drop snippets no run has used for max_age_days; return how many"""
+        with self.connection:
+            cursor = self.connection.execute('DELETE FROM snippets WHERE seen_at < ?',
+                                             (time.time() - max_age_days * 86400,))
+        return cursor.rowcount
+
+    def close(self):
+        """Close the SQLite connection"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
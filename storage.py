@@ -0,0 +1,757 @@
+"""
+Storage backends for the Email Clustering System
+The Excel workbook is the default store; a SQLite file gives indexed tables
+whose load and write cost does not grow with history
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
+
+from journal import FileLock, WriteJournal
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+LOG_COLUMNS = [
+    'Timestamp', 'Subject', 'Sender', 'Category',
+    'CalendarMatch', 'MatchedEvent', 'Confidence', 'MessageId'
+]
+CATEGORY_COLUMNS = ['Category', 'Keyword', 'Active', 'Created']
+STATISTICS_COLUMNS = ['Date', 'TotalEmails', 'Categorized', 'WithCalendarMatch']
+ROLLUP_COLUMNS = ['Date', 'Category', 'SenderDomain', 'Emails', 'WithCalendarMatch']
+
+# Hidden sheet holding the generation of the last journal of each kind applied to a workbook
+JOURNAL_SHEET = '_Journal'
+JOURNAL_COLUMNS = ['Generation', 'RulesGeneration']
+
+# Journal ops that edit the Categories sheet; they are applied in order
+RULE_WRITES = ('categories', 'disable_keyword', 'move_keyword')
+
+# Log rows per batch when the log is streamed rather than read whole
+LOG_READ_BATCH_SIZE = 100000
+
+SQLITE_SUFFIXES = {'.sqlite', '.sqlite3', '.db'}
+
+
+def require_pandas():
+    """Import pandas on first use so runs that never touch a workbook start fast"""
+    try:
+        import pandas as pd
+        import openpyxl  # noqa: F401
+    except ImportError:
+        print("ERROR: Required packages not installed.")
+        print("Please run: pip3 install pandas openpyxl")
+        sys.exit(1)
+    return pd
+
+
+# State files kept next to a database, named <database file name><suffix>
+SIDECAR_SUFFIXES = ['.processed', '.rules.cache', '.calendar.json', '.senders.cache', '.metrics.jsonl',
+                    '.snippets.sqlite', '.journal', '.lock', '.logs', '.parquet']
+
+# Files named after a sidecar that belong with it, e.g. <name>.processed.tail
+SIDECAR_COMPANIONS = ['', '.tail', '.lock', '.committing', '.tmp']
+
+
+def sidecar_path(database_path, suffix: str) -> Path:
+    """Return the file next to a database that holds some of its state, e.g. <name>.xlsx.processed
+
+    Sidecars are named after the full file name so a.xlsx and a.sqlite keep
+    separate state.
+    """
+    database_path = Path(database_path)
+    return database_path.with_name(database_path.name + suffix)
+
+
+def migrate_sidecars(database_path) -> int:
+    """Rename state files left under the older stem-only names (a.processed) to sidecar names; return how many
+
+    Only the known sidecars and their companions are renamed, never over an
+    existing file, and nothing is renamed if another database with the same
+    stem sits alongside and might own them.
+    """
+    database_path = Path(database_path)
+    if not database_path.exists():
+        return 0
+
+    owners = [database_path.with_suffix(other) for other in SQLITE_SUFFIXES | {'.xlsx'}
+              if other != database_path.suffix.lower()]
+    if any(owner.exists() for owner in owners):
+        return 0
+
+    moved = 0
+    for suffix in SIDECAR_SUFFIXES:
+        for companion in SIDECAR_COMPANIONS:
+            legacy = database_path.with_name(database_path.stem + suffix + companion)
+            path = sidecar_path(database_path, suffix + companion)
+            if not legacy.exists() or path.exists():
+                continue
+            try:
+                os.replace(legacy, path)
+                moved += 1
+            except OSError as e:
+                print(f"Warning: Could not rename {legacy.name}: {e}")
+    return moved
+
+
+def unreadable_path(database_path: Path) -> Path:
+    """Return the name an unreadable database is moved to, e.g. <stem>.unreadable-20260101-090000.xlsx"""
+    return database_path.with_name(
+        f"{database_path.stem}.unreadable-{datetime.now():%Y%m%d-%H%M%S}{database_path.suffix}")
+
+
+def open_storage(database_path, log_retention_months: Optional[int] = None):
+    """Pick a storage backend from the database file extension
+
+    If a <database>.logs folder exists, email logs are kept there as
+    monthly partitions instead of in the database.
+    """
+    from log_partitions import PartitionedLogStore
+
+    database_path = Path(database_path)
+    if database_path.suffix.lower() in SQLITE_SUFFIXES:
+        storage = SQLiteStorage(database_path)
+    else:
+        storage = ExcelStorage(database_path)
+
+    log_store = PartitionedLogStore(sidecar_path(database_path, '.logs'),
+                                    retention_months=log_retention_months)
+    if log_store.exists():
+        storage.log_store = log_store
+    return storage
+
+
+def logs_in_range(logs: 'pd.DataFrame', start: Optional[str], end: Optional[str]) -> 'pd.DataFrame':
+    """Return the log rows dated from start to end (YYYY-MM-DD, inclusive; None is open)"""
+    if start is None and end is None:
+        return logs
+    day = logs['Timestamp'].astype(str).str[:10]
+    mask = (day >= start if start is not None else True) & (day <= end if end is not None else True)
+    return logs[mask].reset_index(drop=True)
+
+
+def rule_edit_matches(category, keyword, active, edit: Dict) -> bool:
+    """Check whether a disable_keyword or move_keyword edit applies to a Categories row
+
+    The keyword is matched as load_rules lowercases it, and a move skips
+    rows already in the category it moves to.
+    """
+    return (bool(active) and str(keyword).lower() == edit['keyword']
+            and edit.get('category') in (None, category) and category != edit.get('to_category'))
+
+
+def apply_rule_write(rules: List[Tuple[str, str, object]], write: Dict) -> List[Tuple[str, str, object]]:
+    """Return (category, keyword, active) rows with one journaled rule write applied"""
+    if write['op'] == 'categories':
+        return rules + [(row.get('Category'), row.get('Keyword'), row.get('Active')) for row in write['rows']]
+
+    rules = list(rules)
+    for edit in write['rows']:
+        for index, (category, keyword, active) in enumerate(rules):
+            if rule_edit_matches(category, keyword, active, edit):
+                if write['op'] == 'disable_keyword':
+                    rules[index] = (category, keyword, False)
+                else:
+                    rules[index] = (edit['to_category'], keyword, active)
+    return rules
+
+
+class ExcelStorage:
+    """Keeps categories, logs and statistics as sheets of one xlsx workbook
+
+    Log rows, statistics and rollups are appended to a write-ahead journal
+    next to the workbook and applied by commit(), so a run never rewrites
+    the workbook per write and overlapping runs never race on it. Keyword
+    edits go to a journal of their own, which load_rules reads on top of
+    the sheet, so an edit changes neither the workbook nor the log journal
+    that other runs watch. Every rewrite holds an advisory lock and
+    replaces the file with an atomic rename, so readers always see a
+    complete workbook.
+    """
+
+    def __init__(self, database_path: Path):
+        self.database_path = Path(database_path)
+        self.log_store = None
+        self.lock = FileLock(sidecar_path(self.database_path, '.lock'))
+        self.journal = WriteJournal(sidecar_path(self.database_path, '.journal'))
+        self.rules_journal = WriteJournal(sidecar_path(self.database_path, '.rules.journal'))
+
+    def exists(self) -> bool:
+        """Check whether the workbook exists"""
+        return self.database_path.exists()
+
+    def create(self, category_rows: List[Dict]):
+        """Create a new workbook with the given category rows"""
+        pd = require_pandas()
+        df_categories = pd.DataFrame(category_rows, columns=CATEGORY_COLUMNS)
+        df_logs = pd.DataFrame(columns=LOG_COLUMNS)
+        df_stats = pd.DataFrame(columns=STATISTICS_COLUMNS)
+        df_rollups = pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+        with self.lock:
+            # Another run may have created it while we waited
+            if self.exists():
+                return
+            tmp_path = self._tmp_path()
+            with pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
+                df_categories.to_excel(writer, sheet_name='Categories', index=False)
+                df_logs.to_excel(writer, sheet_name='EmailLogs', index=False)
+                df_stats.to_excel(writer, sheet_name='Statistics', index=False)
+                df_rollups.to_excel(writer, sheet_name='Rollups', index=False)
+            self._replace(tmp_path)
+
+    def set_aside(self) -> Optional[Path]:
+        """Rename an unreadable workbook out of the way so a new one can be created; return its new path"""
+        with self.lock:
+            if not self.exists():
+                return None
+            aside = unreadable_path(self.database_path)
+            os.replace(self.database_path, aside)
+        return aside
+
+    def _tmp_path(self) -> Path:
+        """Return a temporary file next to the workbook, for an atomic replace"""
+        return self.database_path.with_name(f'.{self.database_path.name}.{os.getpid()}.tmp')
+
+    def _replace(self, tmp_path: Path):
+        """Flush a fully written temporary workbook to disk and rename it over the database"""
+        if self.database_path.exists():
+            shutil.copymode(self.database_path, tmp_path)
+        with open(tmp_path, 'rb') as fp:
+            os.fsync(fp.fileno())
+        os.replace(tmp_path, self.database_path)
+
+    @contextmanager
+    def _rewrite(self):
+        """Yield the open workbook with pending writes applied, then replace the file with it
+
+        Holds the database lock throughout.
+        """
+        require_pandas()
+        import openpyxl
+
+        with self.lock:
+            self._commit_locked()
+            workbook = openpyxl.load_workbook(self.database_path)
+            yield workbook
+            self._save(workbook)
+
+    def _save(self, workbook):
+        """Write an open workbook to a temporary file and rename it over the database"""
+        tmp_path = self._tmp_path()
+        try:
+            workbook.save(tmp_path)
+            self._replace(tmp_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def commit(self):
+        """Apply every pending journal write, from this run and any other, in one rewrite"""
+        if not (self.journal.pending() or self.rules_journal.pending()):
+            return
+        with self.lock:
+            self._commit_locked()
+
+    def _commit_locked(self):
+        """Apply the journals with the database lock held"""
+        journals = (self.journal, self.rules_journal)
+        # Journals left by a commit that crashed go first, along with its temporary workbook
+        if any(journal.committing_path.exists() for journal in journals):
+            for tmp_path in self.database_path.parent.glob(f'.{self.database_path.name}.*.tmp'):
+                tmp_path.unlink()
+            self._apply_journals()
+        if [journal for journal in journals if journal.rotate()]:
+            self._apply_journals()
+
+    def _apply_journals(self):
+        """Apply the journals being committed to the workbook in one rewrite, skipping any already applied"""
+        require_pandas()
+        import openpyxl
+
+        committing = [(column, journal) for column, journal in enumerate((self.journal, self.rules_journal), 1)
+                      if journal.committing_path.exists()]
+        workbook = openpyxl.load_workbook(self.database_path)
+        marker = self._sheet(workbook, JOURNAL_SHEET, JOURNAL_COLUMNS)
+        marker.sheet_state = 'hidden'
+
+        applied = False
+        for column, journal in committing:
+            generation, writes = journal.read_committing()
+            if generation is not None and marker.cell(row=2, column=column).value == generation:
+                continue
+            self._apply_writes(workbook, writes)
+            marker.cell(row=1, column=column, value=JOURNAL_COLUMNS[column - 1])
+            marker.cell(row=2, column=column, value=generation)
+            applied = True
+        if applied:
+            self._save(workbook)
+
+        for _, journal in committing:
+            journal.finish()
+
+    def _apply_writes(self, workbook, writes: List[Dict]):
+        """Apply journaled writes to an open workbook: rule edits in order, other rows grouped by sheet"""
+        rows = defaultdict(list)
+        for write in writes:
+            if write['op'] in RULE_WRITES:
+                self._apply_rule_write(workbook, write)
+            else:
+                rows[write['op']].extend(write['rows'])
+        self._append_log_rows(workbook, rows['logs'])
+        self._add_counts(workbook, 'Statistics', STATISTICS_COLUMNS, 1, rows['statistics'])
+        self._add_counts(workbook, 'Rollups', ROLLUP_COLUMNS, 3, rows['rollups'])
+
+    def _apply_rule_write(self, workbook, write: Dict):
+        """Apply one journaled rule write to the Categories sheet of an open workbook, as apply_rule_write does"""
+        sheet = workbook['Categories']
+        header = [cell.value for cell in sheet[1]]
+        if write['op'] == 'categories':
+            for row in write['rows']:
+                sheet.append([row.get(column) for column in header])
+            return
+
+        category, keyword, active = (header.index(column) for column in ('Category', 'Keyword', 'Active'))
+        for edit in write['rows']:
+            for row in sheet.iter_rows(min_row=2):
+                if rule_edit_matches(row[category].value, row[keyword].value, row[active].value, edit):
+                    if write['op'] == 'disable_keyword':
+                        row[active].value = False
+                    else:
+                        row[category].value = edit['to_category']
+
+    def load_rules(self) -> List[Tuple[str, str, object]]:
+        """Return (category, keyword, active) for every row of the Categories sheet, with journaled edits applied"""
+        pd = require_pandas()
+        with self.lock:
+            # Finish a commit that crashed, so the edits it was applying are not missed
+            if self.journal.committing_path.exists() or self.rules_journal.committing_path.exists():
+                self._commit_locked()
+            df = pd.read_excel(self.database_path, sheet_name='Categories')
+            rules = list(zip(df['Category'], df['Keyword'], df['Active']))
+            for write in self.rules_journal.read_pending():
+                rules = apply_rule_write(rules, write)
+        return rules
+
+    def read_categories(self) -> 'pd.DataFrame':
+        """Return the Categories sheet"""
+        pd = require_pandas()
+        self.commit()
+        return pd.read_excel(self.database_path, sheet_name='Categories')
+
+    def add_categories(self, category_rows: List[Dict]):
+        """Record rows for the Categories sheet in the rules journal; commit() appends them"""
+        self.rules_journal.append('categories', category_rows)
+
+    def disable_keyword(self, keyword: str, category: Optional[str] = None):
+        """Record in the rules journal that the active rows of a keyword (in category, if given) are deactivated"""
+        self.rules_journal.append('disable_keyword', [{'keyword': keyword, 'category': category}])
+
+    def move_keyword(self, keyword: str, to_category: str, category: Optional[str] = None):
+        """Record in the rules journal that the active rows of a keyword (from category, if given) move"""
+        self.rules_journal.append('move_keyword', [{'keyword': keyword, 'category': category,
+                                                    'to_category': to_category}])
+
+    def append_logs(self, entries: List[Dict]):
+        """Record log entries in the journal, or append them to the partitioned logs"""
+        if self.log_store is not None:
+            self.log_store.append(entries)
+            return
+        self.journal.append('logs', entries)
+
+    def _append_log_rows(self, workbook, entries: List[Dict]):
+        """Append log entries to the EmailLogs sheet of an open workbook"""
+        if not entries:
+            return
+        sheet = self._sheet(workbook, 'EmailLogs', LOG_COLUMNS)
+
+        # Map columns by header so workbooks created before a column was added keep working
+        header = [cell.value for cell in sheet[1]]
+        for column in LOG_COLUMNS:
+            if column not in header:
+                header.append(column)
+                sheet.cell(row=1, column=len(header), value=column)
+
+        for entry in entries:
+            sheet.append([entry.get(column) for column in header])
+
+    def read_logs(self, start: Optional[str] = None, end: Optional[str] = None) -> 'pd.DataFrame':
+        """Return the EmailLogs rows dated from start to end (YYYY-MM-DD, inclusive)"""
+        if self.log_store is not None:
+            return self.log_store.read(start, end)
+
+        pd = require_pandas()
+        self.commit()
+        logs = pd.read_excel(self.database_path, sheet_name='EmailLogs', dtype={'MessageId': str})
+        return logs_in_range(logs, start, end)
+
+    def iter_logs(self, start: Optional[str] = None, end: Optional[str] = None,
+                  batch_size: int = LOG_READ_BATCH_SIZE):
+        """Yield the EmailLogs rows dated from start to end in batches
+
+        Partitioned logs are read a month at a time; the sheet has to be
+        read whole, so it is only split afterwards.
+        """
+        if self.log_store is not None:
+            yield from self.log_store.iter_read(start, end)
+            return
+
+        logs = self.read_logs(start, end)
+        for offset in range(0, len(logs), batch_size):
+            yield logs.iloc[offset:offset + batch_size]
+
+    def clear_logs(self):
+        """Empty the EmailLogs sheet, keeping its header"""
+        with self._rewrite() as workbook:
+            if 'EmailLogs' in workbook.sheetnames:
+                index = workbook.sheetnames.index('EmailLogs')
+                del workbook['EmailLogs']
+                workbook.create_sheet('EmailLogs', index).append(LOG_COLUMNS)
+
+    def _sheet(self, workbook, name: str, columns: List[str]):
+        """Return a sheet of an open workbook, creating it with a header row if missing"""
+        if name in workbook.sheetnames:
+            return workbook[name]
+        sheet = workbook.create_sheet(name)
+        sheet.append(columns)
+        return sheet
+
+    def update_statistics(self, date: str, total_emails: int, categorized: int, calendar_matches: int):
+        """Record a run's counts for a date in the journal; commit() adds them to the statistics"""
+        self.journal.append('statistics', [{
+            'Date': date,
+            'TotalEmails': total_emails,
+            'Categorized': categorized,
+            'WithCalendarMatch': calendar_matches
+        }])
+
+    def add_rollups(self, rows: List[Dict]):
+        """Record ROLLUP_COLUMNS rows in the journal; commit() adds them to the rollups"""
+        self.journal.append('rollups', rows)
+
+    def _add_counts(self, workbook, sheet_name: str, columns: List[str], key_size: int, rows: List[Dict]):
+        """Add rows to a counts sheet of an open workbook whose first key_size columns are the key"""
+        if not rows:
+            return
+        sheet = self._sheet(workbook, sheet_name, columns)
+
+        # Existing rows by key; the counts sheets hold one row per key, not per email
+        positions = {}
+        for row_number, values in enumerate(sheet.iter_rows(min_row=2, max_col=key_size, values_only=True), 2):
+            positions[tuple(str(value) for value in values)] = row_number
+
+        for row in rows:
+            key = tuple(str(row[column]) for column in columns[:key_size])
+            if key in positions:
+                for column_number, column in enumerate(columns[key_size:], key_size + 1):
+                    cell = sheet.cell(row=positions[key], column=column_number)
+                    cell.value = int(cell.value or 0) + int(row[column])
+            else:
+                sheet.append([row[column] for column in columns])
+                positions[key] = sheet.max_row
+
+    def replace_rollups(self, rollups: 'pd.DataFrame', statistics: 'pd.DataFrame'):
+        """Overwrite the Rollups and Statistics sheets"""
+        with self._rewrite() as workbook:
+            for name, frame in (('Statistics', statistics), ('Rollups', rollups)):
+                if name in workbook.sheetnames:
+                    del workbook[name]
+                sheet = workbook.create_sheet(name)
+                sheet.append(list(frame.columns))
+                for values in frame.itertuples(index=False):
+                    sheet.append([value.item() if hasattr(value, 'item') else value for value in values])
+
+    def read_statistics(self) -> 'pd.DataFrame':
+        """Return the Statistics sheet"""
+        pd = require_pandas()
+        self.commit()
+        return pd.read_excel(self.database_path, sheet_name='Statistics')
+
+    def read_rollups(self) -> 'pd.DataFrame':
+        """Return the Rollups sheet"""
+        pd = require_pandas()
+        self.commit()
+        try:
+            return pd.read_excel(self.database_path, sheet_name='Rollups', keep_default_na=False)
+        except ValueError:
+            # Workbook created before rollups existed
+            return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    def export_xlsx(self, output_path: Path):
+        """Copy the workbook to another location, with partitioned logs as its EmailLogs sheet"""
+        if Path(output_path).resolve() != self.database_path.resolve():
+            self.commit()
+            shutil.copyfile(self.database_path, output_path)
+
+        if self.log_store is not None:
+            pd = require_pandas()
+            with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+                self.read_logs().to_excel(writer, sheet_name='EmailLogs', index=False)
+
+
+class SQLiteStorage:
+    """Keeps categories, logs and statistics in indexed SQLite tables"""
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS keywords (
+            id INTEGER PRIMARY KEY,
+            category TEXT NOT NULL,
+            keyword TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1,
+            created TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_keywords_keyword ON keywords(keyword);
+        CREATE INDEX IF NOT EXISTS idx_keywords_category ON keywords(category);
+
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            subject TEXT,
+            sender TEXT,
+            category TEXT,
+            calendar_match INTEGER,
+            matched_event TEXT,
+            confidence REAL,
+            message_id TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_logs_category ON logs(category);
+        CREATE INDEX IF NOT EXISTS idx_logs_sender ON logs(sender);
+        CREATE INDEX IF NOT EXISTS idx_logs_message_id ON logs(message_id);
+
+        CREATE TABLE IF NOT EXISTS statistics (
+            date TEXT PRIMARY KEY,
+            total_emails INTEGER,
+            categorized INTEGER,
+            with_calendar_match INTEGER
+        );
+
+        CREATE TABLE IF NOT EXISTS rollups (
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            sender_domain TEXT NOT NULL,
+            emails INTEGER NOT NULL,
+            with_calendar_match INTEGER NOT NULL,
+            PRIMARY KEY (date, category, sender_domain)
+        );
+    '''
+
+    LOG_SELECT = '''
+        SELECT timestamp AS Timestamp, subject AS Subject, sender AS Sender,
+               category AS Category, calendar_match AS CalendarMatch,
+               matched_event AS MatchedEvent, confidence AS Confidence,
+               message_id AS MessageId
+        FROM logs ORDER BY id
+    '''
+
+    def __init__(self, database_path: Path):
+        self.database_path = Path(database_path)
+        self._connection = None
+        self.log_store = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Open the database on first use
+
+        The connection may be used from any thread, e.g. the daemon's socket
+        threads; callers that share a storage across threads serialize their
+        calls, as the daemon does with its lock.
+        """
+        if self._connection is None:
+            connection = sqlite3.connect(self.database_path, check_same_thread=False)
+            try:
+                connection.executescript(self.SCHEMA)
+            except sqlite3.Error:
+                connection.close()
+                raise
+            self._connection = connection
+        return self._connection
+
+    def exists(self) -> bool:
+        """Check whether the database file exists"""
+        return self.database_path.exists()
+
+    def set_aside(self) -> Optional[Path]:
+        """Rename an unreadable database out of the way so a new one can be created; return its new path"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if not self.exists():
+            return None
+        aside = unreadable_path(self.database_path)
+        os.replace(self.database_path, aside)
+        return aside
+
+    def create(self, category_rows: List[Dict]):
+        """Create the tables and insert the given category rows"""
+        with self.connection as conn:
+            conn.executemany(
+                'INSERT INTO keywords (category, keyword, active, created) VALUES (?, ?, ?, ?)',
+                [(row['Category'], row['Keyword'], int(bool(row['Active'])), row['Created'])
+                 for row in category_rows]
+            )
+
+    def add_categories(self, category_rows: List[Dict]):
+        """Insert keyword rows"""
+        self.create(category_rows)
+
+    def commit(self):
+        """Nothing to do; every SQLite write is its own transaction"""
+        pass
+
+    def disable_keyword(self, keyword: str, category: Optional[str] = None):
+        """Deactivate the active rows of a keyword (in category, if given)"""
+        ids = self._keyword_row_ids({'keyword': keyword, 'category': category})
+        with self.connection as conn:
+            conn.executemany('UPDATE keywords SET active = 0 WHERE id = ?', [(row_id,) for row_id in ids])
+
+    def move_keyword(self, keyword: str, to_category: str, category: Optional[str] = None):
+        """Move the active rows of a keyword (from category, if given) to to_category"""
+        ids = self._keyword_row_ids({'keyword': keyword, 'category': category, 'to_category': to_category})
+        with self.connection as conn:
+            conn.executemany('UPDATE keywords SET category = ? WHERE id = ?', [(to_category, row_id) for row_id in ids])
+
+    def _keyword_row_ids(self, edit: Dict) -> List[int]:
+        """Return the ids of the keyword rows a disable or move edit applies to, as rule_edit_matches decides"""
+        cursor = self.connection.execute('SELECT id, category, keyword FROM keywords WHERE active')
+        return [row_id for row_id, row_category, row_keyword in cursor
+                if rule_edit_matches(row_category, row_keyword, True, edit)]
+
+    def load_rules(self) -> List[Tuple[str, str, object]]:
+        """Return (category, keyword, active) for every keyword row"""
+        cursor = self.connection.execute('SELECT category, keyword, active FROM keywords ORDER BY id')
+        return [(category, keyword, bool(active)) for category, keyword, active in cursor]
+
+    def read_categories(self) -> 'pd.DataFrame':
+        """Return the keyword table with the Excel column names"""
+        pd = require_pandas()
+        df = pd.read_sql_query(
+            'SELECT category AS Category, keyword AS Keyword, active AS Active, created AS Created '
+            'FROM keywords ORDER BY id',
+            self.connection
+        )
+        df['Active'] = df['Active'].astype(bool)
+        return df
+
+    def append_logs(self, entries: List[Dict]):
+        """Insert log entries in one transaction"""
+        if self.log_store is not None:
+            self.log_store.append(entries)
+            return
+
+        with self.connection as conn:
+            conn.executemany(
+                'INSERT INTO logs (timestamp, subject, sender, category, calendar_match, '
+                'matched_event, confidence, message_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(entry.get('Timestamp'), entry.get('Subject'), entry.get('Sender'),
+                  entry.get('Category'), int(bool(entry.get('CalendarMatch'))),
+                  entry.get('MatchedEvent'), entry.get('Confidence'), entry.get('MessageId'))
+                 for entry in entries]
+            )
+
+    def read_logs(self, start: Optional[str] = None, end: Optional[str] = None) -> 'pd.DataFrame':
+        """Return log rows dated from start to end (YYYY-MM-DD, inclusive) with the Excel column names"""
+        if self.log_store is not None:
+            return self.log_store.read(start, end)
+
+        pd = require_pandas()
+        query, params = self._log_query(start, end)
+        df = pd.read_sql_query(query, self.connection, params=params)
+        df['CalendarMatch'] = df['CalendarMatch'].astype(bool)
+        return df
+
+    def iter_logs(self, start: Optional[str] = None, end: Optional[str] = None,
+                  batch_size: int = LOG_READ_BATCH_SIZE):
+        """Yield log rows dated from start to end in batches of at most batch_size rows"""
+        if self.log_store is not None:
+            yield from self.log_store.iter_read(start, end)
+            return
+
+        pd = require_pandas()
+        query, params = self._log_query(start, end)
+        for df in pd.read_sql_query(query, self.connection, params=params, chunksize=batch_size):
+            df['CalendarMatch'] = df['CalendarMatch'].astype(bool)
+            yield df
+
+    def _log_query(self, start: Optional[str], end: Optional[str]) -> Tuple[str, tuple]:
+        """Return the SQL and parameters selecting log rows dated from start to end"""
+        # Timestamps sort as text; '~' sorts after any time of day on the end date
+        return (self.LOG_SELECT.replace('FROM logs', 'FROM logs WHERE timestamp >= ? AND timestamp < ?'),
+                (start or '', (end or '9999-12-31') + '~'))
+
+    def clear_logs(self):
+        """Delete all rows of the logs table and reclaim the space"""
+        with self.connection as conn:
+            conn.execute('DELETE FROM logs')
+        self.connection.execute('VACUUM')
+
+    def update_statistics(self, date: str, total_emails: int, categorized: int, calendar_matches: int):
+        """Add a run's counts to the statistics row for a date"""
+        with self.connection as conn:
+            conn.execute(
+                'INSERT INTO statistics (date, total_emails, categorized, with_calendar_match) '
+                'VALUES (?, ?, ?, ?) ON CONFLICT(date) DO UPDATE SET '
+                'total_emails = total_emails + excluded.total_emails, '
+                'categorized = categorized + excluded.categorized, '
+                'with_calendar_match = with_calendar_match + excluded.with_calendar_match',
+                (date, total_emails, categorized, calendar_matches)
+            )
+
+    def add_rollups(self, rows: List[Dict]):
+        """Add ROLLUP_COLUMNS rows to the matching (date, category, sender domain) counts"""
+        with self.connection as conn:
+            conn.executemany(
+                'INSERT INTO rollups (date, category, sender_domain, emails, with_calendar_match) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT(date, category, sender_domain) DO UPDATE SET '
+                'emails = emails + excluded.emails, '
+                'with_calendar_match = with_calendar_match + excluded.with_calendar_match',
+                [tuple(row[column] for column in ROLLUP_COLUMNS) for row in rows]
+            )
+
+    def replace_rollups(self, rollups: 'pd.DataFrame', statistics: 'pd.DataFrame'):
+        """Overwrite the rollups and statistics tables in one transaction"""
+        with self.connection as conn:
+            conn.execute('DELETE FROM rollups')
+            conn.execute('DELETE FROM statistics')
+            conn.executemany('INSERT INTO rollups VALUES (?, ?, ?, ?, ?)',
+                             [(d, c, s, int(e), int(m)) for d, c, s, e, m in
+                              rollups[ROLLUP_COLUMNS].itertuples(index=False)])
+            conn.executemany('INSERT INTO statistics VALUES (?, ?, ?, ?)',
+                             [(d, int(t), int(c), int(m)) for d, t, c, m in
+                              statistics[STATISTICS_COLUMNS].itertuples(index=False)])
+
+    def read_statistics(self) -> 'pd.DataFrame':
+        """Return the statistics table with the Excel column names"""
+        pd = require_pandas()
+        return pd.read_sql_query(
+            'SELECT date AS Date, total_emails AS TotalEmails, categorized AS Categorized, '
+            'with_calendar_match AS WithCalendarMatch FROM statistics ORDER BY date',
+            self.connection
+        )
+
+    def read_rollups(self) -> 'pd.DataFrame':
+        """Return the rollups table with the Excel column names"""
+        pd = require_pandas()
+        return pd.read_sql_query(
+            'SELECT date AS Date, category AS Category, sender_domain AS SenderDomain, '
+            'emails AS Emails, with_calendar_match AS WithCalendarMatch '
+            'FROM rollups ORDER BY date, category, sender_domain',
+            self.connection
+        )
+
+    def export_xlsx(self, output_path: Path):
+        """Write all tables to an xlsx workbook with the usual sheet layout"""
+        pd = require_pandas()
+        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+            self.read_categories().to_excel(writer, sheet_name='Categories', index=False)
+            self.read_logs().to_excel(writer, sheet_name='EmailLogs', index=False)
+            self.read_statistics().to_excel(writer, sheet_name='Statistics', index=False)
+            self.read_rollups().to_excel(writer, sheet_name='Rollups', index=False)